@@ -10,8 +10,11 @@ import uvicorn
 import asyncio
 import threading
 import traceback
+import functools
 from pathlib import Path
 
+from config.llm_telemetry import llm_context, get_telemetry
+
 # Import your existing video generation code
 try:
     from backend.video_generator import make_perfectly_synchronized_video
@@ -34,7 +37,7 @@ except ImportError as e:
         raise Exception("Problem solving functionality not available - import failed")
 
 try:
-    from backend.generate_scenes import generate_all_scenes_from_script
+    from backend.generate_scenes import generate_all_scenes_from_script, agenerate_all_scenes_from_script
     print("✅ Successfully imported generate_all_scenes_from_script")
 except ImportError as e:
     print(f"❌ Failed to import generate_all_scenes_from_script: {e}")
@@ -66,6 +69,27 @@ app.add_middleware(
 jobs = {}
 jobs_lock = threading.Lock()
 
+@app.on_event("startup")
+async def check_data_and_output_dirs():
+    """Fail fast on missing data files; clients and knowledge text load on first use"""
+    from config.paths import validate_data_files, ensure_output_dirs
+    validate_data_files()
+    ensure_output_dirs()
+
+@app.on_event("shutdown")
+async def close_pools():
+    """Release pooled async LLM connections opened on the server's event loop and stop render workers"""
+    try:
+        from config.llm import aclose_async_clients
+        await aclose_async_clients()
+    except ImportError as e:
+        print(f"⚠️ Could not close LLM connection pools: {e}")
+    try:
+        from backend.render_pool import shutdown_render_pool
+        shutdown_render_pool()
+    except ImportError as e:
+        print(f"⚠️ Could not stop render workers: {e}")
+
 # ========================
 # REQUEST MODELS
 # ========================
@@ -101,6 +125,8 @@ class JobStatus(BaseModel):
     current_step: str = ""
     error: Optional[str] = None
     video_url: Optional[str] = None
+    llm_usage: Optional[dict] = None
+    render_cache: Optional[dict] = None
 
 # ========================
 # UTILITY FUNCTIONS
@@ -142,10 +168,26 @@ def create_job(request_data: dict, job_type: str = "video") -> str:
     
     return job_id
 
+def tracks_llm_usage(task: Callable) -> Callable:
+    """Attribute every LLM call made by a background task (sync or async) to its job id"""
+    if asyncio.iscoroutinefunction(task):
+        @functools.wraps(task)
+        async def async_wrapper(job_id: str, *args, **kwargs):
+            with llm_context(job_id=job_id):
+                return await task(job_id, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(task)
+    def wrapper(job_id: str, *args, **kwargs):
+        with llm_context(job_id=job_id):
+            return task(job_id, *args, **kwargs)
+    return wrapper
+
 # ========================
 # BACKGROUND TASK FUNCTIONS
 # ========================
 
+@tracks_llm_usage
 def generate_video_with_job_id(job_id: str, request: VideoRequest):
     """Generate video using make_perfectly_synchronized_video with progress updates"""
     try:
@@ -206,8 +248,13 @@ def generate_video_with_job_id(job_id: str, request: VideoRequest):
                 "failed_at": time.time()
             })
 
-def solve_problem_background(job_id: str, request: ProblemRequest):
-    """Background task for problem solving video generation"""
+@tracks_llm_usage
+async def solve_problem_background(job_id: str, request: ProblemRequest):
+    """
+    Background task for problem solving video generation. Runs on the
+    server's event loop so scene drafts share its pooled LLM connections;
+    blocking steps are moved to worker threads.
+    """
     try:
         print(f"🧮 Starting problem solving for job: {job_id}")
         print(f"📋 Problem: {request.problem}")
@@ -216,7 +263,8 @@ def solve_problem_background(job_id: str, request: ProblemRequest):
         
         # Generate problem-solving script
         update_job_progress(job_id, 15, "Generating solution steps...", "processing")
-        script = generate_problem_script_for_pipeline(
+        script = await asyncio.to_thread(
+            generate_problem_script_for_pipeline,
             problem=request.problem,
             duration_minutes=request.duration,
             detail_level=request.detail_level
@@ -226,7 +274,7 @@ def solve_problem_background(job_id: str, request: ProblemRequest):
         
         # Generate video scenes
         update_job_progress(job_id, 40, "Creating visual animations...", "processing")
-        video_path = generate_all_scenes_from_script(script, max_workers=1)
+        video_path = await agenerate_all_scenes_from_script(script, max_workers=1)
         
         if not video_path or not Path(video_path).exists():
             raise Exception("Video scene generation failed")
@@ -235,7 +283,8 @@ def solve_problem_background(job_id: str, request: ProblemRequest):
         
         # Generate audio narration
         full_narration = "\n\n".join([step.narration for step in script.concepts])
-        audio_path = generate_audio_narration(
+        audio_path = await asyncio.to_thread(
+            generate_audio_narration,
             text=full_narration,
             filename=f"problem_solution_{job_id}.mp3",
             dry_run=request.dry_run
@@ -262,7 +311,7 @@ def solve_problem_background(job_id: str, request: ProblemRequest):
                     str(final_output)
                 ]
                 
-                subprocess.run(cmd, check=True, capture_output=True)
+                await asyncio.to_thread(subprocess.run, cmd, check=True, capture_output=True)
                 video_path = final_output
         
         update_job_progress(job_id, 95, "Finalizing video...", "processing")
@@ -294,7 +343,8 @@ def solve_problem_background(job_id: str, request: ProblemRequest):
                 "failed_at": time.time()
             })
 
-def generate_step_by_step_background(job_id: str, request: StepByStepRequest):
+@tracks_llm_usage
+async def generate_step_by_step_background(job_id: str, request: StepByStepRequest):
     """Background task for step-by-step problem solution"""
     try:
         print(f"📚 Starting step-by-step solution for job: {job_id}")
@@ -312,7 +362,7 @@ def generate_step_by_step_background(job_id: str, request: StepByStepRequest):
         )
         
         # Use the existing problem solving logic
-        solve_problem_background(job_id, problem_request)
+        await solve_problem_background(job_id, problem_request)
         
     except Exception as e:
         print(f"❌ Step-by-step generation failed for job {job_id}: {e}")
@@ -461,6 +511,12 @@ async def get_video_status(job_id: str):
         job = jobs[job_id].copy()  # Copy to avoid race conditions
     
     print(f"📊 Status for job {job_id}: {job['status']} ({job['progress']}%) - {job['current_step']}")
+
+    try:
+        from backend.render_cache import job_render_cache_stats
+        render_cache = job_render_cache_stats(job_id)
+    except ImportError:
+        render_cache = None
     
     return JobStatus(
         job_id=job["job_id"],
@@ -468,9 +524,19 @@ async def get_video_status(job_id: str):
         progress=job["progress"],
         current_step=job["current_step"],
         error=job.get("error"),
-        video_url=job.get("video_url")
+        video_url=job.get("video_url"),
+        llm_usage=get_telemetry().summary(job_id),
+        render_cache=render_cache
     )
 
+@app.get("/api/llm-telemetry")
+async def llm_telemetry(job_id: Optional[str] = None):
+    """Per-call LLM records (tokens, latency, TTFT, retries, stage) for benchmarking"""
+    return {
+        "summary": get_telemetry().summary(job_id),
+        "calls": get_telemetry().records(job_id)
+    }
+
 @app.get("/api/video/{job_id}")
 async def download_video(job_id: str):
     """Download generated video file"""
@@ -620,6 +686,32 @@ async def health_check():
     except Exception as e:
         video_functions_available["problem_solving"] = f"❌ Error: {e}"
     
+    try:
+        from backend.script_store import get_script_store
+        from backend.generate_script import script_parse_stats
+        from backend.speech_rate import get_speech_rates
+        script_stats = {
+            "cache": get_script_store().stats(),
+            "parse_paths": script_parse_stats(),
+            "speech_rates": get_speech_rates().stats(),
+        }
+    except ImportError as e:
+        script_stats = {"error": f"❌ Import failed: {e}"}
+
+    try:
+        from backend.preflight import preflight_stats
+        from backend.asset_cache import get_asset_cache
+        from backend.render_cache import get_render_cache
+        from backend.scene_code_store import get_scene_code_store
+        render_stats = {
+            "scene_code": get_scene_code_store().stats(),
+            "preflight": preflight_stats(),
+            "assets": get_asset_cache().stats(),
+            "render_cache": get_render_cache().stats(),
+        }
+    except ImportError as e:
+        render_stats = {"error": f"❌ Import failed: {e}"}
+    
     with jobs_lock:
         job_count = len(jobs)
         active_jobs = len([j for j in jobs.values() if j["status"] in ["started", "processing"]])
@@ -649,6 +741,8 @@ async def health_check():
             "by_type": job_types
         },
         "video_functions": video_functions_available,
+        "scripts": script_stats,
+        "renders": render_stats,
         "timestamp": time.time()
     }
     
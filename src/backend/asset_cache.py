@@ -0,0 +1,239 @@
+import os
+import time
+import hashlib
+import threading
+import contextlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Not POSIX: renders still share the cache, just without compile locks
+    fcntl = None
+
+from config.paths import ASSET_CACHE_DIR
+from config.settings import ASSET_CACHE_MAX_BYTES
+
+TEX_DIR = "Tex"
+TEXT_DIR = "texts"
+LOCK_DIR = ".locks"
+LOCK_STRIPES = 64  # compiles of different formulas rarely share a lock file
+
+# Files newer than this are never evicted: another render may be compiling or reading them
+MIN_EVICT_AGE = 10 * 60  # seconds
+EVICT_INTERVAL = 60  # seconds between eviction scans
+
+
+def manim_config(cache_dir: Path = ASSET_CACHE_DIR) -> dict:
+    """
+    Config overrides that point a render at the shared cache. Manim names Tex
+    and Text SVGs after a hash of their content, so the files are shareable
+    as-is. Its LaTeX cleanup deletes every non-SVG file in tex_dir, which
+    would remove other renders' in-flight .tex/.dvi files, so it is off and
+    eviction clears the leftovers instead.
+    """
+    return {
+        "tex_dir": str(Path(cache_dir) / TEX_DIR),
+        "text_dir": str(Path(cache_dir) / TEXT_DIR),
+        "no_latex_cleanup": True,
+    }
+
+
+# ---------------------------
+# Worker side (inside a render process)
+# ---------------------------
+_counts = Counter()
+
+
+@contextlib.contextmanager
+def _locked(cache_dir: Path, key: str):
+    """Cross-process lock for one stripe of the cache, so a file is compiled by one writer at a time"""
+    if fcntl is None:
+        yield
+        return
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    lock_dir = Path(cache_dir) / LOCK_DIR
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    with open(lock_dir / f"{int(digest[:8], 16) % LOCK_STRIPES}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _count(kind: str, svg_path, hit: bool):
+    """Count one lookup; touching hits keeps eviction least-recently-used"""
+    _counts[f"{kind}_{'hits' if hit else 'misses'}"] += 1
+    if hit:
+        try:
+            os.utime(svg_path)
+        except OSError:
+            pass
+
+
+def install_manim_hooks(cache_dir: Path = ASSET_CACHE_DIR):
+    """
+    Wrap manim's Tex and Text SVG generation in this process so concurrent
+    renders never compile the same file at once and every lookup is counted.
+    Call once, after manim is imported.
+    """
+    import sys
+    from manim.utils import tex_file_writing
+    from manim import Text, MarkupText
+
+    original_tex = tex_file_writing.tex_to_svg_file
+    original_compile = tex_file_writing.compile_tex
+
+    # tex_to_svg_file only calls compile_tex when the SVG is not cached yet
+    def compile_tex(*args, **kwargs):
+        _counts["tex_compiles"] += 1
+        return original_compile(*args, **kwargs)
+
+    def tex_to_svg_file(expression, environment=None, tex_template=None):
+        template_body = getattr(tex_template, "body", "")
+        compiles = _counts["tex_compiles"]
+        with _locked(cache_dir, f"tex\0{environment}\0{template_body}\0{expression}"):
+            svg_file = original_tex(expression, environment, tex_template)
+        _count("tex", svg_file, hit=_counts["tex_compiles"] == compiles)
+        return svg_file
+
+    tex_file_writing.compile_tex = compile_tex
+    # Mobject modules hold their own reference from `from ... import tex_to_svg_file`
+    for name, module in list(sys.modules.items()):
+        if name.startswith("manim") and getattr(module, "tex_to_svg_file", None) is original_tex:
+            setattr(module, "tex_to_svg_file", tex_to_svg_file)
+
+    text_dir = Path(cache_dir) / TEXT_DIR
+    for cls in (Text, MarkupText):
+        original_text = cls._text2svg
+
+        def _text2svg(self, *args, _original=original_text, **kwargs):
+            # Pango renders are quick, so all Text generation shares one lock
+            with _locked(cache_dir, "text"):
+                # Same file name manim derives for the SVG it looks up
+                cached = (text_dir / f"{self._text2hash(*args, **kwargs)}.svg").exists()
+                svg_file = _original(self, *args, **kwargs)
+            _count("text", svg_file, hit=cached)
+            return svg_file
+
+        cls._text2svg = _text2svg
+
+
+def take_counts() -> Dict[str, int]:
+    """Hit/miss counts since the last call (sent back to the pool with each job)"""
+    counts = {k: v for k, v in _counts.items() if k != "tex_compiles"}
+    _counts.clear()
+    return counts
+
+
+# ---------------------------
+# Parent side
+# ---------------------------
+class AssetCache:
+    """
+    Process-wide cache of compiled Tex SVGs and Pango text SVGs shared by
+    every scene and job.
+
+    Render workers compile into it directly (see install_manim_hooks) and
+    report hit/miss counts per job. Size is kept under max_bytes by
+    deleting the least recently used files, grouped by hash so a formula's
+    .tex/.svg go together; anything touched in the last MIN_EVICT_AGE
+    seconds is left alone.
+    """
+
+    def __init__(self, cache_dir: Path = ASSET_CACHE_DIR, max_bytes: int = ASSET_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.counts = Counter()
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, counts: Dict[str, int]):
+        with self._lock:
+            self.counts.update(counts)
+
+    def _groups(self) -> Dict[Path, list]:
+        """stem -> [newest mtime, total bytes, files] for every cached asset"""
+        groups = {}
+        for subdir in (TEX_DIR, TEXT_DIR):
+            directory = self.cache_dir / subdir
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                group = groups.setdefault(directory / path.stem, [0.0, 0, []])
+                group[0] = max(group[0], st.st_mtime)
+                group[1] += st.st_size
+                group[2].append(path)
+        return groups
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._groups().values())
+
+    def evict(self) -> int:
+        """Delete least recently used assets until under max_bytes; returns bytes freed"""
+        groups = self._groups()
+        total = sum(size for _, size, _ in groups.values())
+        freed = 0
+        cutoff = time.time() - MIN_EVICT_AGE
+        for mtime, size, files in sorted(groups.values(), key=lambda g: g[0]):
+            if total - freed <= self.max_bytes or mtime > cutoff:
+                break
+            for path in files:
+                try:
+                    path.unlink()
+                    with self._lock:
+                        self.evicted_files += 1
+                except FileNotFoundError:
+                    pass
+            freed += size
+        with self._lock:
+            self.evicted_bytes += freed
+        return freed
+
+    def maybe_evict(self):
+        """evict(), at most once per EVICT_INTERVAL"""
+        with self._lock:
+            if time.time() - self._last_evict < EVICT_INTERVAL:
+                return
+            self._last_evict = time.time()
+        self.evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            evicted_files, evicted_bytes = self.evicted_files, self.evicted_bytes
+        stats = {}
+        for kind in ("tex", "text"):
+            hits, misses = counts.get(f"{kind}_hits", 0), counts.get(f"{kind}_misses", 0)
+            stats[kind] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+        stats["size_bytes"] = self.size_bytes()
+        stats["max_bytes"] = self.max_bytes
+        stats["evicted_files"] = evicted_files
+        stats["evicted_bytes"] = evicted_bytes
+        return stats
+
+
+_cache: Optional[AssetCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache() -> AssetCache:
+    """Process-wide Tex/Text asset cache in ASSET_CACHE_DIR"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache()
+        return _cache
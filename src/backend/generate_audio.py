@@ -6,38 +6,40 @@ from dotenv import load_dotenv
 import shutil
 import time
 
-# Try to import ElevenLabs if available
-try:
-    from elevenlabs.client import ElevenLabs
-    elevenlabs_available = True
-    elevenlabs_version = "2.x"
-    print("✅ ElevenLabs 2.x imported successfully")
-except ImportError:
+from functools import lru_cache
+from types import SimpleNamespace
+
+@lru_cache(maxsize=None)
+def load_elevenlabs():
+    """
+    Import whichever ElevenLabs SDK is installed, on first use. Returns a
+    namespace with .version ("2.x" / "1.x") and the entry points, or None.
+    """
     try:
-        from elevenlabs import generate as eleven_generate
-        from elevenlabs import set_api_key as eleven_set_api_key
-        elevenlabs_available = True
-        elevenlabs_version = "1.x"
-        print("✅ ElevenLabs 1.x imported successfully")
+        from elevenlabs.client import ElevenLabs
+        print("✅ ElevenLabs 2.x imported successfully")
+        return SimpleNamespace(version="2.x", ElevenLabs=ElevenLabs)
     except ImportError:
-        elevenlabs_available = False
-        elevenlabs_version = None
-        print("❌ ElevenLabs not available")
+        try:
+            from elevenlabs import generate as eleven_generate
+            from elevenlabs import set_api_key as eleven_set_api_key
+            print("✅ ElevenLabs 1.x imported successfully")
+            return SimpleNamespace(version="1.x", generate=eleven_generate, set_api_key=eleven_set_api_key)
+        except ImportError:
+            print("❌ ElevenLabs not available")
+            return None
 
 # ---------------------------
 # Setup
 # ---------------------------
 load_dotenv()
 # Use centralized path configuration
-from config.paths import AUDIO_OUTPUT_DIR
+from config.paths import AUDIO_OUTPUT_DIR, ensure_output_dirs
+from config.registry import find_tool
+from config.cassette import get_cassette
+from backend.speech_rate import get_speech_rates
 OUTPUT_DIR = AUDIO_OUTPUT_DIR.parent
 AUDIO_DIR = AUDIO_OUTPUT_DIR
-print(f"✅ Using centralized audio directory: {AUDIO_DIR}")
-
-# FFmpeg path
-FFMPEG_PATH = shutil.which("ffmpeg")
-if FFMPEG_PATH is None:
-    print("⚠️ Warning: ffmpeg not found in PATH. Audio generation may fail.")
 
 # ElevenLabs parameters
 VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "JBFqnCBsd6RMkjVDRZzb")
@@ -48,6 +50,36 @@ OUTPUT_FORMAT = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128")
 MAX_CHUNK_LENGTH = 2500  # Characters per chunk (ElevenLabs works well with ~2500 chars)
 CHUNK_DELAY = 1.0        # Seconds to wait between API calls (rate limiting)
 
+def get_audio_duration(audio_path: Path) -> float:
+    """Get duration of audio file in seconds using ffprobe"""
+    try:
+        cmd = [
+            "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
+            "-of", "csv=p=0", str(audio_path)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except Exception as e:
+        print(f"❌ Error getting audio duration: {e}")
+        return 0.0
+
+# ---------------------------
+# Speech rate of the configured voice
+# ---------------------------
+def speaking_rate(default_wpm: float) -> float:
+    """Words per minute of VOICE_ID/MODEL_ID as measured, or default_wpm until calibrated"""
+    return get_speech_rates().words_per_minute(VOICE_ID, MODEL_ID, default_wpm)
+
+def estimate_narration_seconds(text: str, default_wpm: float) -> float:
+    """Expected spoken length of text with the configured voice"""
+    return get_speech_rates().estimate_seconds(VOICE_ID, MODEL_ID, text, default_wpm)
+
+def calibrate_from_audio(text: str, audio_path: Path):
+    """Measure a freshly synthesized ElevenLabs file and add it to the voice's calibration"""
+    duration = get_audio_duration(audio_path)
+    if get_speech_rates().record(VOICE_ID, MODEL_ID, text, duration):
+        print(f"🎚️ Voice rate sample: {len(text.split())} words in {duration:.1f}s")
+
 def smart_text_chunker(text: str, max_length: int = MAX_CHUNK_LENGTH) -> list[str]:
     """
     Intelligently chunk text at natural break points (sentences, paragraphs).
@@ -94,9 +126,15 @@ def smart_text_chunker(text: str, max_length: int = MAX_CHUNK_LENGTH) -> list[st
     return [chunk for chunk in chunks if chunk]  # Remove empty chunks
 
 def generate_audio_chunk(text: str, chunk_index: int, total_chunks: int) -> bytes:
-    """Generate audio for a single text chunk with retry logic."""
+    """Generate audio for a single text chunk (recorded/replayed when a cassette is active)."""
     
     print(f"🎵 Generating chunk {chunk_index + 1}/{total_chunks} ({len(text)} chars)")
+
+    request = {"text": text, "voice_id": VOICE_ID, "model_id": MODEL_ID, "output_format": OUTPUT_FORMAT}
+    return get_cassette().call("tts", request, lambda: synthesize_chunk(text, chunk_index))
+
+def synthesize_chunk(text: str, chunk_index: int) -> bytes:
+    """Call ElevenLabs for a single text chunk with retry logic."""
     
     api_key = os.getenv("ELEVENLABS_API_KEY")
     if not api_key:
@@ -105,10 +143,14 @@ def generate_audio_chunk(text: str, chunk_index: int, total_chunks: int) -> byte
     max_retries = 3
     base_delay = 2
     
+    elevenlabs = load_elevenlabs()
+    if elevenlabs is None:
+        raise Exception("ElevenLabs SDK not installed")
+
     for attempt in range(max_retries):
         try:
-            if elevenlabs_version == "2.x":
-                client = ElevenLabs(api_key=api_key)
+            if elevenlabs.version == "2.x":
+                client = elevenlabs.ElevenLabs(api_key=api_key)
                 audio_response = client.text_to_speech.convert(
                     text=text,
                     voice_id=VOICE_ID,
@@ -126,8 +168,8 @@ def generate_audio_chunk(text: str, chunk_index: int, total_chunks: int) -> byte
                     audio_bytes = audio_response
                     
             else:  # v1.x
-                eleven_set_api_key(api_key)
-                audio_bytes = eleven_generate(text=text, voice=VOICE_ID)
+                elevenlabs.set_api_key(api_key)
+                audio_bytes = elevenlabs.generate(text=text, voice=VOICE_ID)
             
             # Verify we have actual audio data
             if not audio_bytes:
@@ -167,7 +209,8 @@ def generate_audio_chunk(text: str, chunk_index: int, total_chunks: int) -> byte
 def combine_audio_chunks(chunk_files: list[Path], output_path: Path) -> Path:
     """Combine multiple audio files into one using ffmpeg."""
     
-    if not FFMPEG_PATH:
+    ffmpeg_path = find_tool("ffmpeg")
+    if not ffmpeg_path:
         raise Exception("ffmpeg not found - cannot combine audio chunks")
     
     if len(chunk_files) == 1:
@@ -187,7 +230,7 @@ def combine_audio_chunks(chunk_files: list[Path], output_path: Path) -> Path:
         
         # Combine using ffmpeg
         cmd = [
-            FFMPEG_PATH, "-y",
+            ffmpeg_path, "-y",
             "-f", "concat",
             "-safe", "0",
             "-i", str(concat_file),
@@ -219,6 +262,7 @@ def generate_audio_narration(text: str, filename: str = None, dry_run: bool = Fa
     
     if not filename:
         filename = "narration.mp3"
+    ensure_output_dirs()
     audio_path = AUDIO_DIR / filename
 
     print(f"🎵 Generating audio for: {filename}")
@@ -240,12 +284,15 @@ def generate_audio_narration(text: str, filename: str = None, dry_run: bool = Fa
 def generate_single_audio(text: str, audio_path: Path) -> Path:
     """Generate audio from a single text chunk."""
     
-    if not elevenlabs_available:
+    # Replays need neither the SDK nor a key
+    replaying = get_cassette().replaying
+
+    if load_elevenlabs() is None and not replaying:
         print("❌ ElevenLabs not available, falling back to TTS")
         return fallback_to_tts(text, audio_path)
     
     api_key = os.getenv("ELEVENLABS_API_KEY")
-    if not api_key:
+    if not api_key and not replaying:
         print("❌ ELEVENLABS_API_KEY not set, falling back to TTS")
         return fallback_to_tts(text, audio_path)
     
@@ -255,6 +302,8 @@ def generate_single_audio(text: str, audio_path: Path) -> Path:
         
         with open(audio_path, "wb") as f:
             f.write(audio_bytes)
+        if not replaying:
+            calibrate_from_audio(text, audio_path)
         
         print(f"✅ Generated audio with ElevenLabs: {audio_path}")
         print(f"📊 Final audio size: {audio_path.stat().st_size:,} bytes")
@@ -268,12 +317,15 @@ def generate_single_audio(text: str, audio_path: Path) -> Path:
 def generate_chunked_audio(text: str, audio_path: Path) -> Path:
     """Generate audio from multiple text chunks and combine them."""
     
-    if not elevenlabs_available:
+    # Replays need neither the SDK nor a key
+    replaying = get_cassette().replaying
+
+    if load_elevenlabs() is None and not replaying:
         print("❌ ElevenLabs not available, falling back to TTS")
         return fallback_to_tts(text, audio_path)
     
     api_key = os.getenv("ELEVENLABS_API_KEY")
-    if not api_key:
+    if not api_key and not replaying:
         print("❌ ELEVENLABS_API_KEY not set, falling back to TTS")
         return fallback_to_tts(text, audio_path)
     
@@ -296,12 +348,14 @@ def generate_chunked_audio(text: str, audio_path: Path) -> Path:
                 chunk_file = audio_path.parent / f"chunk_{i:03d}_{audio_path.stem}.mp3"
                 with open(chunk_file, "wb") as f:
                     f.write(audio_bytes)
+                if not replaying:
+                    calibrate_from_audio(chunk, chunk_file)
                 
                 print(f"💾 Saved chunk to: {chunk_file}")
                 chunk_files.append(chunk_file)
                 
-                # Rate limiting delay between chunks
-                if i < len(chunks) - 1:  # Don't delay after the last chunk
+                # Rate limiting delay between chunks (not needed when replaying)
+                if i < len(chunks) - 1 and not replaying:  # Don't delay after the last chunk
                     print(f"⏳ Waiting {CHUNK_DELAY}s before next chunk...")
                     time.sleep(CHUNK_DELAY)
                     
@@ -335,9 +389,10 @@ def fallback_to_tts(text: str, audio_path: Path) -> Path:
         
         subprocess.run(["say", "-o", str(temp_aiff), text], check=True, capture_output=True)
         
-        if FFMPEG_PATH:
+        ffmpeg_path = find_tool("ffmpeg")
+        if ffmpeg_path:
             subprocess.run([
-                FFMPEG_PATH, "-y", "-i", str(temp_aiff),
+                ffmpeg_path, "-y", "-i", str(temp_aiff),
                 "-codec:a", "libmp3lame", "-b:a", "128k", str(audio_path)
             ], check=True, capture_output=True)
             temp_aiff.unlink()
@@ -353,12 +408,13 @@ def fallback_to_tts(text: str, audio_path: Path) -> Path:
 
 def create_silent_audio(output_path: Path, duration_seconds: float) -> Path:
     """Create silent audio file as final fallback."""
-    if FFMPEG_PATH is None:
+    ffmpeg_path = find_tool("ffmpeg")
+    if ffmpeg_path is None:
         print("❌ Cannot create silent audio: ffmpeg not found")
         return output_path
     try:
         subprocess.run([
-            FFMPEG_PATH, "-y",
+            ffmpeg_path, "-y",
             "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
             "-t", str(duration_seconds),
             "-c:a", "libmp3lame", "-b:a", "128k",
@@ -1,31 +1,238 @@
 import subprocess
 from dotenv import load_dotenv
-from backend.generate_script import Script, generate_script
-from config.paths import MANIM_KNOWLEDGE_PATH, MANIM_PROMPT_PATH, VIDEO_OUTPUT_DIR, CODE_OUTPUT_DIR
-from config.llm import LLMClient
+from backend.generate_script import ConceptSegment, Script, generate_script
+from config.paths import MANIM_KNOWLEDGE_PATH, MATH_TEX_KNOWLEDGE_PATH, MANIM_PROMPT_PATH, VIDEO_OUTPUT_DIR, CODE_OUTPUT_DIR
+from config.registry import get_llm, read_text, require_tool
+from config.llm_telemetry import llm_context, get_telemetry
+from config.llm_routing import ModelCascade, ModelTier
+from backend.knowledge_index import knowledge_index, retrieve_knowledge
+from config.settings import (
+    LLM_STREAM_CODEGEN, LLM_BATCH_CODEGEN, LLM_FIX_CASCADE, LLM_FIX_CHEAP_MODEL, LLM_KNOWLEDGE_RETRIEVAL,
+    LLM_KNOWLEDGE_TOP_K, LLM_KNOWLEDGE_TOKEN_BUDGET,
+    RENDER_POOL_ENABLED, RENDER_PREVIEW_FIRST, RENDER_PREFLIGHT, RENDER_DRY_RUN_FIRST, RENDER_DURATION_TOLERANCE,
+    RENDER_TEX_PREWARM, RENDER_CACHE_ENABLED, SCENE_CODE_CACHE_ENABLED, ASSET_CACHE_ENABLED,
+)
+from config.render_quality import QualityTier, PREVIEW_TIER, FINAL_TIER, scene_video_path
+from backend.render_pool import RenderPoolUnavailable, get_render_pool
+from backend.asset_cache import get_asset_cache
+from backend.render_cache import get_render_cache, tex_template_id
+from backend.scene_code_store import get_scene_code_store
+from backend.preflight import (
+    check_manim_code, count_preflight, count_preflight_event, extract_tex_specs, format_diagnostics, preflight_stats,
+)
 from pathlib import Path
 import re
-import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Tuple, Optional, List
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple, Optional, List
+from functools import lru_cache
 import time
+import json
+import hashlib
+import asyncio
+import contextvars
+import threading
+
+if TYPE_CHECKING:
+    from config.llm import LLMClient
 
 # Load environment variables
 load_dotenv()
-import shutil
 
-# FFmpeg path for video concatenation
-FFMPEG_PATH = shutil.which("ffmpeg")
-if FFMPEG_PATH is None:
-    raise FileNotFoundError("ffmpeg not found in PATH. Please install it or add it to your PATH.")
+# Clients, knowledge text and ffmpeg are looked up on first use (see
+# config.registry) so importing this module stays cheap.
+CODEGEN_MODEL = "claude-sonnet-4-20250514"
+
+
+def codegen_llm() -> "LLMClient":
+    """The main code generation/fix model"""
+    return get_llm(model=CODEGEN_MODEL, temperature=0.3, max_tokens=8000)
+
+
+@lru_cache(maxsize=None)
+def fix_cascade() -> ModelCascade:
+    """Fixes start on a fast, cheap model for simple errors and escalate to codegen_llm()"""
+    tiers = [ModelTier("large", codegen_llm())]
+    if LLM_FIX_CASCADE:
+        tiers.insert(0, ModelTier("cheap", get_llm(model=LLM_FIX_CHEAP_MODEL, temperature=0.3, max_tokens=8000)))
+    return ModelCascade(tiers)
+
+
+# Static system prompt blocks. These are byte-identical across scenes, fix
+# attempts and jobs, so they are sent as cached_system and served from the
+# provider's prompt cache after the first call.
+@lru_cache(maxsize=None)
+def knowledge_prompt() -> str:
+    return f"""
+This is the full breakdown on how to use manim:
+{read_text(MANIM_KNOWLEDGE_PATH)}
+\n\n
+This is the full breakdown on how to use math_tex::
+{read_text(MATH_TEX_KNOWLEDGE_PATH)}
+"""
+
+
+@lru_cache(maxsize=None)
+def codegen_task_prompt() -> str:
+    return f"""
+\n\n
+This is the task we would like you to accomplish with the given information:
+{read_text(MANIM_PROMPT_PATH)}
+"""
+
+
+CODEGEN_PROMPT_FILES = (MANIM_PROMPT_PATH, MANIM_KNOWLEDGE_PATH, MATH_TEX_KNOWLEDGE_PATH)
+
+# (file stamps, version) of the codegen prompt files as last hashed
+_prompt_version: Optional[Tuple[tuple, str]] = None
+_prompt_version_lock = threading.Lock()
+
+
+def _file_stamp(path: Path) -> tuple:
+    try:
+        st = Path(path).stat()
+    except FileNotFoundError:
+        return (str(path), None, None)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def codegen_prompt_version() -> str:
+    """
+    Hash of everything that shapes codegen prompts besides the scene itself:
+    the task prompt, both knowledge files and the retrieval settings. Any
+    edit gives stored scene code a new key, so it is regenerated.
+
+    The files are stat'ed on every call. When one has changed, the memoized
+    prompts and knowledge index are dropped too, so a long-running server
+    starts using (and storing code for) the edited files without a restart.
+    """
+    global _prompt_version
+    stamps = tuple(_file_stamp(path) for path in CODEGEN_PROMPT_FILES)
+    with _prompt_version_lock:
+        if _prompt_version is not None and _prompt_version[0] == stamps:
+            return _prompt_version[1]
+        if _prompt_version is not None:
+            print("📝 Codegen prompt files changed, reloading them")
+            read_text.cache_clear()
+            knowledge_prompt.cache_clear()
+            codegen_task_prompt.cache_clear()
+            knowledge_index.cache_clear()
+        parts = [read_text(path) for path in CODEGEN_PROMPT_FILES]
+        parts.append(json.dumps([LLM_KNOWLEDGE_RETRIEVAL, LLM_KNOWLEDGE_TOP_K, LLM_KNOWLEDGE_TOKEN_BUDGET]))
+        _prompt_version = (stamps, hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16])
+        return _prompt_version[1]
+
+
+def select_knowledge(query: str) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """
+    Knowledge sections relevant to query plus (full, sent) token counts for
+    telemetry, or (None, None) when retrieval is off and callers should send
+    the full knowledge_prompt() baseline instead.
+    """
+    if not LLM_KNOWLEDGE_RETRIEVAL:
+        return None, None
+    text, full_tokens, sent_tokens = retrieve_knowledge(query)
+    print(f"📚 Knowledge: {sent_tokens}/{full_tokens} tokens (-{1 - sent_tokens / max(full_tokens, 1):.0%})")
+    return text, (full_tokens, sent_tokens)
+
+
+def knowledge_mode() -> str:
+    """Which reference knowledge codegen and fix prompts carry: "retrieval" or the "full" baseline"""
+    return "retrieval" if LLM_KNOWLEDGE_RETRIEVAL else "full"
+
+
+def count_scene_outcome(scene_index: int, success: bool):
+    """
+    Log a scene's result next to the knowledge mode it was generated with and
+    count it for the current job, so retrieval can be compared with the
+    full-context baseline on render success, not just on tokens
+    """
+    outcome = "succeeded" if success else "failed"
+    print(f"📚 Scene {scene_index + 1} {outcome} (knowledge: {knowledge_mode()})")
+    get_telemetry().count(f"scenes_{outcome}_knowledge_{knowledge_mode()}")
+
+
+def codegen_prompts(prompt: str) -> Tuple[str, List[str], Optional[Tuple[int, int]]]:
+    """System prompt, cached system blocks and knowledge token counts for a codegen request"""
+    knowledge, knowledge_tokens = select_knowledge(prompt)
+    if knowledge is None:
+        return "", [knowledge_prompt(), codegen_task_prompt()], None
+    # The task instructions stay a cached prefix; the per-scene selection follows uncached
+    return knowledge, [codegen_task_prompt()], knowledge_tokens
+
+# -----------------------------------------------
+# Incremental code fence detection for streamed replies
+# -----------------------------------------------
+class CodeFenceExtractor:
+    """
+    Find the first fenced code block (''' or ```) in text that arrives in pieces.
+
+    feed() returns True as soon as the closing fence has been seen; the block
+    body is then available in .code and the rest of the reply (usually an
+    explanation) can be dropped.
+    """
+    FENCES = ("'''", "```")
+
+    def __init__(self):
+        self.buffer = ""
+        self.code: Optional[str] = None
+        self._fence: Optional[str] = None
+        self._body_start = 0
+        self._scan_from = 0
+
+    def feed(self, text: str) -> bool:
+        if self.code is not None:
+            return True
+        self.buffer += text
+
+        if self._fence is None:
+            openings = [(self.buffer.find(f), f) for f in self.FENCES if f in self.buffer]
+            if not openings:
+                return False
+            start, fence = min(openings)
+
+            # Wait for the whole opening line so a language tag is not mistaken for code
+            newline = self.buffer.find("\n", start + len(fence))
+            if newline == -1:
+                return False
+            tag = self.buffer[start + len(fence):newline].strip()
+            self._fence = fence
+            self._body_start = newline + 1 if not tag or tag.isidentifier() else start + len(fence)
+            self._scan_from = self._body_start
+
+        end = self.buffer.find(self._fence, self._scan_from)
+        if end == -1:
+            # The closing fence may be split across deltas, so rescan the tail next time
+            self._scan_from = max(self._body_start, len(self.buffer) - len(self._fence) + 1)
+            return False
+
+        self.code = self.buffer[self._body_start:end].strip()
+        return True
+
+    def update(self, received: str) -> bool:
+        """feed() for callers that pass the whole reply so far; starts over if the reply restarted"""
+        if not received.startswith(self.buffer):
+            self.__init__()
+        return self.feed(received[len(self.buffer):])
 
-# Initialize the LLM client
-llm = LLMClient(model="claude-sonnet-4-20250514", temperature=0.3, max_tokens=8000)
 
-# Load Manim knowledge and prompt template
-manim_knowledge = MANIM_KNOWLEDGE_PATH.read_text(encoding="utf-8")
-manim_prompt_template = MANIM_PROMPT_PATH.read_text(encoding="utf-8")
-math_tex_knowledge = Path("data/math_tex_knowledge.txt").read_text(encoding="utf-8")
+def extract_fenced_code(raw_output: str) -> str:
+    """Return the first fenced code block of a complete reply ("" if there is none)"""
+    extractor = CodeFenceExtractor()
+    extractor.feed(raw_output)
+    return extractor.code or ""
+
+
+def request_code(system_prompt: str, user_prompt: str, cached_system: List[str],
+                 client: Optional["LLMClient"] = None) -> str:
+    """Ask the LLM for code, streaming and stopping as soon as the first code block closes"""
+    client = client or codegen_llm()
+    if not LLM_STREAM_CODEGEN:
+        return client.chat(system_prompt, user_prompt, cached_system=cached_system)
+
+    extractor = CodeFenceExtractor()
+    return client.chat_stream(
+        system_prompt, user_prompt, stop=extractor.update, cached_system=cached_system, stop_key="first-code-block"
+    )
 
 # -----------------------------------------------
 # Generate code from LLM and extract Python code block
@@ -34,121 +241,159 @@ def generate_manim_code(prompt: str) -> str:
     """
     FINAL FIXED version that handles all possible LLM output formats
     """
-    system_prompt = f"""
-This is the full breakdown on how to use manim:
-{manim_knowledge}
-\n\n
-This is the full breakdown on how to use math_tex::
-{math_tex_knowledge}
-\n\n
-This is the task we would like you to accomplish with the given information:
-{manim_prompt_template}
-"""
-    
     print(f"🔧 DEBUG: Generating Manim code...")
     print(f"🔧 DEBUG: Prompt preview: {prompt[:100]}...")
-    
+
     try:
-        # Make the LLM call
-        raw_output = llm.chat(system_prompt, prompt)
-        
+        # Make the LLM call (streamed, cut off once the code block is complete)
+        system_prompt, cached_system, knowledge_tokens = codegen_prompts(prompt)
+        with llm_context(stage="codegen", knowledge_tokens=knowledge_tokens):
+            raw_output = request_code(system_prompt, prompt, cached_system)
+
         print(f"🔧 DEBUG: LLM response received ({len(raw_output)} chars)")
         print(f"🔧 DEBUG: Response preview: {raw_output[:200]}...")
         print(f"🔧 DEBUG: Response end: ...{raw_output[-200:]}")
+
+        return extract_manim_code(raw_output)
         
-        # Try multiple extraction patterns in order of likelihood
-        patterns = [
-            # Pattern 1: Triple single quotes (expected by prompt)
-            (r"'''(.*?)'''", "triple single quotes"),
-            
-            # Pattern 2: Markdown python code blocks
-            (r"```python\s*(.*?)\s*```", "markdown python"),
-            
-            # Pattern 3: Markdown code blocks without language
-            (r"```\s*(.*?)\s*```", "markdown generic"),
-            
-            # Pattern 4: Any content between code markers
-            (r"`{3}python\s*(.*?)\s*`{3}", "backtick python"),
-            (r"`{3}\s*(.*?)\s*`{3}", "backtick generic"),
-        ]
-        
-        extracted_code = ""
-        used_pattern = None
+    except Exception as e:
+        print(f"❌ DEBUG: Exception in generate_manim_code: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return ""
+
+
+async def agenerate_manim_code(prompt: str) -> str:
+    """
+    generate_manim_code() for callers on an event loop. The request goes
+    through LLMClient.achat on the loop's pooled connections, so it is not
+    streamed or cut off at the closing fence.
+    """
+    try:
+        system_prompt, cached_system, knowledge_tokens = codegen_prompts(prompt)
+        with llm_context(stage="codegen", knowledge_tokens=knowledge_tokens):
+            raw_output = await codegen_llm().achat(system_prompt, prompt, cached_system=cached_system)
+        return extract_manim_code(raw_output)
+    except Exception as e:
+        print(f"❌ Async code generation failed: {str(e)}")
+        return ""
+
+
+def batch_generate_manim_code(prompts: List[str]) -> List[str]:
+    """
+    Generate code for many prompts through one provider message batch.
+    Slower to come back than live calls but billed at the batch discount;
+    entries that fail come back as "".
+    """
+    print(f"📦 Batching code generation for {len(prompts)} scenes...")
+    try:
+        batch = codegen_llm().batch()
+        futures = []
+        for prompt in prompts:
+            system_prompt, cached_system, knowledge_tokens = codegen_prompts(prompt)
+            with llm_context(stage="codegen", knowledge_tokens=knowledge_tokens):
+                futures.append(batch.add(system_prompt, prompt, cached_system=cached_system))
+        batch.run()
+        return [extract_manim_code(future.result()) if future.result() else "" for future in futures]
+    except Exception as e:
+        print(f"❌ Batch code generation failed: {str(e)}")
+        return [""] * len(prompts)
+
+
+def extract_manim_code(raw_output: str) -> str:
+    """
+    Pull the Manim code out of a complete LLM reply, whatever format it came in
+    """
+    # The fence scan used while streaming usually settles it without the regex cascade
+    extracted_code = extract_fenced_code(raw_output)
+    used_pattern = "code fence scan" if extracted_code else None
+
+    # Try multiple extraction patterns in order of likelihood
+    patterns = [
+        # Pattern 1: Triple single quotes (expected by prompt)
+        (r"'''(.*?)'''", "triple single quotes"),
         
-        for pattern, description in patterns:
-            print(f"🔧 DEBUG: Trying {description} pattern...")
-            match = re.search(pattern, raw_output, flags=re.DOTALL)
-            if match:
-                extracted_code = match.group(1).strip()
-                used_pattern = description
-                print(f"✅ DEBUG: {description} pattern matched! ({len(extracted_code)} chars)")
-                break
-            else:
-                print(f"❌ DEBUG: {description} pattern - no match")
+        # Pattern 2: Markdown python code blocks
+        (r"```python\s*(.*?)\s*```", "markdown python"),
         
-        # If no patterns worked, try manual extraction
-        if not extracted_code:
-            print(f"🔧 DEBUG: No patterns matched, trying manual extraction...")
-            
-            # Look for Python code indicators
-            code_indicators = [
-                "from manim import",
-                "import manim",
-                "class ",
-                "def construct("
-            ]
-            
-            for indicator in code_indicators:
-                if indicator in raw_output:
-                    print(f"🔧 DEBUG: Found '{indicator}' - attempting extraction")
-                    start_pos = raw_output.find(indicator)
-                    
-                    # Extract from this point to the end, or until we find a clear endpoint
-                    potential_code = raw_output[start_pos:].strip()
-                    
-                    # Try to find a reasonable endpoint
-                    endpoints = ["\n\n#", "\n\nNote:", "\n\nExplanation:", "```", "'''"]
-                    for endpoint in endpoints:
-                        if endpoint in potential_code:
-                            end_pos = potential_code.find(endpoint)
-                            potential_code = potential_code[:end_pos].strip()
-                            break
-                    
-                    if len(potential_code) > 50:  # Reasonable minimum for Python code
-                        extracted_code = potential_code
-                        used_pattern = f"manual extraction from '{indicator}'"
-                        print(f"🔧 DEBUG: Manual extraction successful ({len(extracted_code)} chars)")
-                        break
+        # Pattern 3: Markdown code blocks without language
+        (r"```\s*(.*?)\s*```", "markdown generic"),
         
-        # Final validation
+        # Pattern 4: Any content between code markers
+        (r"`{3}python\s*(.*?)\s*`{3}", "backtick python"),
+        (r"`{3}\s*(.*?)\s*`{3}", "backtick generic"),
+    ]
+    
+    for pattern, description in patterns:
         if extracted_code:
-            print(f"✅ DEBUG: Successfully extracted code using {used_pattern}")
-            print(f"🔧 DEBUG: Code preview: {extracted_code[:300]}...")
-            
-            # Quick validation
-            if "class" in extracted_code and "Scene" in extracted_code:
-                print(f"✅ DEBUG: Code appears valid (contains class and Scene)")
-            else:
-                print(f"⚠️ DEBUG: Code might be incomplete (missing class/Scene)")
-                
-            # Check for common issues
-            if "from manim import" not in extracted_code and "import manim" not in extracted_code:
-                print(f"⚠️ DEBUG: Code missing manim import - adding it")
-                extracted_code = "from manim import *\n" + extracted_code
-                
+            break
+        print(f"🔧 DEBUG: Trying {description} pattern...")
+        match = re.search(pattern, raw_output, flags=re.DOTALL)
+        if match:
+            extracted_code = match.group(1).strip()
+            used_pattern = description
+            print(f"✅ DEBUG: {description} pattern matched! ({len(extracted_code)} chars)")
+            break
         else:
-            print(f"❌ DEBUG: COMPLETE FAILURE - No code could be extracted!")
-            print(f"🔧 DEBUG: Full LLM response:")
-            print(f"{raw_output}")
-            print(f"🔧 DEBUG: This indicates a fundamental issue with the LLM response format")
+            print(f"❌ DEBUG: {description} pattern - no match")
+    
+    # If no patterns worked, try manual extraction
+    if not extracted_code:
+        print(f"🔧 DEBUG: No patterns matched, trying manual extraction...")
         
-        return extracted_code
+        # Look for Python code indicators
+        code_indicators = [
+            "from manim import",
+            "import manim",
+            "class ",
+            "def construct("
+        ]
         
-    except Exception as e:
-        print(f"❌ DEBUG: Exception in generate_manim_code: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return ""
+        for indicator in code_indicators:
+            if indicator in raw_output:
+                print(f"🔧 DEBUG: Found '{indicator}' - attempting extraction")
+                start_pos = raw_output.find(indicator)
+                
+                # Extract from this point to the end, or until we find a clear endpoint
+                potential_code = raw_output[start_pos:].strip()
+                
+                # Try to find a reasonable endpoint
+                endpoints = ["\n\n#", "\n\nNote:", "\n\nExplanation:", "```", "'''"]
+                for endpoint in endpoints:
+                    if endpoint in potential_code:
+                        end_pos = potential_code.find(endpoint)
+                        potential_code = potential_code[:end_pos].strip()
+                        break
+                
+                if len(potential_code) > 50:  # Reasonable minimum for Python code
+                    extracted_code = potential_code
+                    used_pattern = f"manual extraction from '{indicator}'"
+                    print(f"🔧 DEBUG: Manual extraction successful ({len(extracted_code)} chars)")
+                    break
+    
+    # Final validation
+    if extracted_code:
+        print(f"✅ DEBUG: Successfully extracted code using {used_pattern}")
+        print(f"🔧 DEBUG: Code preview: {extracted_code[:300]}...")
+        
+        # Quick validation
+        if "class" in extracted_code and "Scene" in extracted_code:
+            print(f"✅ DEBUG: Code appears valid (contains class and Scene)")
+        else:
+            print(f"⚠️ DEBUG: Code might be incomplete (missing class/Scene)")
+            
+        # Check for common issues
+        if "from manim import" not in extracted_code and "import manim" not in extracted_code:
+            print(f"⚠️ DEBUG: Code missing manim import - adding it")
+            extracted_code = "from manim import *\n" + extracted_code
+            
+    else:
+        print(f"❌ DEBUG: COMPLETE FAILURE - No code could be extracted!")
+        print(f"🔧 DEBUG: Full LLM response:")
+        print(f"{raw_output}")
+        print(f"🔧 DEBUG: This indicates a fundamental issue with the LLM response format")
+    
+    return extracted_code
 
 # Slugify string for safe folder names
 def safe_slugify(text: str) -> str:
@@ -173,7 +418,8 @@ def save_code(code: str, filename: str, output_dir: Path) -> Path:
         f.write(code)
     return py_file
 
-def concatenate_scene_videos(video_dir: Path, successful_scenes: List[int]) -> Optional[Path]:
+def concatenate_scene_videos(video_dir: Path, successful_scenes: List[int],
+                             quality: QualityTier = FINAL_TIER) -> Optional[Path]:
     """
     Concatenate all successful scene videos into final_video.mp4
     """
@@ -188,8 +434,8 @@ def concatenate_scene_videos(video_dir: Path, successful_scenes: List[int]) -> O
     for scene_idx in sorted(successful_scenes):
         scene_num = scene_idx + 1  # Convert 0-based to 1-based
         
-        # Manim's actual output structure includes /media/videos/
-        video_path = video_dir / "media" / "videos" / f"scene_{scene_num}" / "1080p60" / f"scene_{scene_num}.mp4"
+        # Manim's actual output structure includes /media/videos/<scene>/<quality>/
+        video_path = scene_video_path(video_dir, f"scene_{scene_num}", quality)
         
         if video_path.exists():
             video_files.append(video_path)
@@ -217,7 +463,7 @@ def concatenate_scene_videos(video_dir: Path, successful_scenes: List[int]) -> O
     final_path = video_dir / "final_video.mp4"
     
     cmd = [
-        FFMPEG_PATH, "-y", "-f", "concat", "-safe", "0",
+        require_tool("ffmpeg"), "-y", "-f", "concat", "-safe", "0",
         "-i", str(list_file), "-c", "copy", str(final_path)
     ]
     
@@ -236,14 +482,73 @@ def concatenate_scene_videos(video_dir: Path, successful_scenes: List[int]) -> O
         return None
 
 # Render .py file using Manim with error capture
-def render_code(py_file: Path, scene_name: str, output_dir: Path) -> Tuple[bool, str]:
+def render_code(py_file: Path, scene_name: str, output_dir: Path, quality: QualityTier = FINAL_TIER,
+                use_pool: bool = RENDER_POOL_ENABLED) -> Tuple[bool, str]:
+    """
+    Render Manim code at the given quality tier and return (success, error_message).
+    Uses the warm worker pool when enabled, the manim CLI otherwise or if
+    the pool cannot run here.
     """
-    Render Manim code and return (success, error_message)
+    if use_pool:
+        print(f"🎬 Rendering {scene_name} from {py_file.name} at {quality.folder} (worker pool)...")
+        try:
+            success, error_message = get_render_pool().render(
+                py_file, scene_name, output_dir, f"{py_file.stem}.mp4", config=quality.manim_config
+            )
+        except RenderPoolUnavailable as e:
+            print(f"⚠️ Render pool unavailable ({e}), using the manim CLI")
+        else:
+            if success:
+                print(f"✅ Render complete for {py_file.name}")
+            else:
+                print(f"❌ Render failed for {py_file.name}")
+                print(f"Error (first 300 chars): {error_message[:300]}...")
+            return success, error_message
+
+    return render_code_cli(py_file, scene_name, output_dir, quality)
+
+
+def validate_code(py_file: Path, scene_name: str, output_dir: Path,
+                  use_pool: bool = RENDER_POOL_ENABLED) -> Tuple[bool, str, Optional[float]]:
+    """
+    Run the scene's construct() without encoding frames and return
+    (success, error_message, scene duration in seconds). In the worker pool
+    animations are skipped rather than drawn, so runtime errors (bad
+    MathTex, wrong kwargs, index errors) show up in seconds rather than
+    after a full render. The CLI fallback (`manim --dry_run` at preview
+    quality) still draws every frame and reports no duration.
+    """
+    if use_pool:
+        print(f"🧪 Dry run of {scene_name} from {py_file.name} (worker pool)...")
+        try:
+            success, error_message, duration = get_render_pool().validate(py_file, scene_name, output_dir)
+        except RenderPoolUnavailable as e:
+            print(f"⚠️ Render pool unavailable ({e}), using the manim CLI")
+        else:
+            if success:
+                print(f"✅ Dry run passed for {py_file.name} ({duration or 0:.1f}s of animation)")
+            else:
+                print(f"❌ Dry run failed for {py_file.name}")
+                print(f"Error (first 300 chars): {error_message[:300]}...")
+            return success, error_message, duration
+
+    success, error_message = render_code_cli(py_file, scene_name, output_dir, PREVIEW_TIER, dry_run=True)
+    return success, error_message, None
+
+
+def render_code_cli(py_file: Path, scene_name: str, output_dir: Path,
+                    quality: QualityTier = FINAL_TIER, dry_run: bool = False) -> Tuple[bool, str]:
+    """
+    Render in a fresh `manim` subprocess and return (success, error_message).
+    With dry_run the scene runs but no files are written.
     """
-    print(f"🎬 Rendering {scene_name} from {py_file.name}...")
+    print(f"🎬 {'Dry run of' if dry_run else 'Rendering'} {scene_name} from {py_file.name} at {quality.folder}...")
+    command = ["manim", quality.cli_flag, str(py_file), scene_name, "-o", f"{py_file.stem}.mp4"]
+    if dry_run:
+        command.insert(1, "--dry_run")
     try:
         result = subprocess.run(
-            ["manim", str(py_file), scene_name, "-o", f"{py_file.stem}.mp4"],
+            command,
             cwd=output_dir,
             capture_output=True,
             text=True,
@@ -281,19 +586,15 @@ def render_code(py_file: Path, scene_name: str, output_dir: Path) -> Tuple[bool,
     except subprocess.TimeoutExpired:
         print(f"❌ Render timed out for {py_file.name}")
         return False, "Render process timed out after 5 minutes"
-def fix_manim_code(original_code: str, error_message: str, scene_description: str) -> str:
+def fix_manim_code(original_code: str, error_message: str, scene_description: str,
+                   client: Optional["LLMClient"] = None) -> str:
     """
     Ask LLM to fix broken Manim code based on error message
+    (client defaults to the main codegen model)
     """
     system_prompt = f"""
 You are a Manim expert. Fix the broken Manim code based on the error message.
 
-Manim knowledge:
-{manim_knowledge}
-
-Math tex knowledge:
-{math_tex_knowledge}
-
 Original scene requirements:
 {scene_description}
 
@@ -331,10 +632,20 @@ Common Manim issues to check:
 Return ONLY the corrected Python code wrapped in triple backticks (```).
 """
     
-    print(f"🔧 Asking LLM to fix error...")
+    # Without retrieval the full knowledge prefix is shared with generate_manim_code
+    # so fixes hit the same prompt cache
+    knowledge, knowledge_tokens = select_knowledge(f"{error_message}\n{scene_description}")
+    if knowledge is None:
+        cached_system = [knowledge_prompt()]
+    else:
+        system_prompt += knowledge
+        cached_system = []
+
+    print(f"🔧 Asking {(client or codegen_llm()).model} to fix error...")
     
     try:
-        raw_output = llm.chat(system_prompt, user_prompt)
+        with llm_context(stage="fix", knowledge_tokens=knowledge_tokens):
+            raw_output = request_code(system_prompt, user_prompt, cached_system, client)
         
         # Try multiple patterns to extract code
         patterns = [
@@ -363,10 +674,132 @@ Return ONLY the corrected Python code wrapped in triple backticks (```).
         print(f"❌ Error calling LLM for fix: {str(e)}")
         return ""
 
+def render_scene(py_file: Path, scene_name: str, output_dir: Path,
+                 expected_seconds: Optional[float] = None, retry: bool = False) -> Tuple[bool, str]:
+    """
+    Validate code with a dry run (animations skipped, nothing written), then
+    render the final quality only if it worked. The preview render only runs
+    for fixed code (retry) or when the dry run is off, so a scene that is
+    right the first time draws its frames once, in the final render. Errors from any pass come back
+    as-is for the fix loop. The dry run's scene duration is checked against
+    expected_seconds (the narration timing) when given.
+    """
+    if RENDER_DRY_RUN_FIRST:
+        success, error_message, duration = validate_code(py_file, scene_name, output_dir)
+        if not success:
+            count_preflight_event("dry_run_failures")
+            return success, error_message
+        check_scene_duration(scene_name, duration, expected_seconds)
+    preview = retry or not RENDER_DRY_RUN_FIRST
+    if preview and RENDER_PREVIEW_FIRST and PREVIEW_TIER != FINAL_TIER:
+        success, error_message = render_code(py_file, scene_name, output_dir, PREVIEW_TIER)
+        if not success:
+            return success, error_message
+    return render_code(py_file, scene_name, output_dir, FINAL_TIER)
+
+
+def prewarm_tex(code: str, output_dir: Path) -> Optional[str]:
+    """
+    Compile the scene's literal MathTex/Tex strings into the Tex cache, spread
+    over the render workers, so the render finds them warm instead of running
+    latex one formula at a time. Returns the LaTeX errors for the fix loop, or
+    None if everything compiled (or there was nothing to do).
+    """
+    if not (RENDER_TEX_PREWARM and RENDER_POOL_ENABLED):
+        return None
+    specs = extract_tex_specs(code)
+    if not specs:
+        return None
+
+    pool = get_render_pool()
+    batches = [specs[i::pool.size] for i in range(min(pool.size, len(specs)))]
+    print(f"🧮 Pre-compiling {len(specs)} LaTeX strings on {len(batches)} worker(s)...")
+    try:
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            results = list(executor.map(lambda batch: pool.compile_tex(batch, output_dir), batches))
+    except RenderPoolUnavailable as e:
+        print(f"⚠️ Render pool unavailable ({e}), LaTeX compiles during the render")
+        return None
+
+    errors = [message for success, message in results if not success and message]
+    if not errors:
+        return None
+    count_preflight_event("latex_failures")
+    print(f"❌ LaTeX pre-compile failed:\n{errors[0][:300]}")
+    return "LaTeX compilation failed before rendering (the scene was not rendered):\n" + "\n".join(errors)
+
+
+def expected_scene_seconds(concept) -> Optional[float]:
+    """How long the narration for a scene should take, if the concept carries timing"""
+    chunks = getattr(concept, "narration_chunks", None)
+    if chunks:
+        return sum(chunk["duration"] for chunk in chunks)
+    return getattr(concept, "target_seconds", None)
+
+
+def check_scene_duration(scene_name: str, duration: Optional[float], expected_seconds: Optional[float]) -> bool:
+    """Warn (and count) when a scene's animation time is off from its narration by more than the tolerance"""
+    if duration is None or not expected_seconds:
+        return True
+    if abs(duration - expected_seconds) <= RENDER_DURATION_TOLERANCE * expected_seconds:
+        return True
+    count_preflight_event("duration_mismatches")
+    print(f"⏱️ {scene_name} runs {duration:.1f}s but its narration takes ~{expected_seconds:.1f}s")
+    return False
+
+
+def preflight_code(code: str) -> Optional[str]:
+    """Static check of code before any render; returns the fix-loop error message, or None if it looks renderable"""
+    if not RENDER_PREFLIGHT:
+        return None
+    diagnostics = check_manim_code(code)
+    count_preflight(diagnostics)
+    if not diagnostics:
+        return None
+    print(f"🛫 Pre-flight check found {len(diagnostics)} problem(s), skipping render:")
+    for diagnostic in diagnostics:
+        print(f"   {diagnostic}")
+    return format_diagnostics(diagnostics)
+
+def stored_scene_code(concept) -> Optional[str]:
+    """Code that already rendered for this scene description with the current prompts and model"""
+    if not SCENE_CODE_CACHE_ENABLED:
+        return None
+    code = get_scene_code_store().get(concept.scene_description, codegen_prompt_version(), CODEGEN_MODEL)
+    if code:
+        print(f"📦 Reusing validated code for: {concept.scene_description[:60]}...")
+    return code
+
+
+def remember_scene_code(concept, code: Optional[str], produced_by: str = CODEGEN_MODEL):
+    """
+    Store code that rendered for this scene, tagged with the model that wrote
+    its final version, or forget the entry (code=None) when it failed
+    """
+    if not SCENE_CODE_CACHE_ENABLED:
+        return
+    store = get_scene_code_store()
+    try:
+        if code is None:
+            store.discard(concept.scene_description, codegen_prompt_version(), CODEGEN_MODEL)
+        else:
+            store.put(concept.scene_description, codegen_prompt_version(), CODEGEN_MODEL, code, produced_by)
+    except OSError as e:
+        # The scene itself is done; a store failure only costs a future cache hit
+        print(f"⚠️ Could not update scene code cache: {e}")
+
+
 # Process a single scene with automatic error correction
-def process_single_scene(concept_data: Tuple[int, object, Path, Path]) -> Tuple[int, bool]:
+def scene_prompt(scene_index: int, concept) -> str:
+    return f"Scene description for concept {scene_index + 1}:\n{concept.scene_description}"
+
+
+def process_single_scene(concept_data: Tuple[int, object, Path, Path],
+                         initial_code: Optional[str] = None) -> Tuple[int, bool]:
     """
     Process a single scene with automatic error correction if rendering fails.
+    initial_code (e.g. from a batch) skips the first generation call, and so
+    does validated code stored for the same scene description.
     """
     scene_index, concept, topic_code_dir, topic_video_dir = concept_data
     max_retries = 3
@@ -375,14 +808,15 @@ def process_single_scene(concept_data: Tuple[int, object, Path, Path]) -> Tuple[
     
     try:
         # Generate initial code
-        prompt = f"Scene description for concept {scene_index + 1}:\n{concept.scene_description}"
-        code = generate_manim_code(prompt)
+        code = initial_code or stored_scene_code(concept) or generate_manim_code(scene_prompt(scene_index, concept))
 
         if not code.strip():
             print(f"⚠️ Skipping scene {scene_index + 1} — empty code.")
             return (scene_index, False)
 
         filename = f"scene_{scene_index + 1}"
+        code_model = CODEGEN_MODEL  # model that wrote the current code (a fix tier after a fix)
+        pending_fix = None  # (tier, latency, error) of the fix being rendered, for cascade stats
         
         # Try rendering with automatic error correction
         for attempt in range(max_retries + 1):
@@ -392,21 +826,59 @@ def process_single_scene(concept_data: Tuple[int, object, Path, Path]) -> Tuple[
             # Save and try to render current code
             py_file = save_code(code, filename, topic_code_dir)
             scene_class = extract_scene_class(code)
-            success, error_message = render_code(py_file, scene_class, topic_video_dir)
+            video_path = scene_video_path(topic_video_dir, py_file.stem, FINAL_TIER)
+            cache_key = None
+            if RENDER_CACHE_ENABLED:
+                cache_key = get_render_cache().make_key(
+                    code, scene_class, FINAL_TIER, tex_template_id(topic_video_dir)
+                )
+            if cache_key is not None and get_render_cache().fetch(cache_key, video_path):
+                print(f"♻️ Scene {scene_index + 1} reused a cached render of identical code")
+                success, error_message = True, ""
+            else:
+                preflight_error = preflight_code(code) or prewarm_tex(code, topic_video_dir)
+                if preflight_error:
+                    success, error_message = False, preflight_error
+                else:
+                    success, error_message = render_scene(
+                        py_file, scene_class, topic_video_dir, expected_scene_seconds(concept), retry=attempt > 0
+                    )
+                    if success and cache_key is not None:
+                        get_render_cache().store(cache_key, video_path)
+
+            if pending_fix is not None:
+                fix_tier, fix_latency, fixed_error = pending_fix
+                fix_cascade().report(fix_tier, success, fix_latency, fixed_error)
+                pending_fix = None
             
             if success:
                 print(f"✅ Scene {scene_index + 1} rendered successfully!")
+                remember_scene_code(concept, code, code_model)
                 return (scene_index, True)
             
             # If we failed and have retries left, ask LLM to fix it
             if attempt < max_retries and error_message:
                 print(f"🔧 Attempting to fix scene {scene_index + 1} (attempt {attempt + 1}/{max_retries})")
                 
-                # Ask LLM to fix the code
-                fixed_code = fix_manim_code(code, error_message, concept.scene_description)
+                # Ask LLM to fix the code, starting on the cheapest suitable tier
+                tier = fix_cascade().choose(attempt, error_message)
+                while True:
+                    fix_started = time.time()
+                    fixed_code = fix_manim_code(code, error_message, concept.scene_description, tier.client)
+                    fix_latency = time.time() - fix_started
+                    if fixed_code and fixed_code != code:
+                        pending_fix = (tier, fix_latency, error_message)
+                        break
+                    # No usable answer counts as a failure of this tier
+                    fix_cascade().report(tier, False, fix_latency, error_message)
+                    tier = fix_cascade().escalate(tier)
+                    if tier is None:
+                        break
+                    print(f"⬆️ Escalating fix for scene {scene_index + 1} to {tier.client.model}")
                 
                 if fixed_code and fixed_code != code:
                     code = fixed_code
+                    code_model = tier.client.model
                     print(f"🆕 Updated code for scene {scene_index + 1}")
                 else:
                     print(f"❌ LLM couldn't fix the code for scene {scene_index + 1}")
@@ -415,6 +887,7 @@ def process_single_scene(concept_data: Tuple[int, object, Path, Path]) -> Tuple[
                 break
         
         print(f"❌ Scene {scene_index + 1} failed after {max_retries} attempts")
+        remember_scene_code(concept, None)
         return (scene_index, False)
         
     except Exception as e:
@@ -422,11 +895,21 @@ def process_single_scene(concept_data: Tuple[int, object, Path, Path]) -> Tuple[
         return (scene_index, False)
 
 # Process all scenes in a script, in parallel
-def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] = None):
+def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] = None,
+                                    batch_codegen: bool = LLM_BATCH_CODEGEN,
+                                    concept_stream: Optional[Iterable[ConceptSegment]] = None,
+                                    initial_codes: Optional[Dict[int, str]] = None):
     """
     Generate and render all scenes in parallel with automatic error correction.
+    With batch_codegen the first draft of every scene is requested in a single
+    message batch; fixes still go through live calls.
+    With concept_stream (e.g. stream_script()) each scene is submitted as its
+    concept arrives and appended to script.concepts; batching is skipped since
+    it needs every prompt up front.
+    initial_codes maps scene indices to first drafts generated elsewhere (see
+    agenerate_all_scenes_from_script); those scenes skip codegen and batching.
     """
-    if not script.concepts:
+    if concept_stream is None and not script.concepts:
         print("❌ No concepts in script!")
         return
         
@@ -438,18 +921,40 @@ def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] =
     topic_video_dir.mkdir(parents=True, exist_ok=True)
 
     print(f"\n==============================")
-    print(f"🚀 Processing {len(script.concepts)} scenes with auto-correction")
+    print(f"🚀 Processing {len(script.concepts) if concept_stream is None else 'streamed'} scenes with auto-correction")
     print(f"📁 Code output: {topic_code_dir}")
     print(f"🎥 Video output: {topic_video_dir}")
     print("==============================")
 
-    # Prepare data for parallel processing
-    concept_data_list = [
-        (i, concept, topic_code_dir, topic_video_dir)
-        for i, concept in enumerate(script.concepts)
-    ]
-
     start_time = time.time()
+
+    if concept_stream is not None:
+        def concepts():
+            for concept in concept_stream:
+                script.concepts.append(concept)
+                yield len(script.concepts) - 1, concept
+        concept_data_list = ((i, concept, topic_code_dir, topic_video_dir) for i, concept in concepts())
+        initial_codes = dict(initial_codes or {})
+    else:
+        # Prepare data for parallel processing
+        concept_data_list = [
+            (i, concept, topic_code_dir, topic_video_dir)
+            for i, concept in enumerate(script.concepts)
+        ]
+        initial_codes = dict(initial_codes or {})
+        if batch_codegen:
+            # Scenes with validated code stored are left out of the batch
+            for i, concept, _, _ in concept_data_list:
+                code = initial_codes.get(i) or stored_scene_code(concept)
+                if code:
+                    initial_codes[i] = code
+            pending = [(i, concept) for i, concept, _, _ in concept_data_list if i not in initial_codes]
+            if pending:
+                initial_codes.update(zip(
+                    [i for i, _ in pending],
+                    batch_generate_manim_code([scene_prompt(i, concept) for i, concept in pending])
+                ))
+
     successful_scenes = 0
     failed_scenes = 0
     successful_scene_indices = []  # Track which scenes succeeded
@@ -458,7 +963,10 @@ def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] =
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Submit all tasks
         future_to_scene = {
-            executor.submit(process_single_scene, concept_data): concept_data[0]
+            # Each worker runs in a copy of this context so LLM telemetry keeps the job id
+            executor.submit(
+                contextvars.copy_context().run, process_single_scene, concept_data, initial_codes.get(concept_data[0])
+            ): concept_data[0]
             for concept_data in concept_data_list
         }
 
@@ -467,6 +975,7 @@ def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] =
             scene_index = future_to_scene[future]
             try:
                 scene_index, success = future.result()
+                count_scene_outcome(scene_index, success)
                 if success:
                     successful_scenes += 1
                     successful_scene_indices.append(scene_index)
@@ -476,8 +985,13 @@ def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] =
                     print(f"❌ Scene {scene_index + 1} failed permanently")
             except Exception as e:
                 failed_scenes += 1
+                count_scene_outcome(scene_index, False)
                 print(f"❌ Scene {scene_index + 1} threw exception: {str(e)}")
 
+    if not script.concepts:
+        print("❌ No concepts in script!")
+        return
+
     end_time = time.time()
     total_time = end_time - start_time
 
@@ -486,7 +1000,34 @@ def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] =
     print(f"⏱️  Total time: {total_time:.2f} seconds")
     print(f"✅ Successful scenes: {successful_scenes}")
     print(f"❌ Failed scenes: {failed_scenes}")
-    print(f"📊 Success rate: {(successful_scenes / len(script.concepts) * 100):.1f}%")
+    print(f"📊 Success rate: {(successful_scenes / len(script.concepts) * 100):.1f}% "
+          f"(knowledge: {knowledge_mode()})")
+    usage = codegen_llm().usage_stats()
+    print(f"🧾 LLM tokens: {usage['input_tokens']:,} in / {usage['output_tokens']:,} out "
+          f"(prompt cache: {usage['cache_read_input_tokens']:,} read, "
+          f"{usage['cache_creation_input_tokens']:,} written)")
+    for tier_name, tier_stats in fix_cascade().stats().items():
+        if tier_stats["calls"]:
+            print(f"🪜 Fix tier {tier_name} ({tier_stats['model']}): {tier_stats['successes']}/{tier_stats['calls']} fixed, "
+                  f"{tier_stats['mean_latency_seconds']:.1f}s avg")
+    preflight = preflight_stats()
+    if preflight.get("checks"):
+        print(f"🛫 Pre-flight: {preflight.get('renders_avoided', 0)}/{preflight['checks']} renders avoided, "
+              f"{preflight.get('latex_failures', 0)} LaTeX failures caught before rendering, "
+              f"{preflight.get('dry_run_failures', 0)} caught by dry runs, "
+              f"{preflight.get('duration_mismatches', 0)} scene/narration duration mismatches")
+    if SCENE_CODE_CACHE_ENABLED:
+        scene_code = get_scene_code_store().stats()
+        print(f"📦 Scene code cache: {scene_code['hits']} hits / {scene_code['misses']} misses "
+              f"({scene_code['hit_rate']:.0%})")
+    if RENDER_CACHE_ENABLED:
+        renders = get_render_cache().stats()
+        print(f"♻️ Render cache: {renders['hits']} hits / {renders['misses']} misses ({renders['hit_rate']:.0%})")
+    if ASSET_CACHE_ENABLED:
+        assets = get_asset_cache().stats()
+        if assets["tex"]["hits"] + assets["tex"]["misses"]:
+            print(f"🧮 Tex cache: {assets['tex']['hits']} hits / {assets['tex']['misses']} compiles "
+                  f"({assets['tex']['hit_rate']:.0%}), {assets['size_bytes'] / 1e6:.1f} MB cached")
     print("==============================")
 
     # Concatenate successful videos
@@ -503,6 +1044,34 @@ def generate_all_scenes_from_script(script: Script, max_workers: Optional[int] =
     
     return None
 
+
+async def agenerate_all_scenes_from_script(script: Script, max_workers: Optional[int] = None):
+    """
+    generate_all_scenes_from_script() for callers on an event loop (e.g. the
+    API server's background tasks). The first draft of every scene is
+    requested concurrently with LLMClient.achat, sharing the loop's pooled
+    connections; rendering and fixes then run in a worker thread.
+    """
+    if not script.concepts:
+        print("❌ No concepts in script!")
+        return None
+
+    initial_codes = {}
+    for i, concept in enumerate(script.concepts):
+        code = stored_scene_code(concept)
+        if code:
+            initial_codes[i] = code
+    pending = [(i, concept) for i, concept in enumerate(script.concepts) if i not in initial_codes]
+    if pending:
+        print(f"⚡ Drafting {len(pending)} scenes concurrently...")
+        drafts = await asyncio.gather(*(agenerate_manim_code(scene_prompt(i, concept)) for i, concept in pending))
+        initial_codes.update((i, code) for (i, _), code in zip(pending, drafts) if code)
+
+    # Scenes whose draft failed are generated again by the sync pipeline
+    return await asyncio.to_thread(
+        generate_all_scenes_from_script, script, max_workers, batch_codegen=False, initial_codes=initial_codes
+    )
+
 # CLI test
 if __name__ == "__main__":
     topic = "Teach me what a derivative is?"
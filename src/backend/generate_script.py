@@ -1,28 +1,34 @@
 from dotenv import load_dotenv
 import os
-import re
-import yaml
-from dataclasses import dataclass
-from typing import List
+import queue
+import threading
+import contextvars
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Iterator, List, Optional, Tuple
 import json
+import re
 # ---------------------------
 # Settings and Config
 # ---------------------------
-from config.settings import WORDS_PER_MINUTE, SOPHISTICATION_DESCRIPTIONS
+from config.settings import WORDS_PER_MINUTE, SOPHISTICATION_DESCRIPTIONS, SCRIPT_CACHE_ENABLED, LLM_STRUCTURED_SCRIPT
 from config.paths import SCENE_EXAMPLES_PATH, SCRIPT_GEN_PROMPT_PATH
-from config.llm import LLMClient
-
-# ---------------------------
-# Load Prompt Components
-# ---------------------------
-SCENE_EXAMPLES = yaml.safe_load(SCENE_EXAMPLES_PATH.read_text(encoding="utf-8"))
-SCRIPT_GEN_PROMPT_TEMPLATE = SCRIPT_GEN_PROMPT_PATH.read_text(encoding="utf-8")
+from config.registry import get_llm, read_text, load_yaml
+from config.llm_telemetry import llm_context
+from backend.generate_audio import speaking_rate
+from backend.script_store import get_script_store
 
 # ---------------------------
 # LLM Client Setup
 # ---------------------------
+# Prompt components and the client are loaded on first use, not at import
 load_dotenv()
-llm = LLMClient(model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=8000)
+
+def script_llm():
+    return get_llm(model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=8000)
+
+# A broken script stream is resumed from the concepts already sent at most this often
+STREAM_RESUMES = 2
 
 # ---------------------------
 # Data Models
@@ -31,6 +37,7 @@ llm = LLMClient(model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=80
 class ConceptSegment:
     narration: str
     scene_description: str
+    target_seconds: Optional[float] = None  # only known for structured scripts
 
 @dataclass
 class Script:
@@ -39,20 +46,24 @@ class Script:
     sophistication_level: int
     concepts: List[ConceptSegment]
 
+    def to_dict(self) -> dict:
+        return {
+            "topic": self.topic,
+            "duration_minutes": self.duration_minutes,
+            "sophistication_level": self.sophistication_level,
+            "concepts": [
+                {
+                    "narration": c.narration,
+                    "scene_description": c.scene_description,
+                    "target_seconds": c.target_seconds
+                } for c in self.concepts
+            ]
+        }
+
     def save(self, path: str):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, "w") as f:
-            json.dump({
-                "topic": self.topic,
-                "duration_minutes": self.duration_minutes,
-                "sophistication_level": self.sophistication_level,
-                "concepts": [
-                    {
-                        "narration": c.narration,
-                        "scene_description": c.scene_description
-                    } for c in self.concepts
-                ]
-            }, f, indent=2)
+            json.dump(self.to_dict(), f, indent=2)
 
     @staticmethod
     def load(path: str) -> "Script":
@@ -63,14 +74,224 @@ class Script:
             duration_minutes=data["duration_minutes"],
             sophistication_level=data["sophistication_level"],
             concepts=[
-                ConceptSegment(c["narration"], c["scene_description"])
+                ConceptSegment(c["narration"], c["scene_description"], c.get("target_seconds"))
                 for c in data["concepts"]
             ]
         )
 
+class ScriptGenerationError(RuntimeError):
+    """The script could not be generated (stream_script raises it while iterating)"""
+
+# ---------------------------
+# Structured Output
+# ---------------------------
+def segments_schema(items: str, scene_hint: str) -> dict:
+    """
+    JSON schema for a script returned as data: a list of items (concepts or
+    steps), each with narration, scene description and target length
+    """
+    return {
+        "type": "object",
+        "properties": {
+            items: {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "narration": {
+                            "type": "string",
+                            "description": "Spoken narration, math written out in words"
+                        },
+                        "scene_description": {"type": "string", "description": scene_hint},
+                        "target_seconds": {
+                            "type": "number",
+                            "description": "How long the narration takes to speak, in seconds"
+                        }
+                    },
+                    "required": ["narration", "scene_description", "target_seconds"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": [items],
+        "additionalProperties": False
+    }
+
+
+SCRIPT_SCHEMA = segments_schema(
+    "concepts", "Scene description in the same format as the examples (static states, animations, durations)"
+)
+
+# How scripts were parsed: structured (JSON), markers (text fallback) and
+# default_scene (concepts that got a placeholder scene description)
+_parse_paths = Counter()
+_parse_paths_lock = threading.Lock()
+
+
+def count_parse_path(path: str, n: int = 1):
+    with _parse_paths_lock:
+        _parse_paths[path] += n
+
+
+def script_parse_stats() -> dict:
+    with _parse_paths_lock:
+        return dict(_parse_paths)
+
+
+def segments_from_json(data: Optional[dict], items: str) -> List[dict]:
+    """Valid entries of a structured script reply ([] if there are none)"""
+    if not data or not isinstance(data.get(items), list):
+        return []
+    entries = []
+    for entry in data[items]:
+        if not isinstance(entry, dict):
+            continue
+        narration = str(entry.get("narration") or "").strip()
+        scene_description = str(entry.get("scene_description") or "").strip()
+        if not narration or not scene_description:
+            continue
+        try:
+            target_seconds = float(entry["target_seconds"]) if entry.get("target_seconds") is not None else None
+        except (TypeError, ValueError):
+            target_seconds = None
+        entries.append({"narration": narration, "scene_description": scene_description,
+                        "target_seconds": target_seconds})
+    return entries
+
+def structured_prompts(system_prompt: str, user_prompt: str, marker: str, items: str) -> Tuple[str, str]:
+    """
+    Rewrite marker-format prompts ([NEW marker] ... [END marker|| Scene description: ...])
+    for a JSON reply: the marker rules ask for entries of items instead and the
+    markers are taken out of the example, so the two prompts don't disagree.
+    """
+    new_marker, end_marker = re.escape(f"[NEW {marker}]"), re.escape(f"[END {marker}|| Scene description:")
+    entry = f"as one entry of {items} with its narration, its scene description and the seconds its narration takes to speak"
+    system_prompt = re.sub(rf"Mark the beginning of each ([\w ]+?) with {new_marker}\.",
+                           rf"Return each \1 {entry}.", system_prompt)
+    system_prompt = re.sub(rf"End each ([\w ]+?) with {end_marker} \.\.\.\]",
+                           r"Give each \1 a scene description", system_prompt)
+    lines = []
+    for line in system_prompt.split("\n"):
+        if line.strip() in (f"[NEW {marker}]", "]"):
+            continue
+        line = re.sub(end_marker, "Scene description:", line)
+        lines.append(line.rstrip()[:-1] if line.rstrip().endswith("]]") else line)
+    user_prompt = re.sub(rf"Use {new_marker} and {end_marker} \.\.\.\] markers for each ([\w ]+?)\.",
+                         rf"Instead of [NEW {marker}]/[END {marker}] markers, return each \1 {entry}.", user_prompt)
+    return "\n".join(lines), user_prompt
+
+
 # ---------------------------
 # FIXED Utility Functions
 # ---------------------------
+NEW_CONCEPT_MARKER = '[NEW CONCEPT]'
+END_CONCEPT_MARKER = '[END CONCEPT|| Scene description:'
+
+
+def concept_from_block(block: str) -> Optional[ConceptSegment]:
+    """
+    Parse the text after one [NEW CONCEPT] marker (None if it is empty).
+    Blocks without an END CONCEPT marker get a default scene description.
+    """
+    block = block.strip()
+    if not block:
+        return None
+
+    if END_CONCEPT_MARKER in block:
+        narration, scene_description = block.split(END_CONCEPT_MARKER, 1)
+        # Clean up scene description (remove any trailing brackets)
+        return ConceptSegment(narration.strip(), scene_description.strip().rstrip(']'))
+
+    narration = block.strip()
+    return ConceptSegment(narration, f"Show visual representation of: {narration[:100]}...")
+
+
+def continuation_prompt(user_prompt: str, written: List[ConceptSegment]) -> str:
+    """User prompt asking only for the concepts after those already written"""
+    blocks = "\n\n".join(
+        f"{NEW_CONCEPT_MARKER}\n{c.narration}\n{END_CONCEPT_MARKER} {c.scene_description}]" for c in written
+    )
+    return (
+        f"{user_prompt}\n\n"
+        f"The first {len(written)} scenes of this script are already written and must not change:\n\n"
+        f"{blocks}\n\n"
+        f"Write only the remaining scenes, starting with scene {len(written) + 1}, in the same format and "
+        f"continuing the same explanation. Do not repeat the scenes above."
+    )
+
+
+class ConceptStreamParser:
+    """
+    Pull complete concepts out of a script that arrives in pieces.
+
+    A concept is complete once the bracket opened by its END CONCEPT marker
+    is closed, or failing that when the next [NEW CONCEPT] starts. update()
+    takes the whole reply so far and returns only concepts not returned
+    before, so a reply that restarts (retried request) or is re-fed at the
+    end does not produce duplicates.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = 0
+        self._scan_from = 0
+        self._parsed = 0
+
+    def update(self, received: str) -> List[ConceptSegment]:
+        if not received.startswith(self.buffer):
+            # The reply started over: parse again, skipping what was already emitted
+            self._scan_from = 0
+            self._parsed = 0
+        self.buffer = received
+        return self._collect(final=False)
+
+    def close(self) -> List[ConceptSegment]:
+        """Concepts still open when the reply ended"""
+        return self._collect(final=True)
+
+    def _description_end(self, body_start: int, limit: int) -> Optional[int]:
+        marker = self.buffer.find(END_CONCEPT_MARKER, body_start)
+        if marker == -1 or (limit != -1 and marker > limit):
+            return None
+        depth = 1
+        for i in range(marker + len(END_CONCEPT_MARKER), limit if limit != -1 else len(self.buffer)):
+            if self.buffer[i] == '[':
+                depth += 1
+            elif self.buffer[i] == ']':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        return None
+
+    def _collect(self, final: bool) -> List[ConceptSegment]:
+        segments = []
+        while True:
+            start = self.buffer.find(NEW_CONCEPT_MARKER, self._scan_from)
+            if start == -1:
+                break
+            body_start = start + len(NEW_CONCEPT_MARKER)
+            next_start = self.buffer.find(NEW_CONCEPT_MARKER, body_start)
+
+            end = self._description_end(body_start, next_start)
+            if end is None:
+                if next_start != -1:
+                    end = next_start
+                elif final:
+                    end = len(self.buffer)
+                else:
+                    break
+            self._scan_from = end
+
+            segment = concept_from_block(self.buffer[body_start:end])
+            if segment is None:
+                continue
+            self._parsed += 1
+            if self._parsed > self.emitted:
+                self.emitted = self._parsed
+                segments.append(segment)
+        return segments
+
+
 def extract_concepts(script: str) -> List[ConceptSegment]:
     """
     FIXED version that properly handles the actual LLM output format
@@ -90,36 +311,21 @@ def extract_concepts(script: str) -> List[ConceptSegment]:
     print(f"🔍 DEBUG: Found {len(concept_blocks)} concept blocks")
     
     for i, block in enumerate(concept_blocks, 1):
-        block = block.strip()
-        if not block:
+        segment = concept_from_block(block)
+        if segment is None:
             print(f"🔧 Concept {i} is empty, skipping")
             continue
             
-        print(f"🔧 Processing concept {i}: {block[:100]}...")
+        print(f"🔧 Processing concept {i}: {block.strip()[:100]}...")
+        segments.append(segment)
         
-        # Look for the END CONCEPT marker
-        if '[END CONCEPT|| Scene description:' in block:
-            # Split into narration and scene description
-            parts = block.split('[END CONCEPT|| Scene description:', 1)
-            if len(parts) == 2:
-                narration = parts[0].strip()
-                scene_description = parts[1].strip()
-                
-                # Clean up scene description (remove any trailing brackets)
-                scene_description = scene_description.rstrip(']')
-                
-                segments.append(ConceptSegment(narration, scene_description))
-                print(f"✅ Successfully parsed concept {i}")
-            else:
-                print(f"❌ Failed to split concept {i} properly")
+        if END_CONCEPT_MARKER in block:
+            print(f"✅ Successfully parsed concept {i}")
         else:
             print(f"❌ No END CONCEPT marker found in concept {i}")
-            # Create a fallback with default scene description
-            narration = block.strip()
-            default_scene = f"Show visual representation of: {narration[:100]}..."
-            segments.append(ConceptSegment(narration, default_scene))
             print(f"🔧 Created concept {i} with default scene description")
     
+    count_parse_path("default_scene", sum(1 for b in concept_blocks if b.strip() and END_CONCEPT_MARKER not in b))
     print(f"🔍 DEBUG: Final result: {len(segments)} segments extracted")
     for i, seg in enumerate(segments):
         word_count = len(seg.narration.split())
@@ -130,21 +336,19 @@ def extract_concepts(script: str) -> List[ConceptSegment]:
 # ---------------------------
 # Script Generation (unchanged)
 # ---------------------------
-def generate_script(topic: str, duration_minutes: int = 5, sophistication_level: int = 2) -> Script:
-    
-    if sophistication_level < 1 or sophistication_level > 3:
-        sophistication_level = 2
-
-    expected_words = duration_minutes * WORDS_PER_MINUTE
+def script_prompts(topic: str, duration_minutes: int, sophistication_level: int,
+                   structured: bool = False) -> Tuple[str, str]:
+    """System and user prompt for a script request (structured: ask for JSON, not markers)"""
+    expected_words = round(duration_minutes * speaking_rate(WORDS_PER_MINUTE))
     
     # Calculate reasonable scene count (aim for 2-3 minutes per scene)
     scene_count = max(3, min(8, duration_minutes // 2))
     words_per_scene = expected_words // scene_count
 
     level_desc = SOPHISTICATION_DESCRIPTIONS.get(sophistication_level)
-    scene_example = SCENE_EXAMPLES.get(str(sophistication_level))
+    scene_example = load_yaml(SCENE_EXAMPLES_PATH).get(str(sophistication_level))
 
-    system_prompt = SCRIPT_GEN_PROMPT_TEMPLATE.format(
+    system_prompt = read_text(SCRIPT_GEN_PROMPT_PATH).format(
         topic=topic,
         level_desc=level_desc,
         duration_minutes=duration_minutes,
@@ -160,22 +364,61 @@ def generate_script(topic: str, duration_minutes: int = 5, sophistication_level:
         f"Target total length: {expected_words} words ({duration_minutes} minutes when spoken). "
         f"Use [NEW CONCEPT] and [END CONCEPT|| Scene description: ...] markers for each scene."
     )
+    if structured:
+        return structured_prompts(system_prompt, user_prompt, "CONCEPT", "concepts")
+    return system_prompt, user_prompt
+
+
+def generate_structured_concepts(topic: str, duration_minutes: int, sophistication_level: int) -> List[ConceptSegment]:
+    """Request the script as JSON matching SCRIPT_SCHEMA ([] if the reply is unusable)"""
+    system_prompt, user_prompt = script_prompts(topic, duration_minutes, sophistication_level, structured=True)
+    with llm_context(stage="script"):
+        data = script_llm().chat_json(
+            system_prompt, user_prompt, SCRIPT_SCHEMA, "submit_script", "Submit the finished script, one entry per scene"
+        )
+    return [ConceptSegment(**entry) for entry in segments_from_json(data, "concepts")]
+
+
+def generate_script(topic: str, duration_minutes: int = 5, sophistication_level: int = 2,
+                    use_cache: bool = SCRIPT_CACHE_ENABLED, structured: bool = LLM_STRUCTURED_SCRIPT) -> Script:
+    
+    if sophistication_level < 1 or sophistication_level > 3:
+        sophistication_level = 2
+
+    if use_cache:
+        cached = get_script_store().get(topic, duration_minutes, sophistication_level)
+        if cached is not None:
+            return cached
+
+    expected_words = round(duration_minutes * speaking_rate(WORDS_PER_MINUTE))
+    scene_count = max(3, min(8, duration_minutes // 2))
+    words_per_scene = expected_words // scene_count
+    system_prompt, user_prompt = script_prompts(topic, duration_minutes, sophistication_level)
 
     try:
-        full_script = llm.chat(system_prompt, user_prompt)
-        
-        # Debug output to track what's happening
-        print(f"🔍 DEBUG: Raw script length: {len(full_script)} characters")
-        print(f"🔍 DEBUG: Requested {scene_count} scenes with ~{words_per_scene} words each")
-        print(f"🔍 DEBUG: Target: {expected_words} words = {duration_minutes} minutes")
-        
-        # Use the FIXED extract_concepts function
-        segments = extract_concepts(full_script)
-        print(f"🔍 DEBUG: Extracted {len(segments)} segments")
+        segments = generate_structured_concepts(topic, duration_minutes, sophistication_level) if structured else []
+        if segments:
+            count_parse_path("structured")
+            print(f"🔍 DEBUG: Structured script with {len(segments)} segments")
+        else:
+            if structured:
+                print("⚠️ Structured script unusable, falling back to markers")
+            with llm_context(stage="script"):
+                full_script = script_llm().chat(system_prompt, user_prompt)
+            
+            # Debug output to track what's happening
+            print(f"🔍 DEBUG: Raw script length: {len(full_script)} characters")
+            print(f"🔍 DEBUG: Requested {scene_count} scenes with ~{words_per_scene} words each")
+            print(f"🔍 DEBUG: Target: {expected_words} words = {duration_minutes} minutes")
+            
+            # Use the FIXED extract_concepts function
+            segments = extract_concepts(full_script)
+            count_parse_path("markers")
+            print(f"🔍 DEBUG: Extracted {len(segments)} segments")
         
         if segments:
             total_words = sum(len(seg.narration.split()) for seg in segments)
-            estimated_duration = total_words / WORDS_PER_MINUTE
+            estimated_duration = total_words / speaking_rate(WORDS_PER_MINUTE)
             print(f"🔍 DEBUG: Actual: {total_words} words = {estimated_duration:.1f} minutes")
             
             # Show word count per segment
@@ -186,15 +429,112 @@ def generate_script(topic: str, duration_minutes: int = 5, sophistication_level:
             print("🔍 DEBUG: No segments extracted - this should not happen with the fix!")
             print(f"🔍 DEBUG: Raw script preview:\n{full_script[:500]}...")
 
-        return Script(
+        script = Script(
             topic=topic,
             duration_minutes=duration_minutes,
             sophistication_level=sophistication_level,
             concepts=segments
         )
+        if use_cache:
+            get_script_store().put(script)
+        return script
 
     except Exception as e:
-        raise RuntimeError(f"Script generation failed: {str(e)}")
+        raise ScriptGenerationError(f"Script generation failed: {str(e)}")
+
+
+def stream_script(topic: str, duration_minutes: int = 5, sophistication_level: int = 2,
+                  use_cache: bool = SCRIPT_CACHE_ENABLED) -> Iterator[ConceptSegment]:
+    """
+    Like generate_script, but yields each ConceptSegment as soon as the model
+    has finished writing it, so downstream work on early concepts overlaps
+    with generation of the later ones.
+
+    If the stream breaks off, a new request asks only for the concepts after
+    those already yielded, so the script stays one coherent text. Failures
+    raise ScriptGenerationError from the iteration.
+
+    The reply is always parsed from [NEW CONCEPT] markers, so concepts have
+    no target_seconds; the video pipeline only streams with
+    LLM_STRUCTURED_SCRIPT off.
+    """
+    if sophistication_level < 1 or sophistication_level > 3:
+        sophistication_level = 2
+
+    if use_cache:
+        cached = get_script_store().get(topic, duration_minutes, sophistication_level)
+        if cached is not None:
+            yield from cached.concepts
+            return
+    system_prompt, user_prompt = script_prompts(topic, duration_minutes, sophistication_level)
+
+    segments = queue.Queue()
+    finished = object()
+    # Segments handed to the caller, copied before it can rewrite them (read by
+    # the producer for resumes and by the caller for the store once finished)
+    sent: List[ConceptSegment] = []
+
+    def dispatch(new_segments: List[ConceptSegment]):
+        for segment in new_segments:
+            sent.append(replace(segment))
+            segments.put(segment)
+
+    def stream_remaining() -> bool:
+        """Stream the concepts after those already sent; False if the stream broke off"""
+        parser = ConceptStreamParser()
+        prompt = continuation_prompt(user_prompt, sent) if sent else user_prompt
+        restarted = False
+
+        def on_delta(received: str) -> bool:
+            nonlocal restarted
+            if parser.emitted and not received.startswith(parser.buffer):
+                # The request was retried from scratch, and a new completion would
+                # rewrite concepts the caller already has: stop and resume instead
+                restarted = True
+                return True
+            dispatch(parser.update(received))
+            return False
+
+        reply = script_llm().chat_stream(system_prompt, prompt, stop=on_delta)
+        if restarted or not reply:
+            return False
+        # Replays never call on_delta; the parser skips anything already sent
+        dispatch(parser.update(reply) + parser.close())
+        return True
+
+    def produce():
+        try:
+            with llm_context(stage="script"):
+                for resume in range(STREAM_RESUMES + 1):
+                    if stream_remaining():
+                        break
+                    if not sent:
+                        raise RuntimeError("empty reply")
+                    if resume < STREAM_RESUMES:
+                        print(f"🔁 Script stream broke off after {len(sent)} concepts, resuming from concept {len(sent) + 1}")
+                else:
+                    raise RuntimeError(f"stream broke off after {len(sent)} concepts and could not be resumed")
+            count_parse_path("markers")
+            segments.put(finished)
+        except Exception as e:
+            segments.put(e)
+
+    # The stream is read on its own thread so the caller can start on concept 1 right away
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True).start()
+
+    count = 0
+    while True:
+        item = segments.get()
+        if item is finished:
+            break
+        if isinstance(item, Exception):
+            raise ScriptGenerationError(f"Script generation failed: {str(item)}")
+        count += 1
+        print(f"📝 Concept {count} ready ({len(item.narration.split())} words)")
+        yield item
+
+    if use_cache:
+        get_script_store().put(Script(topic, duration_minutes, sophistication_level, sent))
 
 # ---------------------------
 # CLI Entry Point (unchanged)
@@ -0,0 +1,192 @@
+import re
+import math
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+from config.paths import MANIM_KNOWLEDGE_PATH, MATH_TEX_KNOWLEDGE_PATH
+from config.registry import read_text
+from config.llm_governor import estimate_tokens
+from config.settings import LLM_KNOWLEDGE_TOP_K, LLM_KNOWLEDGE_TOKEN_BUDGET
+
+# Plain-text sections are grown paragraph by paragraph up to about this size
+PLAIN_SECTION_CHARS = 1500
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "has", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "use", "used", "with", "you", "your",
+    "will", "we", "should", "show", "scene", "duration", "s",
+}
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms for BM25. Identifiers are kept whole and also split on
+    underscores/camel case, so "get_corner" matches "corner" and "MathTex"
+    matches "tex".
+    """
+    terms = []
+    for word in IDENTIFIER_RE.findall(text):
+        parts = [p for chunk in word.split("_") for p in CAMEL_RE.findall(chunk)]
+        for term in {word, *parts}:
+            term = term.lower()
+            if len(term) > 1 and term not in STOPWORDS:
+                terms.append(term)
+    return terms
+
+
+@dataclass
+class Section:
+    source: str
+    title: str
+    text: str
+    position: int  # order within the corpus, used to keep selections readable
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+# ---------------------------
+# Splitting the knowledge files
+# ---------------------------
+def split_markdown(text: str, source: str) -> List[Section]:
+    """One section per heading, titled with its parent headings"""
+    sections, lines, path = [], [], []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append(Section(source, " > ".join(path), body, 0))
+        lines.clear()
+
+    for line in text.splitlines():
+        match = re.match(r"^(#+)\s+(.*)", line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            path[:] = path[:level - 1] + [match.group(2).strip()]
+        lines.append(line)
+    flush()
+    return sections
+
+
+def _looks_like_heading(line: str) -> bool:
+    stripped = line.strip()
+    return (
+        stripped == line and 0 < len(stripped) < 70
+        and stripped[0].isupper()
+        and not stripped.endswith((".", ":", ",", ";", "("))
+        and "=" not in stripped
+    )
+
+
+def split_plain(text: str, source: str, max_chars: int = PLAIN_SECTION_CHARS) -> List[Section]:
+    """Sections start at heading-like lines and are cut at paragraph breaks once they get long"""
+    sections, lines, title = [], [], ""
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append(Section(source, title, body, 0))
+        lines.clear()
+
+    for line in text.splitlines():
+        size = sum(len(l) + 1 for l in lines)
+        if _looks_like_heading(line) and size > 200:
+            flush()
+            title = line.strip()
+        elif not line.strip() and size > max_chars:
+            flush()
+            continue
+        elif not lines and _looks_like_heading(line):
+            title = line.strip()
+        lines.append(line)
+    flush()
+    return sections
+
+
+# ---------------------------
+# BM25
+# ---------------------------
+class BM25Index:
+    """Okapi BM25 over a fixed list of sections"""
+
+    def __init__(self, sections: List[Section], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        for position, section in enumerate(sections):
+            section.position = position
+        self.k1 = k1
+        self.b = b
+
+        self.term_counts = [Counter(tokenize(f"{s.title}\n{s.text}")) for s in sections]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(sections)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, Section]]:
+        """Best matching sections, highest score first (sections with no matching term are skipped)"""
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        scored = []
+        for section, counts, length in zip(self.sections, self.term_counts, self.lengths):
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term, 0)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, section))
+        scored.sort(key=lambda item: -item[0])
+        return scored[:top_k]
+
+    def select(self, query: str, top_k: int = LLM_KNOWLEDGE_TOP_K,
+               token_budget: int = LLM_KNOWLEDGE_TOKEN_BUDGET) -> List[Section]:
+        """Top-k sections that fit in token_budget, returned in corpus order"""
+        chosen, used = [], 0
+        for _, section in self.search(query, top_k):
+            if used + section.tokens > token_budget:
+                continue
+            chosen.append(section)
+            used += section.tokens
+        return sorted(chosen, key=lambda s: s.position)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(s.tokens for s in self.sections)
+
+
+@lru_cache(maxsize=None)
+def knowledge_index() -> BM25Index:
+    """Index over manim_knowledge.txt (by heading) and math_tex_knowledge.txt (by topic), built once"""
+    return BM25Index(
+        split_markdown(read_text(MANIM_KNOWLEDGE_PATH), "manim")
+        + split_plain(read_text(MATH_TEX_KNOWLEDGE_PATH), "math_tex")
+    )
+
+
+def retrieve_knowledge(query: str) -> Tuple[str, int, int]:
+    """
+    Relevant knowledge for query as prompt text, plus the token counts of
+    the full corpus and of the selection (for the reduction metrics).
+    """
+    index = knowledge_index()
+    sections = index.select(query)
+
+    manim = "\n\n".join(s.text for s in sections if s.source == "manim")
+    math_tex = "\n\n".join(s.text for s in sections if s.source == "math_tex")
+    text = ""
+    if manim:
+        text += f"\nThese are the relevant parts of the manim guide:\n{manim}\n"
+    if math_tex:
+        text += f"\nThese are the relevant parts of the math_tex guide:\n{math_tex}\n"
+    return text, index.total_tokens, sum(s.tokens for s in sections)
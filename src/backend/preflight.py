@@ -0,0 +1,360 @@
+import ast
+import difflib
+import builtins
+import sys
+import json
+import threading
+import subprocess
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from config.settings import RENDER_POOL_ENABLED
+
+EXPORTS_TIMEOUT = 120  # seconds to import a module in a subprocess
+
+# Mobjects whose string arguments are compiled by LaTeX, and the keyword
+# arguments that change what is compiled (colors, sizes etc. do not)
+TEX_CLASSES = {"MathTex", "Tex"}
+TEX_KWARGS = {"tex_environment", "arg_separator"}
+# Keyword arguments that split the strings into separately compiled parts
+TEX_SPLIT_KWARGS = {"substrings_to_isolate", "tex_to_color_map"}
+
+# Shapes that have vertices rather than a bounding-box corner API in our
+# prompt contract (see "Positioning Guidelines" in manim_code_prompt.txt)
+POLYGON_CLASSES = {"Polygon", "Triangle", "RegularPolygon", "Polygram", "RegularPolygram"}
+
+# Globals Python sets on every imported module (manim imports the scene file)
+MODULE_DUNDERS = {
+    "__name__", "__file__", "__doc__", "__package__", "__spec__", "__loader__",
+    "__cached__", "__builtins__", "__annotations__",
+}
+# match-statement patterns that bind a name (absent before Python 3.10)
+MATCH_CAPTURES = tuple(getattr(ast, name) for name in ("MatchAs", "MatchStar", "MatchMapping") if hasattr(ast, name))
+
+
+@dataclass
+class Diagnostic:
+    """One problem found in generated code before it was rendered"""
+    rule: str
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"line {self.line}: [{self.rule}] {self.message}"
+
+
+# ---------------------------
+# Name resolution
+# ---------------------------
+# module name -> export names, for lookups that succeeded
+_exports: Dict[str, FrozenSet[str]] = {}
+_exports_lock = threading.Lock()
+
+
+def star_exports(module_name: str) -> Optional[FrozenSet[str]]:
+    """
+    Names `from module_name import *` binds, read from the installed module
+    (None if it cannot be imported, in which case names are not checked).
+    The module is imported in a render worker, which has manim loaded
+    already, or without the pool in a one-off subprocess, never in this
+    process.
+    """
+    with _exports_lock:
+        if module_name in _exports:
+            return _exports[module_name]
+        names = _resolve_exports(module_name)
+        if names is not None:
+            _exports[module_name] = names
+        return names
+
+
+def _resolve_exports(module_name: str) -> Optional[FrozenSet[str]]:
+    if RENDER_POOL_ENABLED:
+        from backend.render_pool import RenderPoolUnavailable, get_render_pool
+        try:
+            return get_render_pool().star_exports(module_name)
+        except RenderPoolUnavailable:
+            pass
+    script = (
+        "import importlib, json, sys\n"
+        "module = importlib.import_module(sys.argv[1])\n"
+        "names = getattr(module, '__all__', None)\n"
+        "if names is None:\n"
+        "    names = [n for n in dir(module) if not n.startswith('_')]\n"
+        "print(json.dumps(sorted(names)))\n"
+    )
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", script, module_name], capture_output=True, text=True, timeout=EXPORTS_TIMEOUT
+        )
+        return frozenset(json.loads(result.stdout)) if result.returncode == 0 else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def bound_names(tree: ast.AST) -> Set[str]:
+    """
+    Every name the module binds anywhere (assignments, imports, defs,
+    parameters, loop/with/except targets, match captures). Scopes are deliberately merged:
+    the check is for names that cannot exist, not for scoping bugs.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, MATCH_CAPTURES):
+            # MatchAs/MatchStar bind .name, MatchMapping binds **rest; wildcards bind nothing
+            capture = getattr(node, "name", None) or getattr(node, "rest", None)
+            if capture:
+                names.add(capture)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def check_names(tree: ast.AST) -> List[Diagnostic]:
+    """Names that are read but bound nowhere: not in the code, builtins or star imports"""
+    available = bound_names(tree) | set(dir(builtins)) | MODULE_DUNDERS
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names):
+            exports = star_exports(node.module or "")
+            if exports is None:
+                # Unknown namespace, so every name might come from it
+                return []
+            available |= exports
+
+    diagnostics = []
+    reported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in available:
+            if node.id in reported:
+                continue
+            reported.add(node.id)
+            message = f"name '{node.id}' is not defined and is not part of the installed Manim API"
+            close = difflib.get_close_matches(node.id, available, n=1)
+            if close:
+                message += f" (did you mean '{close[0]}'?)"
+            diagnostics.append(Diagnostic("unknown-name", node.lineno, message))
+    return diagnostics
+
+
+# ---------------------------
+# Known-bad patterns
+# ---------------------------
+def constructor_name(value: ast.AST) -> Optional[str]:
+    """Class name of `Cls(...)` or `Cls(...).method(...)...`, the way scenes build mobjects"""
+    while isinstance(value, ast.Call):
+        if isinstance(value.func, ast.Name):
+            return value.func.id
+        if isinstance(value.func, ast.Attribute):
+            value = value.func.value
+        else:
+            return None
+    return None
+
+
+def check_scene_class(tree: ast.Module) -> List[Diagnostic]:
+    """The render needs a Scene subclass with a construct() method"""
+    scenes = [
+        node for node in tree.body
+        if isinstance(node, ast.ClassDef) and any(
+            (isinstance(b, ast.Name) and b.id.endswith("Scene"))
+            or (isinstance(b, ast.Attribute) and b.attr.endswith("Scene"))
+            for b in node.bases
+        )
+    ]
+    if not scenes:
+        return [Diagnostic("no-scene", 1, "no class inherits from Scene, so there is nothing to render")]
+
+    diagnostics = []
+    for scene in scenes:
+        methods = {n.name for n in scene.body if isinstance(n, ast.FunctionDef)}
+        if "construct" not in methods:
+            diagnostics.append(Diagnostic(
+                "no-construct", scene.lineno, f"scene class {scene.name} has no construct(self) method"
+            ))
+    return diagnostics
+
+
+def check_polygon_corners(tree: ast.AST) -> List[Diagnostic]:
+    """get_corner() on a Polygon/Triangle; their points come from get_vertices()"""
+    polygons = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            cls = constructor_name(node.value)
+            for target in node.targets:
+                if isinstance(target, ast.Name) and cls in POLYGON_CLASSES:
+                    polygons[target.id] = cls
+
+    diagnostics = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "get_corner"):
+            continue
+        owner = node.func.value
+        cls = polygons.get(owner.id) if isinstance(owner, ast.Name) else constructor_name(owner)
+        if cls in POLYGON_CLASSES:
+            diagnostics.append(Diagnostic(
+                "polygon-get-corner", node.lineno,
+                f"get_corner() called on a {cls}; use get_vertices()[i] for polygon points"
+            ))
+    return diagnostics
+
+
+RULES = [check_scene_class, check_polygon_corners, check_names]
+
+
+def check_manim_code(code: str) -> List[Diagnostic]:
+    """
+    Static checks on generated scene code, in milliseconds and without
+    rendering. An empty list means nothing obviously wrong was found.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        # Covers unclosed brackets/quotes, truncated replies and bad indentation
+        line = (e.text or "").strip()
+        message = f"{e.msg}: {line}" if line else e.msg
+        return [Diagnostic("syntax", e.lineno or 1, message)]
+
+    diagnostics = []
+    for rule in RULES:
+        diagnostics.extend(rule(tree))
+    return sorted(diagnostics, key=lambda d: d.line)
+
+
+def format_diagnostics(diagnostics: List[Diagnostic]) -> str:
+    """Error message for fix_manim_code, in place of a render traceback"""
+    lines = ["Static pre-flight check failed (the code was not rendered):"]
+    lines += [str(d) for d in diagnostics]
+    return "\n".join(lines)
+
+
+# ---------------------------
+# LaTeX extraction
+# ---------------------------
+def split_substrings(keyword: ast.keyword) -> Optional[List[str]]:
+    """
+    Substrings a substrings_to_isolate / tex_to_color_map argument isolates,
+    or None unless they are all string literals (the colors themselves do
+    not change what is compiled)
+    """
+    value = keyword.value
+    if keyword.arg == "tex_to_color_map":
+        if not isinstance(value, ast.Dict) or None in value.keys:
+            return None
+        items = value.keys
+    elif isinstance(value, (ast.List, ast.Tuple)):
+        items = value.elts
+    else:
+        return None
+    if not all(isinstance(i, ast.Constant) and isinstance(i.value, str) for i in items):
+        return None
+    return [i.value for i in items]
+
+
+def extract_tex_specs(code: str) -> List[dict]:
+    """
+    Every MathTex/Tex call in code whose strings are literals, as picklable
+    specs {cls, args, kwargs, template, line, source} that rebuild the same
+    mobject (and so the same Tex cache entry) elsewhere. Calls built from
+    variables or f-strings, with non-literal substrings to isolate or color
+    map keys, or with a tex_template other than a TexTemplateLibrary entry,
+    are skipped. Duplicates are dropped.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+
+    specs = []
+    seen = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in TEX_CLASSES):
+            continue
+        if not node.args or not all(isinstance(a, ast.Constant) and isinstance(a.value, str) for a in node.args):
+            continue
+
+        kwargs = {}
+        isolate = []
+        template = None
+        literal = True
+        for keyword in node.keywords:
+            if keyword.arg == "tex_template":
+                value = keyword.value
+                if (isinstance(value, ast.Attribute) and isinstance(value.value, ast.Name)
+                        and value.value.id == "TexTemplateLibrary"):
+                    template = value.attr
+                else:
+                    literal = False
+            elif keyword.arg in TEX_KWARGS:
+                if isinstance(keyword.value, ast.Constant) and isinstance(keyword.value.value, str):
+                    kwargs[keyword.arg] = keyword.value.value
+                else:
+                    literal = False
+            elif keyword.arg in TEX_SPLIT_KWARGS:
+                substrings = split_substrings(keyword)
+                if substrings is None:
+                    literal = False
+                else:
+                    isolate.extend(substrings)
+        if not literal:
+            continue
+        if isolate:
+            # MathTex appends the color map keys to substrings_to_isolate, so
+            # one merged list splits the strings the same way
+            kwargs["substrings_to_isolate"] = isolate
+
+        args = [a.value for a in node.args]
+        key = (node.func.id, tuple(args), repr(sorted(kwargs.items())), template)
+        if key in seen:
+            continue
+        seen.add(key)
+        specs.append({
+            "cls": node.func.id,
+            "args": args,
+            "kwargs": kwargs,
+            "template": template,
+            "line": node.lineno,
+            "source": ast.get_source_segment(code, node) or f"{node.func.id}(...)",
+        })
+    return specs
+
+
+# ---------------------------
+# Stats
+# ---------------------------
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def count_preflight(diagnostics: List[Diagnostic]):
+    """Record one check; a failed check is a render that never had to run"""
+    with _stats_lock:
+        _stats["checks"] += 1
+        if diagnostics:
+            _stats["renders_avoided"] += 1
+        for rule in {d.rule for d in diagnostics}:
+            _stats[f"rule:{rule}"] += 1
+
+
+def count_preflight_event(name: str):
+    """Count a later validation outcome, e.g. a dry-run failure"""
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def preflight_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,181 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import Optional
+
+from config.paths import RENDER_CACHE_DIR
+from config.settings import RENDER_CACHE_MAX_BYTES
+from config.render_quality import QualityTier
+from config.llm_telemetry import get_telemetry
+
+
+@lru_cache(maxsize=None)
+def manim_version() -> str:
+    """Installed manim version, read from package metadata without importing manim"""
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def tex_template_id(output_dir: Path) -> str:
+    """
+    Identifies the Tex template a render in output_dir uses: manim reads a
+    manim.cfg from its working directory, which can swap the template.
+    """
+    cfg = Path(output_dir) / "manim.cfg"
+    if not cfg.exists():
+        return "default"
+    return hashlib.sha256(cfg.read_bytes()).hexdigest()
+
+
+def copy_into_place(src: Path, dest: Path):
+    """
+    Copy src to dest (replacing dest atomically). Never a hard link: a later
+    render to dest rewrites the file in place, which would change the
+    cached video through the shared inode.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class RenderCache:
+    """
+    Content-addressed store of rendered scene videos.
+
+    The key is a hash of everything that determines the output: scene code,
+    scene class, quality tier, manim version and Tex template. On a hit the
+    cached mp4 is copied to where the render would have written it.
+    Files are kept under max_bytes by evicting the least recently used
+    (hits refresh the mtime). Hits and misses are also counted per job in
+    the telemetry store.
+    """
+
+    def __init__(self, cache_dir: Path = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(code: str, scene_name: str, quality: QualityTier, tex_template: str = "default") -> str:
+        payload = json.dumps([code, scene_name, quality.name, quality.manim_config, manim_version(), tex_template])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.mp4"
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Copy the cached video for key to dest; False on a miss"""
+        cached = self._entry_path(key)
+        try:
+            copy_into_place(cached, dest)
+            os.utime(cached)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return False
+        self._count(hit=True)
+        return True
+
+    def store(self, key: str, video: Path):
+        """Add a freshly rendered video (a no-op if it does not exist)"""
+        if not video.exists():
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            # Copied, not linked: the job directory may be cleaned up or rewritten
+            shutil.copyfile(video, tmp_name)
+            os.replace(tmp_name, self._entry_path(key))
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        with self._lock:
+            self.stored += 1
+        self.evict()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        get_telemetry().count("render_cache_hits" if hit else "render_cache_misses")
+
+    def size_bytes(self) -> int:
+        if not self.cache_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*.mp4"))
+
+    def evict(self):
+        """Delete least recently used videos until the cache fits in max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob("*.mp4"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self.evicted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stored": self.stored,
+                "evicted": self.evicted,
+            }
+        stats["size_bytes"] = self.size_bytes()
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+def job_render_cache_stats(job_id: str) -> dict:
+    """Render cache hits/misses and hit rate of one job, from the telemetry counters"""
+    counters = get_telemetry().counters(job_id)
+    hits, misses = counters.get("render_cache_hits", 0), counters.get("render_cache_misses", 0)
+    return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Process-wide render cache in RENDER_CACHE_DIR"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
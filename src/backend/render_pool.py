@@ -0,0 +1,409 @@
+import os
+import re
+import sys
+import queue
+import atexit
+import threading
+import traceback
+import importlib
+import importlib.util
+import multiprocessing
+from pathlib import Path
+from typing import FrozenSet, List, Optional, Tuple
+
+from config.settings import (
+    RENDER_POOL_SIZE, RENDER_WORKER_MAX_JOBS, RENDER_WORKER_STARTUP_TIMEOUT, ASSET_CACHE_ENABLED,
+    RENDER_TEX_FORMAT,
+)
+from backend import asset_cache, tex_format
+
+RENDER_TIMEOUT = 300  # seconds, same limit as a CLI render
+
+
+class RenderPoolUnavailable(RuntimeError):
+    """Workers cannot render here (e.g. manim fails to import); use the CLI instead"""
+
+
+# ---------------------------
+# Worker process
+# ---------------------------
+def _render_job(job: dict, job_number: int) -> Tuple[str, str, Optional[float], dict]:
+    """
+    Render one scene inside the worker, the way `manim file.py Scene -o out.mp4`
+    run from output_dir would. All config changes are undone afterwards and
+    the scene module is loaded under a fresh name, so jobs cannot leak state.
+    Validation jobs build the scene with skip_animations, which manim only
+    takes as a Scene argument (tempconfig drops unknown keys), so each
+    play()/wait() jumps to its end state instead of drawing every frame.
+    Returns (status, error, scene duration in seconds, asset cache counts).
+    """
+    from manim import tempconfig
+
+    module_name = f"_render_job_{os.getpid()}_{job_number}"
+    output_dir = Path(job["output_dir"])
+    cwd = os.getcwd()
+    try:
+        os.chdir(output_dir)
+        overrides = {
+            "input_file": str(job["py_file"]),
+            "output_file": job["output_file"],
+            "media_dir": str(output_dir / "media"),
+            "progress_bar": "none",
+            **job.get("config", {}),
+        }
+        with tempconfig(overrides):
+            spec = importlib.util.spec_from_file_location(module_name, job["py_file"])
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            scene_class = getattr(module, job["scene_name"])
+            scene = scene_class(skip_animations=True) if job.get("skip_animations") else scene_class()
+            scene.render()
+            # The renderer clock advances by each play()/wait() run time, skipped or not
+            duration = getattr(scene.renderer, "time", None)
+        return "ok", "", duration, asset_cache.take_counts()
+    except Exception:
+        return "error", traceback.format_exc(), None, asset_cache.take_counts()
+    finally:
+        sys.modules.pop(module_name, None)
+        os.chdir(cwd)
+
+
+def _latex_errors(message: str) -> str:
+    """The `! ...` lines of the LaTeX log a manim compile error points to, if it names one"""
+    match = re.search(r"log file: (\S+\.log)", message)
+    if not match:
+        return ""
+    try:
+        lines = Path(match.group(1)).read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return ""
+    errors = [" ".join(lines[i:i + 2]) for i, line in enumerate(lines) if line.startswith("!")]
+    return "; ".join(errors[:3])
+
+
+def _tex_job(job: dict) -> Tuple[str, str, Optional[float], dict]:
+    """
+    Build each MathTex/Tex spec with the render's config, which compiles it
+    into the Tex cache exactly as construct() would. Every spec is tried, so
+    one bad formula does not hide the next; the error lists all failures.
+    """
+    import manim
+    from manim import tempconfig
+
+    output_dir = Path(job["output_dir"])
+    overrides = {"media_dir": str(output_dir / "media"), "progress_bar": "none", **job.get("config", {})}
+    failures = []
+    with tempconfig(overrides):
+        for spec in job["specs"]:
+            kwargs = dict(spec["kwargs"])
+            try:
+                if spec["template"]:
+                    kwargs["tex_template"] = getattr(manim.TexTemplateLibrary, spec["template"])
+                getattr(manim, spec["cls"])(*spec["args"], **kwargs)
+            except Exception as e:
+                details = _latex_errors(str(e)) or f"{type(e).__name__}: {e}"
+                failures.append(f"line {spec['line']}: {spec['source']} failed to compile: {details}")
+    return ("error" if failures else "ok"), "\n".join(failures), None, asset_cache.take_counts()
+
+
+def _exports_job(job: dict) -> Tuple[str, str, Optional[FrozenSet[str]], dict]:
+    """Names `from module import *` binds, read in the worker where manim is already imported"""
+    try:
+        module = importlib.import_module(job["module"])
+    except Exception as e:
+        return "error", f"{type(e).__name__}: {e}", None, {}
+    names = getattr(module, "__all__", None)
+    if names is None:
+        names = [n for n in dir(module) if not n.startswith("_")]
+    return "ok", "", frozenset(names), {}
+
+
+def _worker_main(conn):
+    """Import manim once, report ready, then render jobs until told to stop"""
+    try:
+        import manim
+    except Exception as e:
+        conn.send(("unavailable", f"{type(e).__name__}: {e}"))
+        return
+    if RENDER_TEX_FORMAT:
+        try:
+            tex_format.install_manim_hook()
+        except Exception as e:
+            print(f"⚠️ LaTeX format hook not installed: {type(e).__name__}: {e}")
+    if ASSET_CACHE_ENABLED:
+        try:
+            asset_cache.install_manim_hooks()
+        except Exception as e:
+            # Still render, just without the shared cache's locking and counts
+            print(f"⚠️ Asset cache hooks not installed: {type(e).__name__}: {e}")
+    conn.send(("ready", getattr(manim, "__version__", "")))
+
+    job_number = 0
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        job_number += 1
+        if job.get("kind") == "tex":
+            conn.send(_tex_job(job))
+        elif job.get("kind") == "exports":
+            conn.send(_exports_job(job))
+        else:
+            conn.send(_render_job(job, job_number))
+
+
+# ---------------------------
+# Parent side
+# ---------------------------
+class RenderWorker:
+    """Handle on one worker process and the pipe to it"""
+
+    def __init__(self, context):
+        self.context = context
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.jobs = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """Spawn the process; it imports manim in the background until wait_ready()"""
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.ready = False
+        self.jobs = 0
+
+    def wait_ready(self, timeout: float):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise RenderPoolUnavailable(f"Render worker did not start within {timeout:.0f}s")
+        status, detail = self.conn.recv()
+        if status != "ready":
+            raise RenderPoolUnavailable(f"Render worker cannot import manim ({detail})")
+        self.ready = True
+
+    def run(self, job: dict, timeout: float) -> Tuple[str, str, object, dict]:
+        """Send one job and wait for its result; raises TimeoutError, or EOFError if the worker died"""
+        self.conn.send(job)
+        self.jobs += 1
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        return self.conn.recv()
+
+    def stop(self, kill: bool = False):
+        if self.process is None:
+            return
+        if not kill and self.alive:
+            try:
+                self.conn.send(None)
+                self.process.join(5)
+            except (OSError, EOFError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+class RenderPool:
+    """
+    Pool of long-lived Manim render processes.
+
+    Each worker pays the interpreter start and the manim import once, then
+    renders scene after scene in-process. A worker that crashes or times
+    out is killed and replaced, and every worker is recycled after
+    max_jobs_per_worker renders so leaks in manim/cairo do not accumulate.
+    Replacements are started right away so they warm up while idle.
+    """
+
+    def __init__(self, size: int = RENDER_POOL_SIZE, max_jobs_per_worker: int = RENDER_WORKER_MAX_JOBS,
+                 startup_timeout: float = RENDER_WORKER_STARTUP_TIMEOUT):
+        # spawn: the parent runs threads (scene workers, LLM pools), which fork does not survive safely
+        self.context = multiprocessing.get_context("spawn")
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.startup_timeout = startup_timeout
+        self.unavailable: Optional[str] = None
+
+        self.renders = 0
+        self.validations = 0
+        self.tex_batches = 0
+        self.export_lookups = 0
+        self.failures = 0
+        self.crashes = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[RenderWorker]" = queue.Queue()
+        self._workers = []
+        for _ in range(self.size):
+            worker = RenderWorker(self.context)
+            worker.start()
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    def render(self, py_file: Path, scene_name: str, output_dir: Path, output_file: str,
+               config: Optional[dict] = None, timeout: float = RENDER_TIMEOUT) -> Tuple[bool, str]:
+        """Render scene_name from py_file into output_dir/media; returns (success, error_message)"""
+        job = self._scene_job(py_file, scene_name, output_dir, output_file, config or {})
+        success, message, _ = self._run(job, timeout, "renders", f"rendering {scene_name}")
+        return success, message
+
+    def validate(self, py_file: Path, scene_name: str, output_dir: Path,
+                 timeout: float = RENDER_TIMEOUT) -> Tuple[bool, str, Optional[float]]:
+        """
+        Run construct() with animations skipped (Scene(skip_animations=True))
+        and nothing written (manim's dry_run). Each animation is applied in one
+        step, so runtime errors show up at a fraction of a render's cost;
+        returns (success, error_message, scene duration in seconds).
+        """
+        job = self._scene_job(py_file, scene_name, output_dir, f"{Path(py_file).stem}.mp4", {"dry_run": True})
+        job["skip_animations"] = True
+        return self._run(job, timeout, "validations", f"validating {scene_name}")
+
+    def compile_tex(self, specs: List[dict], output_dir: Path, timeout: float = RENDER_TIMEOUT) -> Tuple[bool, str]:
+        """
+        Compile MathTex/Tex specs (see backend.preflight.extract_tex_specs)
+        into the Tex cache used by renders of output_dir; returns (success, errors)
+        """
+        job = {
+            "kind": "tex",
+            "specs": specs,
+            "output_dir": str(Path(output_dir).resolve()),
+            "config": self._config({}),
+        }
+        success, message, _ = self._run(job, timeout, "tex_batches", "compiling LaTeX")
+        return success, message
+
+    def star_exports(self, module_name: str, timeout: float = RENDER_TIMEOUT) -> Optional[FrozenSet[str]]:
+        """
+        Names `from module_name import *` binds, resolved in a worker so the
+        calling process never imports manim (None if the module cannot be imported)
+        """
+        job = {"kind": "exports", "module": module_name}
+        success, _, names = self._run(job, timeout, "export_lookups", f"importing {module_name}")
+        return names if success else None
+
+    @staticmethod
+    def _config(config: dict) -> dict:
+        if ASSET_CACHE_ENABLED:
+            return {**asset_cache.manim_config(), **config}
+        return config
+
+    def _scene_job(self, py_file: Path, scene_name: str, output_dir: Path, output_file: str, config: dict) -> dict:
+        return {
+            "kind": "scene",
+            "py_file": str(Path(py_file).resolve()),
+            "scene_name": scene_name,
+            "output_dir": str(Path(output_dir).resolve()),
+            "output_file": output_file,
+            "config": self._config(config),
+        }
+
+    def _run(self, job: dict, timeout: float, counter: str, activity: str) -> Tuple[bool, str, object]:
+        """
+        Run one job on an idle worker; counter names the stat it counts
+        towards. Returns (success, error, value), where value is the scene
+        duration for scene jobs and the name set for export lookups.
+        """
+        if self.unavailable:
+            raise RenderPoolUnavailable(self.unavailable)
+
+        worker = self._idle.get()
+        try:
+            if not worker.alive:
+                worker.start()
+            try:
+                worker.wait_ready(self.startup_timeout)
+            except RenderPoolUnavailable as e:
+                with self._lock:
+                    self.unavailable = str(e)
+                worker.stop(kill=True)
+                raise
+
+            try:
+                status, message, value, asset_counts = worker.run(job, timeout)
+            except TimeoutError:
+                self._replace(worker, "timeouts")
+                limit = f"{timeout / 60:.0f} minutes" if timeout >= 60 else f"{timeout:.0f} seconds"
+                return False, f"Render process timed out after {limit}", None
+            except (EOFError, OSError):
+                worker.process.join(1)
+                exit_code = worker.process.exitcode
+                self._replace(worker, "crashes")
+                return False, f"Render worker crashed (exit code {exit_code}) while {activity}", None
+
+            if worker.jobs >= self.max_jobs_per_worker:
+                self._replace(worker, "recycled")
+            with self._lock:
+                setattr(self, counter, getattr(self, counter) + 1)
+                self.failures += status != "ok"
+            if ASSET_CACHE_ENABLED:
+                asset_cache.get_asset_cache().record(asset_counts)
+                asset_cache.get_asset_cache().maybe_evict()
+            return status == "ok", message, value
+        finally:
+            self._idle.put(worker)
+
+    def _replace(self, worker: RenderWorker, reason: str):
+        """Stop worker (killing it unless it is merely being recycled) and start a fresh process"""
+        worker.stop(kill=reason != "recycled")
+        with self._lock:
+            setattr(self, reason, getattr(self, reason) + 1)
+        worker.start()
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.size,
+                "renders": self.renders,
+                "validations": self.validations,
+                "tex_batches": self.tex_batches,
+                "export_lookups": self.export_lookups,
+                "failures": self.failures,
+                "crashes": self.crashes,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+                "unavailable": self.unavailable,
+            }
+
+
+_pool: Optional[RenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> RenderPool:
+    """Process-wide render pool, started (and warmed) on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_render_pool():
+    """Stop the render workers, if they were ever started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,164 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.paths import SCENE_CODE_CACHE_DIR
+from config.settings import SCENE_CODE_CACHE_MAX_ENTRIES
+
+
+def normalize_description(description: str) -> str:
+    """Scene description with case and whitespace differences removed"""
+    return re.sub(r"\s+", " ", description).strip().lower()
+
+
+class SceneCodeStore:
+    """
+    Persistent store of scene code that is known to render, keyed by
+    (normalized scene description, prompt version, codegen model). Each
+    entry also records the model that actually wrote the stored code, which
+    differs from the key's model when a fix tier produced it.
+
+    The prompt version is a hash of the codegen prompt and knowledge files
+    (see generate_scenes.codegen_prompt_version), so editing any of them
+    makes every older entry unreachable and fresh code is generated. Each
+    entry is a JSON file; the least recently used are dropped beyond
+    max_entries. Entries are counted as they are written, so the directory
+    is only scanned when the count goes over the limit.
+    """
+
+    def __init__(self, store_dir: Path = SCENE_CODE_CACHE_DIR, max_entries: int = SCENE_CODE_CACHE_MAX_ENTRIES):
+        self.store_dir = Path(store_dir)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.stored_by = Counter()
+        self.discarded = 0
+        self._entries: Optional[int] = None  # counted from disk on the first put
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(description: str, prompt_version: str, model: str) -> str:
+        payload = json.dumps([normalize_description(description), prompt_version, model])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.store_dir / f"{key}.json"
+
+    def get(self, description: str, prompt_version: str, model: str) -> Optional[str]:
+        """Known-good code for this scene description, or None"""
+        path = self._entry_path(self.make_key(description, prompt_version, model))
+        try:
+            code = json.loads(path.read_text(encoding="utf-8"))["code"]
+            os.utime(path)  # recency for eviction
+        except (OSError, ValueError, KeyError):
+            code = None
+        with self._lock:
+            if code:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return code or None
+
+    def put(self, description: str, prompt_version: str, model: str, code: str, produced_by: Optional[str] = None):
+        """
+        Remember code that rendered successfully for this description.
+        produced_by tags the model that wrote the final code when it was not
+        model itself (e.g. a cheaper fix tier).
+        """
+        key = self.make_key(description, prompt_version, model)
+        try:
+            if json.loads(self._entry_path(key).read_text(encoding="utf-8"))["code"] == code:
+                return  # already stored (get() refreshed its recency)
+        except (OSError, ValueError, KeyError):
+            pass
+        body = json.dumps({
+            "description": normalize_description(description),
+            "prompt_version": prompt_version,
+            "model": model,
+            "produced_by": produced_by or model,
+            "code": code,
+            "stored_at": time.time(),
+        }, indent=2)
+
+        with self._lock:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            if self._entries is None:
+                self._entries = sum(1 for _ in self.store_dir.glob("*.json"))
+            is_new = not self._entry_path(key).exists()
+            fd, tmp_name = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(body)
+                os.replace(tmp_name, self._entry_path(key))
+            except Exception:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+                raise
+            self.stored += 1
+            self.stored_by[produced_by or model] += 1
+            self._entries += is_new
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def discard(self, description: str, prompt_version: str, model: str):
+        """Forget stored code that no longer renders (e.g. after a manim upgrade)"""
+        try:
+            self._entry_path(self.make_key(description, prompt_version, model)).unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.discarded += 1
+            if self._entries is not None:
+                self._entries -= 1
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries and recount (call with _lock held)"""
+        entries = list(self.store_dir.glob("*.json"))
+        self._entries = len(entries)
+        if len(entries) <= self.max_entries:
+            return
+        mtimes: Dict[Path, float] = {}
+        for path in entries:
+            try:
+                mtimes[path] = path.stat().st_mtime
+            except FileNotFoundError:
+                pass
+        for path in sorted(mtimes, key=mtimes.get)[:len(mtimes) - self.max_entries]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self._entries -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stored": self.stored,
+                "stored_by_model": dict(self.stored_by),
+                "discarded": self.discarded,
+            }
+
+
+_store: Optional[SceneCodeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_scene_code_store() -> SceneCodeStore:
+    """Process-wide scene code store in SCENE_CODE_CACHE_DIR"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SceneCodeStore()
+        return _store
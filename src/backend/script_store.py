@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from config.paths import SCRIPT_CACHE_DIR
+from config.settings import SCRIPT_CACHE_NEAR_MATCH, SCRIPT_CACHE_MIN_JACCARD, SCRIPT_CACHE_MAX_ENTRIES
+
+# Words that change how a request is phrased but not what it is about
+FILLER_WORDS = {
+    "a", "an", "the", "what", "whats", "is", "are", "was", "were", "how", "do", "does", "did", "why",
+    "teach", "me", "us", "explain", "explained", "explaining", "describe", "tell", "about", "please",
+    "can", "could", "would", "you", "i", "want", "to", "learn", "understand", "know", "show",
+    "introduction", "intro", "basics", "video", "lesson", "on", "of", "it", "they", "work", "works", "mean", "means",
+}
+
+
+def _stem(word: str) -> str:
+    """Crude plural folding so "derivatives" and "derivative" compare equal"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def topic_tokens(topic: str):
+    """
+    Content tokens of a topic, in order: words with filler and plurals
+    removed, and math kept whole ("x^2", "a+b") so digits and operators
+    still tell topics apart
+    """
+    text = topic.lower().replace("'", "")
+    # "x ^ 2" and "x^2" are the same expression
+    text = re.sub(r"\s*([\^+\-*/=<>])\s*", r"\1", text)
+    tokens = [t.strip(".") for t in re.findall(r"[a-z0-9^+\-*/=<>().]+", text)]
+    tokens = [t for t in tokens if t]
+    content = [_stem(t) for t in tokens if t not in FILLER_WORDS]
+    # A topic made only of filler ("what is it?") is kept as-is rather than emptied
+    return content or tokens
+
+
+def normalize_topic(topic: str) -> str:
+    """Content tokens of a topic joined by spaces (the exact-match key)"""
+    return " ".join(topic_tokens(topic))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Overlap of two token sets, 1.0 when they are equal"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ScriptStore:
+    """
+    Persistent store of generated scripts keyed by (normalized topic,
+    duration, sophistication level).
+
+    Lookups first try the exact normalized topic, then (if near_match) the
+    stored topic with the same duration and level whose set of content
+    tokens overlaps most, as long as the Jaccard overlap is at least
+    min_jaccard. The default of 1.0 only accepts the same words in a
+    different order ("derivative of sine" ~ "sine derivative", but never
+    "cosine derivative"). Each entry is a JSON file in the Script.save
+    format plus the normalized topic; the oldest entries are dropped once
+    there are more than max_entries.
+    """
+
+    def __init__(self, store_dir: Path = SCRIPT_CACHE_DIR, near_match: bool = SCRIPT_CACHE_NEAR_MATCH,
+                 max_entries: int = SCRIPT_CACHE_MAX_ENTRIES, min_jaccard: float = SCRIPT_CACHE_MIN_JACCARD):
+        self.store_dir = Path(store_dir)
+        self.near_match = near_match
+        self.min_jaccard = min_jaccard
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stored = 0
+
+        self._lock = threading.Lock()
+        # key -> (normalized topic, duration, level, content token set, mtime)
+        self._index: Optional[Dict[str, Tuple[str, int, int, FrozenSet[str], float]]] = None
+
+    @staticmethod
+    def make_key(normalized_topic: str, duration_minutes: int, sophistication_level: int) -> str:
+        payload = json.dumps([normalized_topic, duration_minutes, sophistication_level])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.store_dir / f"{key}.json"
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        if not self.store_dir.exists():
+            return
+        for path in self.store_dir.glob("*.json"):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                mtime = path.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            # Re-normalized so entries written under older rules still compare correctly
+            normalized = normalize_topic(data["topic"])
+            self._index[path.stem] = (
+                normalized, data["duration_minutes"], data["sophistication_level"], frozenset(normalized.split()), mtime
+            )
+
+    # ---------------------------
+    # Lookup / store
+    # ---------------------------
+    def find(self, topic: str, duration_minutes: int, sophistication_level: int) -> Optional[Tuple[str, bool]]:
+        """(key, exact) of the stored script for this request, or None"""
+        normalized = normalize_topic(topic)
+        with self._lock:
+            self._load_index()
+            key = self.make_key(normalized, duration_minutes, sophistication_level)
+            if key in self._index:
+                return key, True
+            if not self.near_match:
+                return None
+
+            tokens = frozenset(normalized.split())
+            best_key, best_score = None, 0.0
+            for other_key, (_, duration, level, other_tokens, _) in self._index.items():
+                if duration != duration_minutes or level != sophistication_level:
+                    continue
+                score = jaccard(tokens, other_tokens)
+                if score >= self.min_jaccard and score > best_score:
+                    best_key, best_score = other_key, score
+            return (best_key, False) if best_key is not None else None
+
+    def get(self, topic: str, duration_minutes: int, sophistication_level: int):
+        """
+        A fresh copy of the stored Script for this request or None on a miss.
+        The script keeps the topic it was generated for.
+        """
+        from backend.generate_script import Script
+
+        match = self.find(topic, duration_minutes, sophistication_level)
+        if match is not None:
+            key, exact = match
+            try:
+                script = Script.load(str(self._entry_path(key)))
+            except (OSError, ValueError, KeyError):
+                with self._lock:
+                    self._index.pop(key, None)
+                match = None
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                return None
+            if exact:
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            # Refresh recency in memory and on disk so eviction keeps scripts still in use
+            if key in self._index:
+                self._index[key] = self._index[key][:4] + (time.time(),)
+            try:
+                os.utime(self._entry_path(key))
+            except OSError:
+                pass
+
+        print(f"📚 Script cache hit for '{topic}': {'exact' if exact else 'near'} match of stored '{script.topic}'")
+        return script
+
+    def put(self, script):
+        """Store a generated script (scripts without concepts are ignored)"""
+        if not script.concepts:
+            return
+        normalized = normalize_topic(script.topic)
+        key = self.make_key(normalized, script.duration_minutes, script.sophistication_level)
+        body = json.dumps({**script.to_dict(), "normalized_topic": normalized}, indent=2)
+
+        with self._lock:
+            self._load_index()
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(body)
+                os.replace(tmp_name, self._entry_path(key))
+            except Exception:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+                raise
+
+            self._index[key] = (
+                normalized, script.duration_minutes, script.sophistication_level, frozenset(normalized.split()), time.time()
+            )
+            self.stored += 1
+            self._evict()
+
+    def _evict(self):
+        if len(self._index) <= self.max_entries:
+            return
+        oldest = sorted(self._index, key=lambda k: self._index[k][4])
+        for key in oldest[:len(self._index) - self.max_entries]:
+            del self._index[key]
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+                "stored": self.stored,
+            }
+
+
+_store: Optional[ScriptStore] = None
+_store_lock = threading.Lock()
+
+
+def get_script_store() -> ScriptStore:
+    """Process-wide script store in SCRIPT_CACHE_DIR"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScriptStore()
+        return _store
@@ -1,16 +1,16 @@
 from dotenv import load_dotenv
 import os
-import re
-import yaml
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 import json
 # ---------------------------
 # Settings and Config
 # ---------------------------
-from config.settings import WORDS_PER_MINUTE
-from config.paths import SCENE_EXAMPLES_PATH, SCRIPT_GEN_PROMPT_PATH
-from config.llm import LLMClient
+from config.settings import WORDS_PER_MINUTE, LLM_STRUCTURED_SCRIPT
+from config.registry import get_llm
+from config.llm_telemetry import llm_context
+from backend.generate_audio import speaking_rate
+from backend.generate_script import segments_schema, segments_from_json, structured_prompts, count_parse_path
 
 # ---------------------------
 # New Problem-Solving Specific Settings
@@ -24,8 +24,6 @@ DETAIL_LEVEL_DESCRIPTIONS = {
 # ---------------------------
 # Load Prompt Components  
 # ---------------------------
-SCENE_EXAMPLES = yaml.safe_load(SCENE_EXAMPLES_PATH.read_text(encoding="utf-8"))
-
 # New problem-solving prompt template
 PROBLEM_SOLVING_PROMPT_TEMPLATE = """
 You are an expert mathematics tutor creating step-by-step problem-solving videos. Generate a structured solution script for the problem: {problem} at a {detail_level_desc} that would be about {duration_minutes} minutes long when read aloud (approximately {expected_words} words total).
@@ -68,8 +66,11 @@ Generate a complete solution with {step_count} steps, each approximately {words_
 # ---------------------------
 # LLM Client Setup
 # ---------------------------
+# Created on first use, not at import
 load_dotenv()
-llm = LLMClient(model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=8000)
+
+def solver_llm():
+    return get_llm(model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=8000)
 
 # ---------------------------
 # Data Models (Updated)
@@ -78,6 +79,7 @@ llm = LLMClient(model="claude-sonnet-4-20250514", temperature=0.7, max_tokens=80
 class SolutionStep:
     narration: str
     scene_description: str
+    target_seconds: Optional[float] = None  # only known for structured scripts
 
 @dataclass
 class ProblemSolutionScript:
@@ -96,7 +98,8 @@ class ProblemSolutionScript:
                 "steps": [
                     {
                         "narration": s.narration,
-                        "scene_description": s.scene_description
+                        "scene_description": s.scene_description,
+                        "target_seconds": s.target_seconds
                     } for s in self.steps
                 ]
             }, f, indent=2)
@@ -110,11 +113,15 @@ class ProblemSolutionScript:
             duration_minutes=data["duration_minutes"],
             detail_level=data["detail_level"],
             steps=[
-                SolutionStep(s["narration"], s["scene_description"])
+                SolutionStep(s["narration"], s["scene_description"], s.get("target_seconds"))
                 for s in data["steps"]
             ]
         )
 
+SOLUTION_SCHEMA = segments_schema(
+    "steps", "Scene description showing the mathematical work of this step (static states, animations, durations)"
+)
+
 # ---------------------------
 # Updated Parsing Functions
 # ---------------------------
@@ -164,6 +171,7 @@ def extract_solution_steps(script: str) -> List[SolutionStep]:
             steps.append(SolutionStep(narration, default_scene))
             print(f"🔧 Created step {i} with default scene description")
     
+    count_parse_path("default_scene", sum(1 for b in step_blocks if b.strip() and '[END STEP|| Scene description:' not in b))
     print(f"🔍 DEBUG: Final result: {len(steps)} steps extracted")
     for i, step in enumerate(steps):
         word_count = len(step.narration.split())
@@ -174,14 +182,15 @@ def extract_solution_steps(script: str) -> List[SolutionStep]:
 # ---------------------------
 # Problem-Solving Script Generation
 # ---------------------------
-def generate_problem_solution_script(problem: str, duration_minutes: int = 3, detail_level: int = 2) -> ProblemSolutionScript:
+def generate_problem_solution_script(problem: str, duration_minutes: int = 3, detail_level: int = 2,
+                                     structured: bool = LLM_STRUCTURED_SCRIPT) -> ProblemSolutionScript:
     """
     Generate a step-by-step solution script for a specific problem
     """
     if detail_level < 1 or detail_level > 3:
         detail_level = 2
 
-    expected_words = duration_minutes * WORDS_PER_MINUTE
+    expected_words = round(duration_minutes * speaking_rate(WORDS_PER_MINUTE))
     
     # Calculate reasonable step count based on problem complexity and duration
     # For problem solving, we typically want 3-6 steps
@@ -208,20 +217,38 @@ def generate_problem_solution_script(problem: str, duration_minutes: int = 3, de
     )
 
     try:
-        full_script = llm.chat(system_prompt, user_prompt)
-        
-        # Debug output to track what's happening
-        print(f"🔍 DEBUG: Raw solution script length: {len(full_script)} characters")
-        print(f"🔍 DEBUG: Requested {step_count} steps with ~{words_per_step} words each")
-        print(f"🔍 DEBUG: Target: {expected_words} words = {duration_minutes} minutes")
-        
-        # Extract solution steps
-        steps = extract_solution_steps(full_script)
-        print(f"🔍 DEBUG: Extracted {len(steps)} solution steps")
+        steps = []
+        if structured:
+            structured_system, structured_user = structured_prompts(system_prompt, user_prompt, "STEP", "steps")
+            with llm_context(stage="script"):
+                data = solver_llm().chat_json(
+                    structured_system, structured_user, SOLUTION_SCHEMA, "submit_solution",
+                    "Submit the finished solution script, one entry per step"
+                )
+            steps = [SolutionStep(**entry) for entry in segments_from_json(data, "steps")]
+
+        if steps:
+            count_parse_path("structured")
+            print(f"🔍 DEBUG: Structured solution script with {len(steps)} steps")
+        else:
+            if structured:
+                print("⚠️ Structured solution script unusable, falling back to markers")
+            with llm_context(stage="script"):
+                full_script = solver_llm().chat(system_prompt, user_prompt)
+            
+            # Debug output to track what's happening
+            print(f"🔍 DEBUG: Raw solution script length: {len(full_script)} characters")
+            print(f"🔍 DEBUG: Requested {step_count} steps with ~{words_per_step} words each")
+            print(f"🔍 DEBUG: Target: {expected_words} words = {duration_minutes} minutes")
+            
+            # Extract solution steps
+            steps = extract_solution_steps(full_script)
+            count_parse_path("markers")
+            print(f"🔍 DEBUG: Extracted {len(steps)} solution steps")
         
         if steps:
             total_words = sum(len(step.narration.split()) for step in steps)
-            estimated_duration = total_words / WORDS_PER_MINUTE
+            estimated_duration = total_words / speaking_rate(WORDS_PER_MINUTE)
             print(f"🔍 DEBUG: Actual: {total_words} words = {estimated_duration:.1f} minutes")
             
             # Show word count per step
@@ -256,7 +283,7 @@ def generate_problem_script_for_pipeline(problem: str, duration_minutes: int = 3
     
     # Convert to existing Script format
     concepts = [
-        ConceptSegment(step.narration, step.scene_description)
+        ConceptSegment(step.narration, step.scene_description, step.target_seconds)
         for step in problem_script.steps
     ]
     
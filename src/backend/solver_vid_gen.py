@@ -1,6 +1,4 @@
-import os
 import subprocess
-from pathlib import Path
 from dotenv import load_dotenv
 
 # Import the new problem-solving script generator
@@ -9,17 +7,10 @@ from backend.solver_script_gen import generate_problem_script_for_pipeline
 # Keep existing imports for the rest of the pipeline
 from backend.generate_scenes import generate_all_scenes_from_script
 from backend.generate_audio import generate_audio_narration
-from config.paths import VIDEO_OUTPUT_DIR
-import threading
-import shutil
-import re
-import json
+from config.registry import require_tool
 
 load_dotenv()
 
-FFMPEG_PATH = shutil.which("ffmpeg")
-if FFMPEG_PATH is None:
-    raise FileNotFoundError("ffmpeg not found in PATH. Please install it or add it to your PATH.")
 
 def safe_slugify(text: str) -> str:
     """Convert text to safe folder name"""
@@ -105,7 +96,7 @@ def make_problem_solving_video(problem: str, detail_level: int = 2, duration: in
         final_output = video_path.parent / "problem_solution_video.mp4"
         
         cmd = [
-            FFMPEG_PATH, "-y",
+            require_tool("ffmpeg"), "-y",
             "-i", str(video_path),
             "-i", str(audio_path),
             "-c:v", "copy", "-c:a", "aac",
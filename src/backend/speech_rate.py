@@ -0,0 +1,127 @@
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config.paths import SPEECH_RATE_PATH
+from config.settings import SPEECH_RATE_MIN_SAMPLES
+
+# Measured chunks outside this range (truncated audio, silence, ...) are ignored
+MIN_PLAUSIBLE_WPM = 40
+MAX_PLAUSIBLE_WPM = 400
+
+
+class SpeechRates:
+    """
+    Calibration store for how fast each TTS voice actually speaks.
+
+    Every synthesized chunk is appended to a JSON lines file as (voice,
+    model, words, characters, measured seconds). Rates are fitted per
+    (voice, model) as total duration over total words/characters, which
+    weights long chunks more than short ones. Until a voice has
+    min_samples measurements, callers get their own default.
+    """
+
+    def __init__(self, path: Path = SPEECH_RATE_PATH, min_samples: int = SPEECH_RATE_MIN_SAMPLES):
+        self.path = Path(path)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        # (voice, model) -> [samples, words, characters, seconds]
+        self._totals: Optional[Dict[Tuple[str, str], list]] = None
+
+    def _load(self):
+        if self._totals is not None:
+            return
+        self._totals = {}
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                # Corrupt or hand-edited lines are skipped; those voices keep their defaults
+                try:
+                    sample = json.loads(line)
+                    values = (str(sample["voice"]), str(sample["model"]), int(sample["words"]),
+                              int(sample["characters"]), float(sample["seconds"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if values[2] <= 0 or values[3] <= 0 or values[4] <= 0:
+                    continue
+                self._add(*values)
+
+    def _add(self, voice: str, model: str, words: int, characters: int, seconds: float):
+        totals = self._totals.setdefault((voice, model), [0, 0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += words
+        totals[2] += characters
+        totals[3] += seconds
+
+    def record(self, voice: str, model: str, text: str, seconds: float) -> bool:
+        """Store one measured chunk; returns False if it was rejected as implausible"""
+        words = len(text.split())
+        if not words or seconds <= 0 or not MIN_PLAUSIBLE_WPM <= words / seconds * 60 <= MAX_PLAUSIBLE_WPM:
+            return False
+
+        sample = {
+            "voice": voice, "model": model, "words": words, "characters": len(text),
+            "seconds": round(seconds, 3), "recorded_at": time.time(),
+        }
+        with self._lock:
+            self._load()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample) + "\n")
+            self._add(voice, model, sample["words"], sample["characters"], sample["seconds"])
+        return True
+
+    def _fitted(self, voice: str, model: str) -> Optional[list]:
+        with self._lock:
+            self._load()
+            totals = self._totals.get((voice, model))
+        if totals is None or totals[0] < self.min_samples:
+            return None
+        return list(totals)
+
+    def words_per_minute(self, voice: str, model: str, default: float) -> float:
+        """Fitted speaking rate of a voice, or default while it is uncalibrated"""
+        totals = self._fitted(voice, model)
+        if totals is None:
+            return default
+        _, words, _, seconds = totals
+        return words / seconds * 60
+
+    def estimate_seconds(self, voice: str, model: str, text: str, default_wpm: float) -> float:
+        """
+        How long text takes to speak. Calibrated voices are estimated from the
+        character count, which tracks spoken length more closely than words.
+        """
+        totals = self._fitted(voice, model)
+        if totals is None:
+            return len(text.split()) / default_wpm * 60
+        _, _, characters, seconds = totals
+        return len(text) * seconds / characters
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {
+                f"{voice}/{model}": {
+                    "samples": samples,
+                    "words_per_minute": round(words / seconds * 60, 1) if seconds else None,
+                    "calibrated": samples >= self.min_samples,
+                }
+                for (voice, model), (samples, words, _, seconds) in self._totals.items()
+            }
+
+
+_rates: Optional[SpeechRates] = None
+_rates_lock = threading.Lock()
+
+
+def get_speech_rates() -> SpeechRates:
+    """Process-wide calibration store at SPEECH_RATE_PATH"""
+    global _rates
+    with _rates_lock:
+        if _rates is None:
+            _rates = SpeechRates()
+        return _rates
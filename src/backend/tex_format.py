@@ -0,0 +1,256 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Not POSIX: formats are still built atomically, a concurrent first use may just build twice
+    fcntl = None
+
+from config.paths import TEX_FORMAT_DIR, MATH_TEX_KNOWLEDGE_PATH
+
+BEGIN_DOCUMENT = r"\begin{document}"
+TEX_TIMEOUT = 60  # seconds per latex run
+
+# key -> built format path, or None if building it failed (not retried in this process)
+_formats: Dict[str, Optional[Path]] = {}
+
+
+def split_preamble(source: str):
+    """(preamble, body) of a generated .tex file, or None if it has no \\begin{document}"""
+    index = source.find(BEGIN_DOCUMENT)
+    if index < 0:
+        return None
+    return source[:index], source[index:]
+
+
+def format_key(preamble: str, tex_compiler: str) -> str:
+    return hashlib.sha256(f"{tex_compiler}\0{preamble}".encode("utf-8")).hexdigest()[:16]
+
+
+def latex_command(tex_compiler: str, *args: str) -> List[str]:
+    return [tex_compiler, "-interaction=batchmode", "-halt-on-error", "-output-format=dvi", *args]
+
+
+def ensure_format(preamble: str, tex_compiler: str = "latex", format_dir: Path = TEX_FORMAT_DIR) -> Optional[Path]:
+    """
+    Path of the precompiled format (.fmt) for a template preamble, dumping it
+    with `latex -ini` on first use. Formats are shared across processes; the
+    first one to need a preamble builds it under a file lock.
+    """
+    key = format_key(preamble, tex_compiler)
+    if key in _formats:
+        return _formats[key]
+
+    format_dir = Path(format_dir)
+    format_dir.mkdir(parents=True, exist_ok=True)
+    fmt_file = format_dir / f"{key}.fmt"
+    if fcntl is None:
+        if not fmt_file.exists():
+            build_format(preamble, tex_compiler, format_dir, key)
+    else:
+        with open(format_dir / f"{key}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if not fmt_file.exists():
+                    build_format(preamble, tex_compiler, format_dir, key)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    _formats[key] = fmt_file if fmt_file.exists() else None
+    return _formats[key]
+
+
+def build_format(preamble: str, tex_compiler: str, format_dir: Path, key: str):
+    """Run the preamble once in ini mode and \\dump it as format_dir/key.fmt"""
+    # Built under a temporary job name and renamed, so readers never see a partial .fmt
+    job = f"{key}.{os.getpid()}"
+    (format_dir / f"{job}.tex").write_text(preamble + "\n\\dump\n", encoding="utf-8")
+    try:
+        subprocess.run(
+            latex_command(tex_compiler, "-ini", f"-jobname={job}", f"-output-directory={format_dir}",
+                          f"&{tex_compiler}", f"{job}.tex"),
+            cwd=format_dir, capture_output=True, timeout=TEX_TIMEOUT,
+        )
+        if (format_dir / f"{job}.fmt").exists():
+            os.replace(format_dir / f"{job}.fmt", format_dir / f"{key}.fmt")
+        else:
+            print(f"⚠️ Could not build LaTeX format for preamble {key}, see {format_dir / f'{job}.log'}")
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️ Could not build LaTeX format for preamble {key}: {e}")
+    finally:
+        for suffix in (".tex", ".fmt"):
+            try:
+                (format_dir / f"{job}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+
+def compile_with_format(tex_file: Path, tex_compiler: str = "latex",
+                        format_dir: Path = TEX_FORMAT_DIR) -> Optional[Path]:
+    """
+    Compile a generated .tex file to DVI against its preamble's precompiled
+    format, skipping the per-formula preamble load. The DVI has the name and
+    location a regular compile would give it. Returns None if the format or
+    the compile failed, so the caller can fall back to a normal compile
+    (which also produces the usual error report).
+    """
+    tex_file = Path(tex_file)
+    parts = split_preamble(tex_file.read_text(encoding="utf-8"))
+    if parts is None:
+        return None
+    preamble, body = parts
+    fmt_file = ensure_format(preamble, tex_compiler, format_dir)
+    if fmt_file is None:
+        return None
+
+    body_file = tex_file.with_name(f"{tex_file.stem}.body.tex")
+    body_file.write_text(body, encoding="utf-8")
+    dvi_file = tex_file.with_suffix(".dvi")
+    env = {**os.environ, "TEXFORMATS": f"{fmt_file.parent}{os.pathsep}{os.environ.get('TEXFORMATS', '')}"}
+    try:
+        result = subprocess.run(
+            latex_command(tex_compiler, f"-fmt={fmt_file.stem}", f"-jobname={tex_file.stem}",
+                          f"-output-directory={tex_file.parent}", body_file.name),
+            cwd=tex_file.parent, env=env, capture_output=True, timeout=TEX_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    finally:
+        try:
+            body_file.unlink()
+        except FileNotFoundError:
+            pass
+    if result.returncode != 0 or not dvi_file.exists():
+        return None
+    return dvi_file
+
+
+def install_manim_hook(format_dir: Path = TEX_FORMAT_DIR):
+    """
+    Route manim's latex -> DVI compiles in this process through the
+    precompiled formats (other compilers/outputs are left as they are).
+    Call once after manim is imported and before other compile_tex wrappers.
+    """
+    from manim.utils import tex_file_writing
+
+    original_compile = tex_file_writing.compile_tex
+
+    def compile_tex(tex_file, tex_compiler, output_format):
+        if tex_compiler == "latex" and output_format == ".dvi":
+            dvi_file = compile_with_format(Path(tex_file), tex_compiler, format_dir)
+            if dvi_file is not None:
+                return dvi_file
+        return original_compile(tex_file, tex_compiler, output_format)
+
+    tex_file_writing.compile_tex = compile_tex
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+def load_formula_corpus(path: Path = MATH_TEX_KNOWLEDGE_PATH, limit: Optional[int] = None) -> List[str]:
+    """First string argument of every MathTex(...) example in the MathTex guide, deduplicated"""
+    text = Path(path).read_text(encoding="utf-8")
+    formulas = []
+    for match in re.finditer(r"""MathTex\(\s*r?(["'])(.+?)(?<!\\)\1""", text):
+        formula = match.group(2)
+        if formula not in formulas:
+            formulas.append(formula)
+    return formulas[:limit] if limit else formulas
+
+
+def _time_latex(command: List[str], cwd: Path, env: Optional[dict] = None) -> Optional[float]:
+    """Seconds one latex run took, or None if it failed or timed out"""
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(command, cwd=cwd, env=env, capture_output=True, timeout=TEX_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    elapsed = time.perf_counter() - started
+    return elapsed if result.returncode == 0 else None
+
+
+def benchmark(formulas: List[str], tex_compiler: str = "latex", repeat: int = 1) -> dict:
+    """
+    Compile each formula with manim's default template twice, with the full
+    preamble and with the precompiled format, and compare per-formula latex
+    time (repeat times over the corpus). DVI -> SVG conversion is the same
+    either way and is not timed. Formulas that fail or time out in either
+    run are counted as failed and left out of the timings.
+
+    The speedup has not been measured yet: no benchmark run has been
+    recorded on a machine with LaTeX installed, so treat the format path
+    as unverified until this reports numbers for your TeX distribution.
+    """
+    from manim import config
+
+    template = config.tex_template
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        format_dir = tmp / "formats"
+        preamble, _ = split_preamble(template.get_texcode_for_expression_in_env("x", "align*"))
+
+        started = time.perf_counter()
+        _formats.clear()
+        fmt_file = ensure_format(preamble, tex_compiler, format_dir)
+        format_seconds = time.perf_counter() - started
+        if fmt_file is None:
+            raise RuntimeError(f"Could not build a LaTeX format with {tex_compiler}")
+        env = {**os.environ, "TEXFORMATS": f"{format_dir}{os.pathsep}{os.environ.get('TEXFORMATS', '')}"}
+
+        plain, with_format, failed = [], [], 0
+        for i, formula in enumerate(formulas * repeat):
+            source = template.get_texcode_for_expression_in_env(formula, "align*")
+            tex_file = tmp / f"f{i}.tex"
+            tex_file.write_text(source, encoding="utf-8")
+            (tmp / f"f{i}.body.tex").write_text(split_preamble(source)[1], encoding="utf-8")
+
+            full = _time_latex(latex_command(tex_compiler, f"-jobname=p{i}", tex_file.name), tmp)
+            fast = _time_latex(latex_command(tex_compiler, f"-fmt={fmt_file.stem}", f"-jobname=q{i}",
+                                             f"f{i}.body.tex"), tmp, env)
+            if full is None or fast is None:
+                failed += 1
+                continue
+            plain.append(full)
+            with_format.append(fast)
+
+    if not plain:
+        raise RuntimeError("No formula compiled; is LaTeX installed?")
+    return {
+        "formulas": len(formulas) * repeat,
+        "failed": failed,
+        "format_build_seconds": format_seconds,
+        "plain_mean_seconds": statistics.mean(plain),
+        "plain_median_seconds": statistics.median(plain),
+        "format_mean_seconds": statistics.mean(with_format),
+        "format_median_seconds": statistics.median(with_format),
+        "speedup": statistics.mean(plain) / statistics.mean(with_format),
+        "break_even_formulas": format_seconds / max(statistics.mean(plain) - statistics.mean(with_format), 1e-9),
+    }
+
+
+# CLI benchmark
+if __name__ == "__main__":
+    if shutil.which("latex") is None:
+        raise SystemExit("❌ latex not found on PATH")
+    corpus = load_formula_corpus()
+    print(f"📐 Benchmarking {len(corpus)} formulas from {MATH_TEX_KNOWLEDGE_PATH.name} (3 passes)...")
+    report = benchmark(corpus, repeat=3)
+    print(f"🏗️  Format build: {report['format_build_seconds']:.2f}s (one-off per template)")
+    print(f"🐢 Full preamble: {report['plain_mean_seconds'] * 1000:.0f} ms mean, "
+          f"{report['plain_median_seconds'] * 1000:.0f} ms median per formula")
+    print(f"🐇 Precompiled format: {report['format_mean_seconds'] * 1000:.0f} ms mean, "
+          f"{report['format_median_seconds'] * 1000:.0f} ms median per formula")
+    print(f"📊 Speedup {report['speedup']:.2f}x, format pays for itself after "
+          f"{report['break_even_formulas']:.1f} formulas ({report['failed']} failed to compile)")
+    print("ℹ️  No baseline numbers have been recorded for this benchmark yet; "
+          "keep this run's output as the first measurement.")
@@ -1,21 +1,19 @@
-import os
 import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
-from backend.generate_script import generate_script
+from backend.generate_script import Script, ScriptGenerationError, generate_script, stream_script
 from backend.generate_scenes import generate_all_scenes_from_script
-from backend.generate_audio import generate_audio_narration
-from config.paths import VIDEO_OUTPUT_DIR
-import threading
-import shutil
+from backend.generate_audio import generate_audio_narration, get_audio_duration, estimate_narration_seconds
+from config.registry import require_tool
+from config.render_quality import QualityTier, FINAL_TIER, scene_video_path
+from config.settings import LLM_STREAM_SCRIPT, LLM_STRUCTURED_SCRIPT, WORDS_PER_MINUTE
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import itertools
 import re
-import json
 
 load_dotenv()
 
-FFMPEG_PATH = shutil.which("ffmpeg")
-if FFMPEG_PATH is None:
-    raise FileNotFoundError("ffmpeg not found in PATH. Please install it or add it to your PATH.")
 
 def safe_slugify(text: str) -> str:
     """Convert text to safe folder name"""
@@ -24,23 +22,9 @@ def safe_slugify(text: str) -> str:
     text = re.sub(r'[^a-z0-9]+', '-', text)
     return text.strip('-')
 
-def get_audio_duration(audio_path: Path) -> float:
-    """Get duration of audio file in seconds using ffprobe"""
-    try:
-        cmd = [
-            "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
-            "-of", "csv=p=0", str(audio_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return float(result.stdout.strip())
-    except Exception as e:
-        print(f"❌ Error getting audio duration: {e}")
-        return 0.0
-
-def estimate_speaking_duration(text: str, wpm: int = 150) -> float:
-    """Estimate how long text will take to speak"""
-    words = len(text.split())
-    return (words / wpm) * 60  # Convert minutes to seconds
+def estimate_speaking_duration(text: str, wpm: int = WORDS_PER_MINUTE) -> float:
+    """Estimate how long text will take to speak (wpm, the script sizing rate, is used until the voice is calibrated)"""
+    return estimate_narration_seconds(text, default_wpm=wpm)
 
 def break_narration_into_chunks(narration: str, scene_description: str) -> list:
     """
@@ -209,33 +193,38 @@ def generate_synchronized_script(original_script):
     """
     print("🔧 Generating synchronized script with detailed timing...")
     
-    synchronized_concepts = []
-    
-    for i, concept in enumerate(original_script.concepts):
-        print(f"   Processing concept {i+1}: {concept.narration[:50]}...")
-        
-        # Break narration into timed chunks
-        narration_chunks = break_narration_into_chunks(
-            concept.narration, 
-            concept.scene_description
-        )
-        
-        # Create new scene description with timing
-        timed_scene_description = create_timed_scene_description(
-            concept.scene_description,
-            narration_chunks
-        )
-        
-        # Store the chunk information for later audio generation
-        concept.narration_chunks = narration_chunks
-        concept.scene_description = timed_scene_description
-        
-        synchronized_concepts.append(concept)
+    synchronized_concepts = [
+        synchronize_concept(concept, i) for i, concept in enumerate(original_script.concepts)
+    ]
     
     # Update the script
     original_script.concepts = synchronized_concepts
     return original_script
 
+def synchronize_concept(concept, scene_index: int):
+    """
+    Split one concept's narration into timed chunks and add the timing to its
+    scene description (modifies and returns the concept)
+    """
+    print(f"   Processing concept {scene_index+1}: {concept.narration[:50]}...")
+    
+    # Break narration into timed chunks
+    narration_chunks = break_narration_into_chunks(
+        concept.narration, 
+        concept.scene_description
+    )
+    
+    # Create new scene description with timing
+    timed_scene_description = create_timed_scene_description(
+        concept.scene_description,
+        narration_chunks
+    )
+    
+    # Store the chunk information for later audio generation
+    concept.narration_chunks = narration_chunks
+    concept.scene_description = timed_scene_description
+    return concept
+
 def generate_chunked_audio_for_scene(concept, scene_index: int) -> list:
     """
     Generate separate audio files for each narration chunk within a scene
@@ -268,25 +257,46 @@ def generate_chunked_audio_for_scene(concept, scene_index: int) -> list:
     
     return audio_files
 
-def create_perfectly_synced_video(script, dry_run: bool = False):
+def create_perfectly_synced_video(script, dry_run: bool = False, concept_stream=None):
     """
-    Generate video with perfect audio-visual synchronization
+    Generate video with perfect audio-visual synchronization.
+    With concept_stream (see stream_script) the script's concepts are filled
+    in as they arrive, and narration and scene rendering for each concept
+    start while later concepts are still being written.
     """
     print("🎬 Creating perfectly synchronized video...")
     
-    # Step 1: Generate synchronized script with timing
-    sync_script = generate_synchronized_script(script)
-    
-    # Step 2: Generate chunked audio for each scene
-    all_scene_audio = []
-    for i, concept in enumerate(sync_script.concepts):
-        scene_audio = generate_chunked_audio_for_scene(concept, i)
-        all_scene_audio.append(scene_audio)
-    
-    # Step 3: Generate video scenes with the synchronized script
-    # Note: This will pass the timed scene descriptions to Manim
-    print("🎬 Generating video scenes with synchronized timing...")
-    video_path = generate_all_scenes_from_script(sync_script, max_workers=1)
+    if concept_stream is None:
+        # Step 1: Generate synchronized script with timing
+        sync_script = generate_synchronized_script(script)
+        
+        # Step 2: Generate chunked audio for each scene
+        all_scene_audio = []
+        for i, concept in enumerate(sync_script.concepts):
+            scene_audio = generate_chunked_audio_for_scene(concept, i)
+            all_scene_audio.append(scene_audio)
+        
+        # Step 3: Generate video scenes with the synchronized script
+        # Note: This will pass the timed scene descriptions to Manim
+        print("🎬 Generating video scenes with synchronized timing...")
+        video_path = generate_all_scenes_from_script(sync_script, max_workers=1)
+    else:
+        # Steps 1-3 per concept: narration is synthesized on one background
+        # thread (keeping TTS calls sequential) while scenes render
+        print("🎬 Generating audio and video scenes as concepts arrive...")
+        with ThreadPoolExecutor(max_workers=1) as audio_executor:
+            audio_futures = []
+
+            def synced_concepts():
+                for i, concept in enumerate(concept_stream):
+                    synchronize_concept(concept, i)
+                    audio_futures.append(audio_executor.submit(
+                        contextvars.copy_context().run, generate_chunked_audio_for_scene, concept, i
+                    ))
+                    yield concept
+
+            video_path = generate_all_scenes_from_script(script, max_workers=1, concept_stream=synced_concepts())
+            all_scene_audio = [future.result() for future in audio_futures]
     
     if not video_path or not video_path.exists():
         raise Exception("Video generation failed")
@@ -297,7 +307,8 @@ def create_perfectly_synced_video(script, dry_run: bool = False):
     
     return final_output
 
-def combine_chunked_audio_with_video(video_path: Path, all_scene_audio: list) -> Path:
+def combine_chunked_audio_with_video(video_path: Path, all_scene_audio: list,
+                                     quality: QualityTier = FINAL_TIER) -> Path:
     """
     Combine the chunked audio with video scenes for perfect synchronization
     """
@@ -315,9 +326,9 @@ def combine_chunked_audio_with_video(video_path: Path, all_scene_audio: list) ->
         print(f"   🎬 Processing scene {scene_num}...")
         
         # Find the scene video
-        scene_video_path = topic_video_dir / "media" / "videos" / f"scene_{scene_num}" / "1080p60" / f"scene_{scene_num}.mp4"
+        scene_video = scene_video_path(topic_video_dir, f"scene_{scene_num}", quality)
         
-        if not scene_video_path.exists():
+        if not scene_video.exists():
             print(f"   ❌ Scene {scene_num} video not found")
             continue
         
@@ -329,8 +340,8 @@ def combine_chunked_audio_with_video(video_path: Path, all_scene_audio: list) ->
             synced_scene_path = topic_video_dir / f"synced_scene_{scene_num}.mp4"
             
             cmd = [
-                FFMPEG_PATH, "-y",
-                "-i", str(scene_video_path),
+                require_tool("ffmpeg"), "-y",
+                "-i", str(scene_video),
                 "-i", str(scene_audio_path),
                 "-c:v", "copy", "-c:a", "aac",
                 "-map", "0:v:0", "-map", "1:a:0",
@@ -346,7 +357,7 @@ def combine_chunked_audio_with_video(video_path: Path, all_scene_audio: list) ->
                 print(f"   ❌ Failed to sync scene {scene_num}: {e}")
         else:
             print(f"   ⚠️ No audio for scene {scene_num}, using video only")
-            scene_videos.append(scene_video_path)
+            scene_videos.append(scene_video)
     
     # Concatenate all synchronized scenes
     if scene_videos:
@@ -358,7 +369,7 @@ def combine_chunked_audio_with_video(video_path: Path, all_scene_audio: list) ->
                     f.write(f"file '{scene_path.absolute()}'\n")
             
             cmd = [
-                FFMPEG_PATH, "-y", "-f", "concat", "-safe", "0",
+                require_tool("ffmpeg"), "-y", "-f", "concat", "-safe", "0",
                 "-i", str(concat_list_file), "-c", "copy", str(final_output)
             ]
             
@@ -396,7 +407,7 @@ def combine_audio_chunks_for_scene(audio_chunks: list, scene_num: int, output_di
                 f.write(f"file '{chunk['audio_path'].absolute()}'\n")
         
         cmd = [
-            FFMPEG_PATH, "-y", "-f", "concat", "-safe", "0",
+            require_tool("ffmpeg"), "-y", "-f", "concat", "-safe", "0",
             "-i", str(concat_file), "-c", "copy", str(combined_audio)
         ]
         
@@ -420,11 +431,23 @@ def make_perfectly_synchronized_video(topic: str, level: int = 2, duration: int
     print("This will create content-level synchronization where audio matches exactly what's on screen")
     print("=" * 80)
 
-    # Step 1: Generate script
+    # Step 1: Generate script (streamed: concepts are consumed by step 2 as they arrive)
     print("📝 Step 1: Generating script...")
+    concept_stream = None
     try:
-        script = generate_script(topic=topic, duration_minutes=duration, sophistication_level=level)
-        print(f"✅ Script generated with {len(script.concepts)} concepts")
+        # stream_script parses markers, so structured output (which needs the
+        # whole reply) takes precedence when both are enabled
+        if LLM_STREAM_SCRIPT and not LLM_STRUCTURED_SCRIPT:
+            script = Script(topic=topic, duration_minutes=duration, sophistication_level=level, concepts=[])
+            concept_stream = stream_script(topic=topic, duration_minutes=duration, sophistication_level=level)
+            # Wait for the first concept here, so a script that cannot be generated fails as such
+            first_concept = next(concept_stream, None)
+            if first_concept is None:
+                raise ScriptGenerationError("Script generation failed: no concepts in the reply")
+            concept_stream = itertools.chain([first_concept], concept_stream)
+        else:
+            script = generate_script(topic=topic, duration_minutes=duration, sophistication_level=level)
+            print(f"✅ Script generated with {len(script.concepts)} concepts")
     except Exception as e:
         print(f"❌ Script generation failed: {e}")
         raise
@@ -432,7 +455,7 @@ def make_perfectly_synchronized_video(topic: str, level: int = 2, duration: int
     # Step 2: Create perfectly synchronized version
     print("\n🔧 Step 2: Creating perfect content synchronization...")
     try:
-        result = create_perfectly_synced_video(script, dry_run)
+        result = create_perfectly_synced_video(script, dry_run, concept_stream)
         
         if result:
             print("🎉 PERFECTLY SYNCHRONIZED VIDEO GENERATION COMPLETE!")
@@ -445,6 +468,10 @@ def make_perfectly_synchronized_video(topic: str, level: int = 2, duration: int
         else:
             raise Exception("Perfect synchronization failed")
             
+    except ScriptGenerationError as e:
+        # The stream broke off later on: not a synchronization problem
+        print(f"❌ Script generation failed: {e}")
+        raise
     except Exception as e:
         print(f"❌ Perfect synchronization failed: {e}")
         print("🔄 Falling back to basic synchronization...")
@@ -469,7 +496,7 @@ def make_synchronized_video_fallback(topic: str, level: int = 2, duration: int =
     if video_path and audio_path:
         output_path = video_path.parent / "fallback_synchronized_video.mp4"
         cmd = [
-            FFMPEG_PATH, "-y",
+            require_tool("ffmpeg"), "-y",
             "-i", str(video_path),
             "-i", str(audio_path),
             "-c:v", "copy", "-c:a", "aac",
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from config.paths import CASSETTE_DIR
+from config.settings import CASSETTE_MODE, CASSETTE_LATENCY_SCALE
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Replay was asked for a request that was never recorded"""
+
+
+class Cassette:
+    """
+    Record/replay store for external calls (LLM completions, TTS audio).
+
+    In record mode every call goes to the real service and its request,
+    response and latency are written to cassette_dir/<kind>/<sha256>.json
+    (binary responses go next to it as .bin). In replay mode the same
+    requests are answered from disk without any network access, optionally
+    sleeping for the recorded latency times latency_scale.
+    """
+
+    def __init__(self, cassette_dir: Path = CASSETTE_DIR, mode: str = CASSETTE_MODE,
+                 latency_scale: float = CASSETTE_LATENCY_SCALE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        self.cassette_dir = Path(cassette_dir)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.replayed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ---------------------------
+    # Storage
+    # ---------------------------
+    @staticmethod
+    def make_key(request: dict) -> str:
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, kind: str, request: dict) -> Path:
+        return self.cassette_dir / kind / f"{self.make_key(request)}.json"
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def save(self, kind: str, request: dict, response, latency_seconds: float, meta: Optional[dict] = None):
+        """Store one exchange; response is text or bytes"""
+        path = self._entry_path(kind, request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        entry = {
+            "request": request,
+            "latency_seconds": latency_seconds,
+            "meta": meta or {},
+            "recorded_at": time.time(),
+        }
+        if isinstance(response, bytes):
+            self._write_atomic(path.with_suffix(".bin"), response)
+            entry["response_file"] = path.with_suffix(".bin").name
+        else:
+            entry["response"] = response
+        self._write_atomic(path, json.dumps(entry, ensure_ascii=False, indent=2).encode("utf-8"))
+
+        with self._lock:
+            self.recorded += 1
+
+    def load(self, kind: str, request: dict) -> dict:
+        """Return the recorded entry for request (response already decoded) or raise CassetteMiss"""
+        path = self._entry_path(kind, request)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if "response_file" in entry:
+                entry["response"] = (path.parent / entry["response_file"]).read_bytes()
+        except FileNotFoundError:
+            raise CassetteMiss(f"No {kind} recording for this request in {self.cassette_dir}")
+
+        with self._lock:
+            self.replayed += 1
+        return entry
+
+    # ---------------------------
+    # Record / replay
+    # ---------------------------
+    def replay(self, kind: str, request: dict) -> dict:
+        entry = self.load(kind, request)
+        if self.latency_scale > 0:
+            time.sleep(entry["latency_seconds"] * self.latency_scale)
+        return entry
+
+    async def areplay(self, kind: str, request: dict) -> dict:
+        entry = self.load(kind, request)
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry["latency_seconds"] * self.latency_scale)
+        return entry
+
+    def call(self, kind: str, request: dict, compute: Callable[[], object]):
+        """Run compute() through the cassette according to the current mode"""
+        if self.mode == "replay":
+            return self.replay(kind, request)["response"]
+
+        started = time.monotonic()
+        response = compute()
+        if self.mode == "record" and response:
+            self.save(kind, request, response, time.monotonic() - started)
+        return response
+
+    async def acall(self, kind: str, request: dict, compute: Callable[[], Awaitable[object]]):
+        if self.mode == "replay":
+            return (await self.areplay(kind, request))["response"]
+
+        started = time.monotonic()
+        response = await compute()
+        if self.mode == "record" and response:
+            self.save(kind, request, response, time.monotonic() - started)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "recorded": self.recorded, "replayed": self.replayed}
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Process-wide cassette configured from CASSETTE_MODE / CASSETTE_DIR"""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette()
+        return _cassette
+
+
+def use_cassette(cassette: Cassette):
+    """Swap the process-wide cassette (e.g. to replay a specific recording in a benchmark)"""
+    global _cassette
+    with _cassette_lock:
+        _cassette = cassette
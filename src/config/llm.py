@@ -1,70 +1,630 @@
 import os
-from openai import OpenAI
-from anthropic import Anthropic
+import json
+import time
+import asyncio
+import threading
+import weakref
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Optional, Sequence
+import openai
+import anthropic
+from openai import OpenAI, AsyncOpenAI
+from anthropic import Anthropic, AsyncAnthropic
 from dotenv import load_dotenv
+from config.llm_cache import ResponseCache, get_default_cache
+from config.llm_batch import LLMBatch
+from config.llm_telemetry import (
+    CallRecord, track_call, current_call, mark_attempt, mark_first_token, mark_usage_estimated, add_usage,
+)
+from config.cassette import get_cassette
+from config.llm_governor import get_governor, estimate_tokens, is_rate_limit_error, retry_after_seconds
+from config.llm_retry import LatencyTracker, is_retryable_error, backoff_delay, run_hedged, arun_hedged
+from config.settings import (
+    LLM_CACHE_ENABLED, LLM_ASYNC_MAX_CONNECTIONS, LLM_ASYNC_MAX_KEEPALIVE, LLM_MAX_RETRIES, LLM_HEDGE_REQUESTS
+)
 
 load_dotenv()
 
+# ---------------------------
+# Shared async connection pools
+# ---------------------------
+# httpx connections belong to the event loop that opened them, so pools are
+# shared per (event loop, provider). Entries disappear with their loop.
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _pooled_http_client(sdk):
+    """
+    The SDK's own async HTTP client sized by LLM_ASYNC_MAX_CONNECTIONS /
+    LLM_ASYNC_MAX_KEEPALIVE. Limits are built from the SDK's default limits
+    type, since newer SDKs reject objects from a different httpx package.
+    """
+    limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=LLM_ASYNC_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_ASYNC_MAX_KEEPALIVE,
+    )
+    return sdk.DefaultAsyncHttpxClient(limits=limits, timeout=sdk.Timeout(600.0, connect=10.0))
+
+
+def _get_async_client(provider: str, api_key: str):
+    """Return the shared AsyncAnthropic/AsyncOpenAI client for the running loop"""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get((provider, api_key))
+        if client is None:
+            if provider == "anthropic":
+                client = AsyncAnthropic(api_key=api_key, http_client=_pooled_http_client(anthropic), max_retries=0)
+            else:
+                client = AsyncOpenAI(api_key=api_key, http_client=_pooled_http_client(openai), max_retries=0)
+            clients[(provider, api_key)] = client
+        return client
+
+
+async def aclose_async_clients():
+    """Close the pooled async clients of the running loop (e.g. on FastAPI shutdown)"""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.close()
+
+
 class LLMClient:
-    def __init__(self, model: str = "claude-sonnet-4-20250514", temperature: float = 0.3, max_tokens: int = 8000):
+    def __init__(self, model: str = "claude-sonnet-4-20250514", temperature: float = 0.3, max_tokens: int = 8000,
+                 cache: Optional[ResponseCache] = None):
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+
+        # Optional persistent response cache (shared default when LLM_CACHE_ENABLED=1)
+        if cache is None and LLM_CACHE_ENABLED:
+            cache = get_default_cache()
+        self.cache = cache
+
+        self._usage_lock = threading.Lock()
+        self._usage = {
+            "calls": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        }
         
         # Determine provider based on model name
         if self._is_claude_model(model):
             self.provider = "anthropic"
             self.api_key = os.getenv("ANTHROPIC_API_KEY")
             if not self.api_key:
-                raise EnvironmentError("ANTHROPIC_API_KEY not set in environment.")
-            self.client = Anthropic(api_key=self.api_key)
+                if not get_cassette().replaying:
+                    raise EnvironmentError("ANTHROPIC_API_KEY not set in environment.")
+                self.api_key = "cassette-replay"
+            self.client = Anthropic(api_key=self.api_key, max_retries=0)
         else:
             self.provider = "openai"
             self.api_key = os.getenv("OPENAI_API_KEY")
             if not self.api_key:
-                raise EnvironmentError("OPENAI_API_KEY not set in environment.")
-            self.client = OpenAI(api_key=self.api_key)
+                if not get_cassette().replaying:
+                    raise EnvironmentError("OPENAI_API_KEY not set in environment.")
+                self.api_key = "cassette-replay"
+            self.client = OpenAI(api_key=self.api_key, max_retries=0)
+
+        # Rate limits are per provider/model, so every client for the same model shares one governor
+        self.governor = get_governor(self.provider, self.model)
+        # Retries happen in _governed_call, so the SDK clients are created with max_retries=0
+        self.latency = LatencyTracker()
 
     def _is_claude_model(self, model: str) -> bool:
         """Check if the model is a Claude model"""
         return model.lower().startswith("claude")
 
-    def chat(self, system_prompt: str, user_prompt: str) -> str:
-        try:
-            if self.provider == "anthropic":
-                return self._chat_anthropic(system_prompt, user_prompt)
+    def chat(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None,
+             cached_system: Sequence[str] = ()) -> str:
+        """
+        Send one system/user exchange and return the text reply ("" on failure).
+
+        cached_system holds stable text blocks sent ahead of system_prompt.
+        On Anthropic each block gets a cache_control breakpoint so repeated
+        calls read it from the provider's prompt cache; OpenAI caches long
+        identical prefixes automatically, so there it is simply prepended.
+        """
+        max_tokens = max_tokens or self.max_tokens
+
+        with track_call(self.provider, self.model, "chat") as call:
+            if self.cache is None:
+                text = self._chat_uncached(system_prompt, user_prompt, max_tokens, cached_system)
             else:
-                return self._chat_openai(system_prompt, user_prompt)
-        except Exception as e:
-            print(f"❌ LLM call failed ({self.provider}/{self.model}): {e}")
-            return ""
+                key = ResponseCache.make_key(
+                    self.provider, self.model, self.temperature, max_tokens,
+                    "".join(cached_system) + system_prompt, user_prompt
+                )
+                text = self.cache.get_or_compute(
+                    key, lambda: self._chat_uncached(system_prompt, user_prompt, max_tokens, cached_system)
+                )
+            call.success = bool(text)
+            return text
 
-    def _chat_anthropic(self, system_prompt: str, user_prompt: str) -> str:
-        """Handle Anthropic/Claude API calls"""
+    def _chat_uncached(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                       cached_system: Sequence[str]) -> str:
+        if self.provider == "anthropic":
+            send = lambda: self._chat_anthropic(system_prompt, user_prompt, max_tokens, cached_system)
+        else:
+            send = lambda: self._chat_openai(system_prompt, user_prompt, max_tokens, cached_system)
+        request = self._cassette_request("chat", system_prompt, user_prompt, max_tokens, cached_system)
+        return self._through_cassette(
+            request, lambda: self._governed_call(send, estimate_tokens(system_prompt, user_prompt), "LLM call")
+        )
+
+    def _governed_call(self, send: Callable[[], str], tokens: int, label: str, hedge: bool = True) -> str:
+        """
+        Run one provider request under the shared rate governor, retrying
+        transient failures with jittered exponential backoff ("" on failure).
+
+        With LLM_HEDGE_REQUESTS=1 a duplicate request is fired once the call
+        runs past this client's p95 latency and the first answer wins.
+        """
+        def attempt() -> str:
+            with self.governor.slot(tokens):
+                mark_attempt(retry)
+                started = time.monotonic()
+                text = send()
+                self.latency.record(time.monotonic() - started)
+                return text
+
+        for retry in range(LLM_MAX_RETRIES + 1):
+            try:
+                threshold = self.latency.percentile() if hedge and LLM_HEDGE_REQUESTS else None
+                text = run_hedged(attempt, threshold) if threshold else attempt()
+                self.governor.report_success()
+                return text
+            except Exception as e:
+                delay = self._retry_delay(e, retry)
+                if delay is None:
+                    print(f"❌ {label} failed ({self.provider}/{self.model}): {e}")
+                    return ""
+                print(f"🔁 {label} failed ({e}), retry {retry + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+        return ""
+
+    async def _agoverned_call(self, send: Callable[[], Awaitable[str]], tokens: int, label: str,
+                              hedge: bool = True) -> str:
+        """Async counterpart of _governed_call"""
+        async def attempt() -> str:
+            async with self.governor.aslot(tokens):
+                mark_attempt(retry)
+                started = time.monotonic()
+                text = await send()
+                self.latency.record(time.monotonic() - started)
+                return text
+
+        for retry in range(LLM_MAX_RETRIES + 1):
+            try:
+                threshold = self.latency.percentile() if hedge and LLM_HEDGE_REQUESTS else None
+                text = await (arun_hedged(attempt, threshold) if threshold else attempt())
+                self.governor.report_success()
+                return text
+            except Exception as e:
+                delay = self._retry_delay(e, retry)
+                if delay is None:
+                    print(f"❌ {label} failed ({self.provider}/{self.model}): {e}")
+                    return ""
+                print(f"🔁 {label} failed ({e}), retry {retry + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        return ""
+
+    def _retry_delay(self, error: Exception, retry: int) -> Optional[float]:
+        """Seconds to wait before retrying error, or None if it is fatal or retries are used up"""
+        retry_after = retry_after_seconds(error)
+        if is_rate_limit_error(error):
+            self.governor.report_rate_limited(retry_after)
+        if retry >= LLM_MAX_RETRIES or not is_retryable_error(error):
+            return None
+        return max(backoff_delay(retry), retry_after or 0.0)
+
+    async def achat(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None,
+                    cached_system: Sequence[str] = ()) -> str:
+        """Coroutine version of chat() that runs on the shared async connection pool"""
+        max_tokens = max_tokens or self.max_tokens
+
+        with track_call(self.provider, self.model, "chat") as call:
+            if self.cache is None:
+                text = await self._achat_uncached(system_prompt, user_prompt, max_tokens, cached_system)
+            else:
+                key = ResponseCache.make_key(
+                    self.provider, self.model, self.temperature, max_tokens,
+                    "".join(cached_system) + system_prompt, user_prompt
+                )
+                text = await self.cache.aget_or_compute(
+                    key, lambda: self._achat_uncached(system_prompt, user_prompt, max_tokens, cached_system)
+                )
+            call.success = bool(text)
+            return text
+
+    async def _achat_uncached(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                              cached_system: Sequence[str]) -> str:
+        if self.provider == "anthropic":
+            send = lambda: self._achat_anthropic(system_prompt, user_prompt, max_tokens, cached_system)
+        else:
+            send = lambda: self._achat_openai(system_prompt, user_prompt, max_tokens, cached_system)
+        request = self._cassette_request("chat", system_prompt, user_prompt, max_tokens, cached_system)
+        return await self._athrough_cassette(
+            request, lambda: self._agoverned_call(send, estimate_tokens(system_prompt, user_prompt), "Async LLM call")
+        )
+
+    async def _achat_anthropic(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                               cached_system: Sequence[str] = ()) -> str:
+        """Handle Anthropic/Claude API calls on the shared async pool"""
+        client = _get_async_client(self.provider, self.api_key)
+        response = await client.messages.create(
+            **self._anthropic_request(system_prompt, user_prompt, max_tokens, cached_system)
+        )
+        self._record_usage(response.usage)
+        return response.content[0].text.strip()
+
+    async def _achat_openai(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                            cached_system: Sequence[str] = ()) -> str:
+        """Handle OpenAI API calls on the shared async pool"""
+        client = _get_async_client(self.provider, self.api_key)
+        response = await client.chat.completions.create(
+            **self._openai_request(system_prompt, user_prompt, max_tokens, cached_system)
+        )
+        self._record_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    def chat_stream(self, system_prompt: str, user_prompt: str, stop: Optional[Callable[[str], bool]] = None,
+                    max_tokens: Optional[int] = None, cached_system: Sequence[str] = (),
+                    stop_key: Optional[str] = None) -> str:
+        """
+        Stream a reply and return the text received ("" on failure).
+
+        stop is called with the reply received so far each time a delta
+        arrives (starting over if the request is retried); once it returns
+        True the stream is closed, so the provider stops generating and the
+        remaining tokens are neither waited for nor billed.
+
+        A reply cut short by stop is only valid for that stop condition, so
+        it is cached only when stop_key names the condition (e.g.
+        "first-code-block"); with a stop and no stop_key the response cache
+        is bypassed.
+        """
+        max_tokens = max_tokens or self.max_tokens
+
+        with track_call(self.provider, self.model, "stream") as call:
+            if self.cache is None or (stop is not None and stop_key is None):
+                text = self._chat_stream_uncached(system_prompt, user_prompt, stop, max_tokens, cached_system)
+            else:
+                # Early-stopped replies are truncated, so they never share entries with chat()
+                key = ResponseCache.make_key(
+                    self.provider, self.model, self.temperature, max_tokens,
+                    "".join(cached_system) + system_prompt, user_prompt,
+                    variant="stream" if stop is None else f"stream:{stop_key}"
+                )
+                text = self.cache.get_or_compute(
+                    key, lambda: self._chat_stream_uncached(system_prompt, user_prompt, stop, max_tokens, cached_system)
+                )
+            call.success = bool(text)
+            return text
+
+    def _chat_stream_uncached(self, system_prompt: str, user_prompt: str, stop: Optional[Callable[[str], bool]],
+                              max_tokens: int, cached_system: Sequence[str]) -> str:
+        if self.provider == "anthropic":
+            send = lambda: self._stream_anthropic(system_prompt, user_prompt, stop, max_tokens, cached_system)
+        else:
+            send = lambda: self._stream_openai(system_prompt, user_prompt, stop, max_tokens, cached_system)
+        # Streams are never hedged: the stop callback keeps per-reply state
+        request = self._cassette_request("stream", system_prompt, user_prompt, max_tokens, cached_system)
+        return self._through_cassette(
+            request,
+            lambda: self._governed_call(send, estimate_tokens(system_prompt, user_prompt), "LLM stream", hedge=False)
+        )
+
+    def chat_json(self, system_prompt: str, user_prompt: str, schema: dict, name: str,
+                  description: str = "", max_tokens: Optional[int] = None,
+                  cached_system: Sequence[str] = ()) -> Optional[dict]:
+        """
+        Ask for a reply that matches a JSON schema and return it parsed (None
+        on failure or if the reply is not valid JSON).
+
+        On Anthropic the model is forced to call a tool called name whose
+        input_schema is schema; on OpenAI the reply uses a strict json_schema
+        response_format, so schema should set additionalProperties false and
+        list every property as required.
+        """
+        max_tokens = max_tokens or self.max_tokens
+        tool = {"name": name, "description": description, "schema": schema}
+
+        with track_call(self.provider, self.model, "json") as call:
+            if self.cache is None:
+                text = self._chat_json_uncached(system_prompt, user_prompt, max_tokens, cached_system, tool)
+            else:
+                key = ResponseCache.make_key(
+                    self.provider, self.model, self.temperature, max_tokens,
+                    "".join(cached_system) + system_prompt, user_prompt,
+                    variant="json:" + json.dumps(tool, sort_keys=True)
+                )
+                text = self.cache.get_or_compute(
+                    key, lambda: self._chat_json_uncached(system_prompt, user_prompt, max_tokens, cached_system, tool)
+                )
+            try:
+                result = json.loads(text) if text else None
+            except ValueError:
+                print(f"❌ Structured reply from {self.model} is not valid JSON")
+                result = None
+            call.success = isinstance(result, dict)
+            return result if call.success else None
+
+    def _chat_json_uncached(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                            cached_system: Sequence[str], tool: dict) -> str:
+        if self.provider == "anthropic":
+            send = lambda: self._chat_json_anthropic(system_prompt, user_prompt, max_tokens, cached_system, tool)
+        else:
+            send = lambda: self._chat_json_openai(system_prompt, user_prompt, max_tokens, cached_system, tool)
+        request = self._cassette_request("json", system_prompt, user_prompt, max_tokens, cached_system)
+        request["tool"] = tool
+        return self._through_cassette(
+            request, lambda: self._governed_call(send, estimate_tokens(system_prompt, user_prompt), "Structured LLM call")
+        )
+
+    def _chat_json_anthropic(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                             cached_system: Sequence[str], tool: dict) -> str:
+        """Force a single tool call and return its input as JSON text"""
         response = self.client.messages.create(
-            model=self.model,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            system=system_prompt,
-            messages=[
+            **self._anthropic_request(system_prompt, user_prompt, max_tokens, cached_system),
+            tools=[{"name": tool["name"], "description": tool["description"], "input_schema": tool["schema"]}],
+            tool_choice={"type": "tool", "name": tool["name"]},
+        )
+        self._record_usage(response.usage)
+        for block in response.content:
+            if block.type == "tool_use":
+                return json.dumps(block.input)
+        return ""
+
+    def _chat_json_openai(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                          cached_system: Sequence[str], tool: dict) -> str:
+        response = self.client.chat.completions.create(
+            **self._openai_request(system_prompt, user_prompt, max_tokens, cached_system),
+            response_format={"type": "json_schema", "json_schema": {
+                "name": tool["name"], "description": tool["description"], "schema": tool["schema"], "strict": True,
+            }},
+        )
+        self._record_usage(response.usage)
+        return (response.choices[0].message.content or "").strip()
+
+    # ---------------------------
+    # Record / replay
+    # ---------------------------
+    def _cassette_request(self, mode: str, system_prompt: str, user_prompt: str, max_tokens: int,
+                          cached_system: Sequence[str]) -> dict:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": max_tokens,
+            "mode": mode,
+            "cached_system": list(cached_system),
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+        }
+
+    def _through_cassette(self, request: dict, send: Callable[[], str]) -> str:
+        """Send request for real (recording it in record mode) or answer it from the cassette"""
+        cassette = get_cassette()
+        if cassette.replaying:
+            return self._replayed(cassette.replay("llm", request))
+
+        started = time.monotonic()
+        text = send()
+        if cassette.mode == "record" and text:
+            cassette.save("llm", request, text, time.monotonic() - started, self._cassette_meta())
+        return text
+
+    async def _athrough_cassette(self, request: dict, send: Callable[[], Awaitable[str]]) -> str:
+        cassette = get_cassette()
+        if cassette.replaying:
+            return self._replayed(await cassette.areplay("llm", request))
+
+        started = time.monotonic()
+        text = await send()
+        if cassette.mode == "record" and text:
+            cassette.save("llm", request, text, time.monotonic() - started, self._cassette_meta())
+        return text
+
+    @staticmethod
+    def _cassette_meta(call: Optional[CallRecord] = None) -> dict:
+        """Token counts of the call just made, so replays report the same usage"""
+        call = call or current_call()
+        if call is None:
+            return {}
+        return {"usage": {
+            "input_tokens": call.input_tokens,
+            "output_tokens": call.output_tokens,
+            "cache_read": call.cache_read_input_tokens,
+            "cache_write": call.cache_creation_input_tokens,
+        }}
+
+    def _replayed(self, entry: dict, call: Optional[CallRecord] = None) -> str:
+        mark_attempt(0)
+        usage = entry["meta"].get("usage")
+        if usage:
+            self._add_usage(**usage, call=call)
+        return entry["response"]
+
+    def _stream_anthropic(self, system_prompt: str, user_prompt: str, stop: Optional[Callable[[str], bool]],
+                          max_tokens: int, cached_system: Sequence[str]) -> str:
+        """Stream an Anthropic reply event by event so it can be cut off early"""
+        received = ""
+        stopped = False
+        usage = SimpleNamespace()
+        with self.client.messages.stream(
+            **self._anthropic_request(system_prompt, user_prompt, max_tokens, cached_system)
+        ) as stream:
+            for event in stream:
+                if event.type == "message_start":
+                    usage = event.message.usage
+                elif event.type == "message_delta" and event.usage is not None:
+                    usage.output_tokens = event.usage.output_tokens
+                elif event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    mark_first_token()
+                    received += event.delta.text
+                    if stop is not None and stop(received):
+                        print(f"✂️ Stopping stream early after {len(received):,} chars")
+                        stopped = True
+                        break
+        if stopped:
+            # The closing message_delta with the real output count never arrives
+            usage.output_tokens = max(getattr(usage, "output_tokens", 0) or 0, estimate_tokens(received))
+            mark_usage_estimated()
+        self._record_usage(usage)
+        return received.strip()
+
+    def _stream_openai(self, system_prompt: str, user_prompt: str, stop: Optional[Callable[[str], bool]],
+                       max_tokens: int, cached_system: Sequence[str]) -> str:
+        """Stream an OpenAI reply chunk by chunk so it can be cut off early"""
+        received = ""
+        reported = False
+        stopped = False
+        stream = self.client.chat.completions.create(
+            **self._openai_request(system_prompt, user_prompt, max_tokens, cached_system),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    self._record_usage(chunk.usage)
+                    reported = True
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    mark_first_token()
+                    received += text
+                    if stop is not None and stop(received):
+                        print(f"✂️ Stopping stream early after {len(received):,} chars")
+                        stopped = True
+                        break
+        finally:
+            stream.close()
+        if stopped and not reported:
+            # Usage only comes in the final chunk, which an early stop never reads
+            prompt_tokens = estimate_tokens("".join(cached_system), system_prompt, user_prompt)
+            self._add_usage(prompt_tokens, estimate_tokens(received), 0, 0)
+            mark_usage_estimated()
+        return received.strip()
+
+    def _anthropic_request(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                           cached_system: Sequence[str] = ()) -> dict:
+        """Build the messages.create kwargs shared by the sync and async paths"""
+        if cached_system:
+            # Anthropic allows at most four breakpoints, so only the last four blocks get one
+            system = [{"type": "text", "text": text} for text in cached_system if text]
+            for block in system[-4:]:
+                block["cache_control"] = {"type": "ephemeral"}
+            if system_prompt:
+                system.append({"type": "text", "text": system_prompt})
+        else:
+            system = system_prompt
+
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": self.temperature,
+            "system": system,
+            "messages": [
                 {"role": "user", "content": user_prompt}
-            ]
+            ],
+        }
+
+    def _openai_request(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                        cached_system: Sequence[str] = ()) -> dict:
+        """Build the chat.completions.create kwargs shared by the sync and async paths"""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "".join(cached_system) + system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": max_tokens,
+        }
+
+    def _chat_anthropic(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                        cached_system: Sequence[str] = ()) -> str:
+        """Handle Anthropic/Claude API calls"""
+        response = self.client.messages.create(
+            **self._anthropic_request(system_prompt, user_prompt, max_tokens, cached_system)
         )
+        self._record_usage(response.usage)
         return response.content[0].text.strip()
 
-    def _chat_openai(self, system_prompt: str, user_prompt: str) -> str:
+    def _chat_openai(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                     cached_system: Sequence[str] = ()) -> str:
         """Handle OpenAI API calls"""
         response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=self.temperature,
-            max_tokens=self.max_tokens
+            **self._openai_request(system_prompt, user_prompt, max_tokens, cached_system)
         )
+        self._record_usage(response.usage)
         return response.choices[0].message.content.strip()
 
+    # ---------------------------
+    # Batch submission
+    # ---------------------------
+    def batch(self, backend=None) -> LLMBatch:
+        """
+        Start a message batch for this client's model. Queue requests with
+        batch.add(...), then batch.run() submits them together and resolves
+        each returned Future. Pass a LocalBatchServer as backend for tests.
+        """
+        return LLMBatch(self, backend)
+
+    # ---------------------------
+    # Token usage
+    # ---------------------------
+    def _record_usage(self, usage, call: Optional[CallRecord] = None):
+        """
+        Accumulate input/output and prompt-cache token counts from a provider
+        usage object, on this client and on call (default: the current call)
+        """
+        if usage is None:
+            return
+
+        if self.provider == "anthropic":
+            input_tokens = getattr(usage, "input_tokens", 0) or 0
+            output_tokens = getattr(usage, "output_tokens", 0) or 0
+            cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+            cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        else:
+            input_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            output_tokens = getattr(usage, "completion_tokens", 0) or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            cache_read = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+            cache_write = 0
+
+        self._add_usage(input_tokens, output_tokens, cache_read, cache_write, call)
+
+    def _add_usage(self, input_tokens: int, output_tokens: int, cache_read: int, cache_write: int,
+                   call: Optional[CallRecord] = None):
+        with self._usage_lock:
+            self._usage["calls"] += 1
+            self._usage["input_tokens"] += input_tokens
+            self._usage["output_tokens"] += output_tokens
+            self._usage["cache_read_input_tokens"] += cache_read
+            self._usage["cache_creation_input_tokens"] += cache_write
+        add_usage(input_tokens, output_tokens, cache_read, cache_write, call)
+
+        if cache_read or cache_write:
+            print(f"💾 Prompt cache ({self.model}): read {cache_read:,} / wrote {cache_write:,} tokens")
+
+    def usage_stats(self) -> dict:
+        """Cumulative token counts for this client, including prompt-cache reads/writes"""
+        with self._usage_lock:
+            return dict(self._usage)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the response cache (empty when caching is off)"""
+        return self.cache.stats() if self.cache else {}
+
     @staticmethod
     def get_available_models():
         """Return a dictionary of available models by provider"""
@@ -0,0 +1,255 @@
+import io
+import json
+import time
+import itertools
+import threading
+from types import SimpleNamespace
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence
+
+from config.llm_cache import ResponseCache
+from config.llm_telemetry import start_call, get_telemetry
+from config.cassette import get_cassette
+from config.settings import LLM_BATCH_POLL_SECONDS
+
+
+# ---------------------------
+# Batch backends
+# ---------------------------
+# A backend takes provider-native requests ({"custom_id", "params"}) and
+# exposes submit() -> batch id, poll(batch id) -> finished?, and
+# results(batch id) -> {custom_id: (text, usage or None)}. Failed entries
+# map to ("", None).
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[dict]) -> str:
+        batch = self.client.messages.batches.create(requests=requests)
+        return batch.id
+
+    def poll(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> Dict[str, tuple]:
+        results = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                results[entry.custom_id] = (message.content[0].text.strip(), message.usage)
+            else:
+                print(f"❌ Batch entry {entry.custom_id} {entry.result.type}")
+                results[entry.custom_id] = ("", None)
+        return results
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API (JSONL file upload against /v1/chat/completions)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[dict]) -> str:
+        lines = [
+            json.dumps({
+                "custom_id": r["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": r["params"],
+            })
+            for r in requests
+        ]
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def poll(self, batch_id: str) -> bool:
+        status = self.client.batches.retrieve(batch_id).status
+        return status in ("completed", "failed", "expired", "cancelled")
+
+    def results(self, batch_id: str) -> Dict[str, tuple]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        if not batch.output_file_id:
+            print(f"❌ Batch {batch_id} finished as {batch.status} without output")
+            return results
+
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            if response.get("status_code") == 200:
+                body = response["body"]
+                usage = body.get("usage") or {}
+                usage = SimpleNamespace(
+                    prompt_tokens=usage.get("prompt_tokens", 0),
+                    completion_tokens=usage.get("completion_tokens", 0),
+                    prompt_tokens_details=SimpleNamespace(
+                        cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+                    ),
+                )
+                results[entry["custom_id"]] = (body["choices"][0]["message"]["content"].strip(), usage)
+            else:
+                print(f"❌ Batch entry {entry['custom_id']} failed: {entry.get('error')}")
+                results[entry["custom_id"]] = ("", None)
+        return results
+
+
+class LocalBatchServer:
+    """
+    In-process stand-in for a provider batch API, for tests and offline runs.
+
+    responder receives each request's provider-native params and returns the
+    reply text; by default it echoes the last user message. A responder that
+    raises fails only that entry, as a provider would. Batches report
+    finished once processing_seconds have passed since submission.
+    """
+
+    def __init__(self, responder: Optional[Callable[[dict], str]] = None, processing_seconds: float = 0.0):
+        self.responder = responder or (lambda params: params["messages"][-1]["content"])
+        self.processing_seconds = processing_seconds
+        self.batches: Dict[str, dict] = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, requests: List[dict]) -> str:
+        batch_id = f"local-batch-{next(self._ids)}"
+        self.batches[batch_id] = {"requests": requests, "submitted_at": time.monotonic()}
+        return batch_id
+
+    def poll(self, batch_id: str) -> bool:
+        return time.monotonic() - self.batches[batch_id]["submitted_at"] >= self.processing_seconds
+
+    def results(self, batch_id: str) -> Dict[str, tuple]:
+        results = {}
+        for r in self.batches[batch_id]["requests"]:
+            try:
+                results[r["custom_id"]] = (self.responder(r["params"]), None)
+            except Exception as e:
+                print(f"❌ Batch entry {r['custom_id']} failed: {e}")
+                results[r["custom_id"]] = ("", None)
+        return results
+
+
+# ---------------------------
+# Batch collector
+# ---------------------------
+class LLMBatch:
+    """
+    Collect many chat requests, submit them as one provider batch and hand
+    each caller its reply through a Future.
+
+    Requests already in the client's response cache are answered without
+    being submitted, and batch results are written back to the cache.
+    """
+
+    def __init__(self, client, backend=None):
+        self.client = client
+        if backend is None:
+            backend = AnthropicBatchBackend(client.client) if client.provider == "anthropic" else OpenAIBatchBackend(client.client)
+        self.backend = backend
+
+        self._requests: List[dict] = []
+        self._pending: Dict[str, tuple] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None,
+            cached_system: Sequence[str] = ()) -> Future:
+        """Queue one request; the returned Future resolves to the reply text after run()"""
+        max_tokens = max_tokens or self.client.max_tokens
+        future = Future()
+        # Attribute the call to the job/stage that queued it, not the one that runs the batch
+        call = start_call(self.client.provider, self.client.model, "batch")
+
+        cache_key = None
+        if self.client.cache is not None:
+            cache_key = ResponseCache.make_key(
+                self.client.provider, self.client.model, self.client.temperature, max_tokens,
+                "".join(cached_system) + system_prompt, user_prompt
+            )
+            cached = self.client.cache.get(cache_key)
+            if cached is not None:
+                call.success = True
+                get_telemetry().record(call)
+                future.set_result(cached)
+                return future
+
+        # Batched requests share recordings with the equivalent chat() call
+        request = self.client._cassette_request("chat", system_prompt, user_prompt, max_tokens, cached_system)
+        if get_cassette().replaying:
+            call.response_cached = False
+            text = self.client._replayed(get_cassette().replay("llm", request), call)
+            call.success = bool(text)
+            get_telemetry().record(call)
+            future.set_result(text)
+            return future
+
+        if self.client.provider == "anthropic":
+            params = self.client._anthropic_request(system_prompt, user_prompt, max_tokens, cached_system)
+        else:
+            params = self.client._openai_request(system_prompt, user_prompt, max_tokens, cached_system)
+
+        with self._lock:
+            custom_id = f"req-{next(self._ids)}"
+            self._requests.append({"custom_id": custom_id, "params": params})
+            self._pending[custom_id] = (future, cache_key, call, request)
+        return future
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def run(self, poll_interval: float = LLM_BATCH_POLL_SECONDS, timeout: Optional[float] = None):
+        """Submit everything queued so far, wait for the batch to end and resolve the Futures"""
+        with self._lock:
+            requests, self._requests = self._requests, []
+            pending, self._pending = self._pending, {}
+
+        if not requests:
+            return
+
+        started = time.monotonic()
+        batch_id = self.backend.submit(requests)
+        print(f"📦 Submitted batch {batch_id} with {len(requests)} requests")
+
+        try:
+            while not self.backend.poll(batch_id):
+                if timeout is not None and time.monotonic() - started > timeout:
+                    raise TimeoutError(f"Batch {batch_id} did not finish within {timeout:.0f}s")
+                time.sleep(poll_interval)
+
+            results = self.backend.results(batch_id)
+        except Exception as e:
+            for future, *_ in pending.values():
+                future.set_exception(e)
+            raise
+
+        elapsed = time.monotonic() - started
+        cassette = get_cassette()
+        for custom_id, (future, cache_key, call, request) in pending.items():
+            text, usage = results.get(custom_id, ("", None))
+            call.response_cached = False
+            call.latency_seconds = elapsed
+            call.success = bool(text)
+            if usage is not None:
+                self.client._record_usage(usage, call)
+            get_telemetry().record(call)
+            if text and cassette.mode == "record":
+                cassette.save("llm", request, text, elapsed, self.client._cassette_meta(call))
+            if text and cache_key is not None:
+                self.client.cache.put(cache_key, text)
+            future.set_result(text)
+
+        failed = sum(1 for custom_id in pending if not results.get(custom_id, ("",))[0])
+        print(f"📦 Batch {batch_id} finished in {elapsed:.0f}s "
+              f"({len(pending) - failed} succeeded, {failed} failed)")
@@ -0,0 +1,249 @@
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config.paths import LLM_CACHE_DIR
+from config.settings import LLM_CACHE_MAX_BYTES
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for LLM responses.
+
+    Each entry is a small JSON file named after the sha256 of the request.
+    The cache is bounded by total size on disk and evicts the least recently
+    used entries first. Concurrent identical requests are coalesced so only
+    one of them actually reaches the provider (single-flight).
+    """
+
+    def __init__(self, cache_dir: Path = LLM_CACHE_DIR, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[Tuple[int, str], "asyncio.Task"] = {}
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+
+    # ---------------------------
+    # Keys
+    # ---------------------------
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: float, max_tokens: int,
+                 system_prompt: str, user_prompt: str, variant: str = "") -> str:
+        """Hash every field that can change the completion into a stable key"""
+        payload = json.dumps(
+            [provider, model, temperature, max_tokens, system_prompt, user_prompt, variant],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    # ---------------------------
+    # LRU index
+    # ---------------------------
+    def _load_index(self):
+        """Build the in-memory LRU index from the files on disk (oldest first)"""
+        if self._index is not None:
+            return
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    # ---------------------------
+    # Get / Put
+    # ---------------------------
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss"""
+        with self._lock:
+            self._load_index()
+            path = self._entry_path(key)
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, ValueError):
+                if key in self._index:
+                    self._total_bytes -= self._index.pop(key)
+                return None
+
+            # Refresh recency both in memory and on disk so other processes see it
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                self._index[key] = path.stat().st_size
+                self._total_bytes += self._index[key]
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return data.get("response")
+
+    def put(self, key: str, response: str):
+        """Store a response atomically and evict old entries if over budget"""
+        with self._lock:
+            self._load_index()
+            path = self._entry_path(key)
+            body = json.dumps({"response": response}, ensure_ascii=False)
+
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(body)
+                os.replace(tmp_name, path)
+            except Exception:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+                raise
+
+            size = path.stat().st_size
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            self._index[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """
+        Return the cached response for key, computing it at most once.
+
+        If another thread is already computing the same key, wait for its
+        result instead of firing a duplicate request. Empty responses are
+        handed to waiters but never persisted.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            # Another leader may have finished between our miss and taking the slot
+            response = self.get(key)
+            if response is not None:
+                future.set_result(response)
+                return response
+
+            response = compute()
+            if response:
+                self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Async counterpart of get_or_compute for callers on an event loop.
+
+        Coroutines on the same loop asking for the same key await one shared
+        task. Disk reads and writes are small enough to run inline.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._ainflight.get((id(loop), key))
+            if task is None:
+                task = loop.create_task(compute())
+                self._ainflight[(id(loop), key)] = task
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            return await asyncio.shield(task)
+
+        try:
+            response = await asyncio.shield(task)
+            if response:
+                self.put(key, response)
+            return response
+        finally:
+            with self._lock:
+                self._ainflight.pop((id(loop), key), None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current disk usage"""
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# ---------------------------
+# Shared default cache
+# ---------------------------
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """Process-wide cache shared by every LLMClient that opts in"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
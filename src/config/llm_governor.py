@@ -0,0 +1,261 @@
+import time
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional, Tuple
+
+from config.settings import LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_IN_FLIGHT
+
+# Adaptive backoff after a provider rate-limit response
+MIN_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+MIN_RATE_SCALE = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+# How often async waiters re-check when they can't be woken by a Condition
+ASYNC_POLL_SECONDS = 0.1
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate_per_minute"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float, scale: float = 1.0):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_minute * scale / 60.0)
+
+    def wait_time(self, amount: float, scale: float = 1.0) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        # Requests larger than the whole bucket are admitted once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / (self.rate_per_minute * scale)
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateGovernor:
+    """
+    Process-wide admission control for one provider/model.
+
+    Callers are admitted strictly in arrival order once the requests-per-minute
+    and tokens-per-minute buckets allow it and fewer than max_in_flight calls
+    are running. A rate-limit response pauses admissions with exponential
+    backoff and halves the effective rate, which then recovers gradually on
+    successful calls (AIMD).
+    """
+
+    def __init__(self, name: str, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, max_in_flight: int = LLM_MAX_IN_FLIGHT):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+
+        self.in_flight = 0
+        self.rate_scale = 1.0
+        self.paused_until = 0.0
+        self.consecutive_limits = 0
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.total_wait_seconds = 0.0
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._tickets = itertools.count()
+
+    # ---------------------------
+    # Admission
+    # ---------------------------
+    def _poll(self, ticket: int, tokens: int) -> Optional[float]:
+        """
+        Try to admit ticket (lock held). Returns 0 when admitted, otherwise
+        the seconds to wait, or None to wait until another call finishes.
+        """
+        if self._queue[0] != ticket or self.in_flight >= self.max_in_flight:
+            return None
+
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        self.request_bucket.refill(now, self.rate_scale)
+        self.token_bucket.refill(now, self.rate_scale)
+        wait = max(
+            self.request_bucket.wait_time(1, self.rate_scale),
+            self.token_bucket.wait_time(tokens, self.rate_scale),
+        )
+        if wait > 0:
+            return wait
+
+        self.request_bucket.take(1)
+        self.token_bucket.take(tokens)
+        self._queue.popleft()
+        self.in_flight += 1
+        self.admitted += 1
+        # The next caller in line may be admissible right away
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self) -> int:
+        with self._cond:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            return ticket
+
+    def _abandon(self, ticket: int):
+        with self._cond:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def acquire(self, tokens: int):
+        """Block until this call may be sent"""
+        started = time.monotonic()
+        ticket = self._enqueue()
+        try:
+            with self._cond:
+                while True:
+                    wait = self._poll(ticket, tokens)
+                    if wait == 0:
+                        self.total_wait_seconds += time.monotonic() - started
+                        break
+                    self._cond.wait(timeout=wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    async def aacquire(self, tokens: int):
+        """Await until this call may be sent without blocking the event loop"""
+        started = time.monotonic()
+        ticket = self._enqueue()
+        try:
+            while True:
+                with self._cond:
+                    wait = self._poll(ticket, tokens)
+                    if wait == 0:
+                        self.total_wait_seconds += time.monotonic() - started
+                        break
+                await asyncio.sleep(min(wait or ASYNC_POLL_SECONDS, ASYNC_POLL_SECONDS))
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int):
+        self.acquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int):
+        await self.aacquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # ---------------------------
+    # Adaptive backoff
+    # ---------------------------
+    def report_rate_limited(self, retry_after: Optional[float] = None):
+        """Pause admissions and cut the effective rate after a 429/overloaded response"""
+        with self._cond:
+            self.rate_limited += 1
+            self.consecutive_limits += 1
+            backoff = min(MAX_BACKOFF_SECONDS, MIN_BACKOFF_SECONDS * 2 ** (self.consecutive_limits - 1))
+            if retry_after:
+                backoff = max(backoff, retry_after)
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+            self.rate_scale = max(MIN_RATE_SCALE, self.rate_scale * 0.5)
+            self._cond.notify_all()
+        print(f"🚦 {self.name} rate limited, pausing {backoff:.1f}s (rate now {self.rate_scale:.0%})")
+
+    def report_success(self):
+        with self._cond:
+            self.consecutive_limits = 0
+            self.rate_scale = min(1.0, self.rate_scale + RATE_RECOVERY_STEP)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "name": self.name,
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "rate_scale": self.rate_scale,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+            }
+
+
+# ---------------------------
+# Process-wide registry
+# ---------------------------
+_governors: Dict[Tuple[str, str], RateGovernor] = {}
+_overrides: Dict[Tuple[str, str], dict] = {}
+_governors_lock = threading.Lock()
+
+
+def configure_governor(provider: str, model: str, **limits):
+    """
+    Override requests_per_minute / tokens_per_minute / max_in_flight for one
+    provider/model. Takes effect for governors created afterwards.
+    """
+    with _governors_lock:
+        _overrides[(provider, model)] = limits
+        _governors.pop((provider, model), None)
+
+
+def get_governor(provider: str, model: str) -> RateGovernor:
+    """Return the governor shared by every LLMClient talking to provider/model"""
+    with _governors_lock:
+        governor = _governors.get((provider, model))
+        if governor is None:
+            governor = RateGovernor(f"{provider}/{model}", **_overrides.get((provider, model), {}))
+            _governors[(provider, model)] = governor
+        return governor
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough input token count (~4 characters per token)"""
+    return max(1, sum(len(t) for t in texts) // 4)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for provider 429 / overloaded responses"""
+    status = getattr(error, "status_code", None)
+    if status in (429, 529):
+        return True
+    name = type(error).__name__
+    return name in ("RateLimitError", "OverloadedError") or "overloaded" in str(error).lower()
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header of a provider error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,129 @@
+import random
+import contextvars
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from config.settings import (
+    LLM_RETRY_BASE_SECONDS, LLM_RETRY_MAX_SECONDS, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES
+)
+
+# Status codes worth retrying: rate limits, server errors and Anthropic's "overloaded"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+# ---------------------------
+# Error classification
+# ---------------------------
+def is_retryable_error(error: Exception) -> bool:
+    """
+    True for transient failures (timeouts, dropped connections, 429, 5xx,
+    overloaded). Bad requests, auth and permission errors are fatal.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.NetworkError)):
+        return True
+
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+
+    # Both SDKs raise APITimeoutError / APIConnectionError without a status code
+    name = type(error).__name__
+    if name in ("APITimeoutError", "APIConnectionError", "OverloadedError", "InternalServerError"):
+        return True
+    return "overloaded" in str(error).lower()
+
+
+def backoff_delay(attempt: int, base: float = LLM_RETRY_BASE_SECONDS, cap: float = LLM_RETRY_MAX_SECONDS) -> float:
+    """Exponential backoff with full jitter for the given 0-based retry attempt"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# ---------------------------
+# Latency tracking for hedging
+# ---------------------------
+class LatencyTracker:
+    """Rolling window of call latencies used to pick the hedging threshold"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float = LLM_HEDGE_PERCENTILE) -> Optional[float]:
+        """Latency at the given fraction, or None until enough samples exist"""
+        with self._lock:
+            if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# ---------------------------
+# Hedged requests
+# ---------------------------
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+def run_hedged(call: Callable[[], str], delay: float) -> str:
+    """
+    Run call; if it hasn't finished after delay seconds, fire a duplicate and
+    return whichever succeeds first. The slower request is left to finish in
+    the background since blocking SDK calls can't be cancelled.
+    """
+    executor = _get_hedge_executor()
+    # Run in copies of the caller's context so telemetry still sees the call
+    primary = executor.submit(contextvars.copy_context().run, call)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    print(f"🪃 Request slower than {delay:.1f}s, sending hedged duplicate")
+    pending = {primary, executor.submit(contextvars.copy_context().run, call)}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def arun_hedged(call: Callable[[], Awaitable[str]], delay: float) -> str:
+    """Async version of run_hedged; the losing request is cancelled"""
+    primary = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    print(f"🪃 Request slower than {delay:.1f}s, sending hedged duplicate")
+    pending = {primary, asyncio.ensure_future(call())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,111 @@
+import re
+import threading
+from typing import Dict, List, Optional
+
+from config.settings import LLM_FIX_CHEAP_ATTEMPTS
+
+# Error classes recognised in Manim render output, checked in order
+ERROR_PATTERNS = [
+    ("syntax", re.compile(r"SyntaxError|IndentationError|TabError")),
+    ("import", re.compile(r"ImportError|ModuleNotFoundError")),
+    ("name", re.compile(r"NameError")),
+    ("attribute", re.compile(r"AttributeError")),
+    ("type", re.compile(r"TypeError")),
+    ("latex", re.compile(r"LaTeX|latex error|Tex compilation|\.tex", re.IGNORECASE)),
+    ("value", re.compile(r"ValueError|IndexError|KeyError")),
+    ("timeout", re.compile(r"timed out|timeout", re.IGNORECASE)),
+]
+
+# Pre-flight diagnostics (backend/preflight.py) are reported as
+# "line N: [rule] ..." instead of a traceback; each rule stands for the
+# exception the render would have raised
+PREFLIGHT_RULE_CLASSES = {
+    "syntax": "syntax",
+    "unknown-name": "name",
+    "polygon-get-corner": "attribute",
+    "no-scene": "structure",
+    "no-construct": "structure",
+}
+PREFLIGHT_RULE_PATTERN = re.compile(r"^line \d+: \[([a-z-]+)\]", re.MULTILINE)
+
+# Errors a small model fixes about as reliably as a large one (missing import,
+# typo'd name, get_corner on a Polygon, missing Scene class, ...)
+SIMPLE_ERROR_CLASSES = {"syntax", "import", "name", "attribute", "type", "structure"}
+
+
+def classify_error(error_message: str) -> str:
+    """Map a render or pre-flight error message to a coarse class ("other" if unrecognised)"""
+    for rule in PREFLIGHT_RULE_PATTERN.findall(error_message or ""):
+        if rule in PREFLIGHT_RULE_CLASSES:
+            return PREFLIGHT_RULE_CLASSES[rule]
+    for error_class, pattern in ERROR_PATTERNS:
+        if pattern.search(error_message or ""):
+            return error_class
+    return "other"
+
+
+class ModelTier:
+    """One rung of a cascade: an LLMClient plus its running success/latency stats"""
+
+    def __init__(self, name: str, client):
+        self.name = name
+        self.client = client
+        self.calls = 0
+        self.successes = 0
+        self.total_latency = 0.0
+        self.by_error_class: Dict[str, Dict[str, int]] = {}
+
+    def stats(self) -> dict:
+        return {
+            "model": self.client.model,
+            "calls": self.calls,
+            "successes": self.successes,
+            "success_rate": self.successes / self.calls if self.calls else 0.0,
+            "mean_latency_seconds": round(self.total_latency / self.calls, 3) if self.calls else None,
+            "by_error_class": {k: dict(v) for k, v in self.by_error_class.items()},
+        }
+
+
+class ModelCascade:
+    """
+    Route requests to the cheapest tier likely to handle them.
+
+    Tiers are ordered cheapest first. The first cheap_attempts attempts at a
+    task with a simple error class go to tier 0; everything else, and any
+    request the cheaper tier already failed, goes up the ladder.
+    """
+
+    def __init__(self, tiers: List[ModelTier], cheap_attempts: int = LLM_FIX_CHEAP_ATTEMPTS,
+                 simple_errors=SIMPLE_ERROR_CLASSES):
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.tiers = tiers
+        self.cheap_attempts = cheap_attempts
+        self.simple_errors = set(simple_errors)
+        self._lock = threading.Lock()
+
+    def choose(self, attempt: int, error_message: str) -> ModelTier:
+        """Tier for the given 0-based attempt at fixing error_message"""
+        if attempt < self.cheap_attempts and classify_error(error_message) in self.simple_errors:
+            return self.tiers[0]
+        return self.tiers[-1]
+
+    def escalate(self, tier: ModelTier) -> Optional[ModelTier]:
+        """Next tier up from tier, or None if it is already the largest"""
+        index = self.tiers.index(tier)
+        return self.tiers[index + 1] if index + 1 < len(self.tiers) else None
+
+    def report(self, tier: ModelTier, success: bool, latency_seconds: float, error_message: str = ""):
+        """Record whether tier's answer worked (e.g. the fixed scene rendered)"""
+        error_class = classify_error(error_message)
+        with self._lock:
+            tier.calls += 1
+            tier.successes += int(success)
+            tier.total_latency += latency_seconds
+            counts = tier.by_error_class.setdefault(error_class, {"calls": 0, "successes": 0})
+            counts["calls"] += 1
+            counts["successes"] += int(success)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {tier.name: tier.stats() for tier in self.tiers}
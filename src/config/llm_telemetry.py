@@ -0,0 +1,252 @@
+import json
+import time
+import threading
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import LLM_TELEMETRY_MAX_RECORDS
+
+# USD per million tokens: (input, output, cache read, cache write)
+MODEL_PRICES = {
+    "claude-sonnet-4-20250514": (3.00, 15.00, 0.30, 3.75),
+    "claude-3-7-sonnet-20250219": (3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-haiku-20241022": (0.80, 4.00, 0.08, 1.00),
+    "gpt-4o": (2.50, 10.00, 1.25, 0.0),
+    "gpt-4o-mini": (0.15, 0.60, 0.075, 0.0),
+}
+
+# Message batches are billed at half price
+BATCH_DISCOUNT = 0.5
+
+# Who is calling: set by the pipeline, read by LLMClient when it records a call
+_job_id = contextvars.ContextVar("llm_job_id", default=None)
+_stage = contextvars.ContextVar("llm_stage", default=None)
+_current_call = contextvars.ContextVar("llm_current_call", default=None)
+# (full corpus tokens, tokens actually sent) when reference knowledge was retrieved
+_knowledge = contextvars.ContextVar("llm_knowledge_tokens", default=None)
+
+
+@contextmanager
+def llm_context(job_id: Optional[str] = None, stage: Optional[str] = None,
+                knowledge_tokens: Optional[Tuple[int, int]] = None):
+    """
+    Attribute LLM calls made inside the block to job_id and/or stage
+    (script, codegen, fix, ...). knowledge_tokens is (full, sent) when only
+    part of the reference knowledge went into the prompt. Arguments left as
+    None keep the outer value. Worker threads only see this if started
+    through contextvars.copy_context().
+    """
+    tokens = []
+    if job_id is not None:
+        tokens.append((_job_id, _job_id.set(job_id)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    if knowledge_tokens is not None:
+        tokens.append((_knowledge, _knowledge.set(knowledge_tokens)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+@dataclass
+class CallRecord:
+    """One logical LLM call as the caller saw it (retries and hedges included)"""
+    provider: str
+    model: str
+    mode: str  # chat, stream, json or batch
+    job_id: Optional[str] = None
+    stage: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    latency_seconds: float = 0.0
+    ttft_seconds: Optional[float] = None  # streams only
+    retries: int = 0
+    response_cached: bool = True  # cleared once a provider request is made
+    success: bool = False
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    knowledge_tokens_full: int = 0  # reference knowledge available for the prompt...
+    knowledge_tokens_sent: int = 0  # ...and the part retrieval actually included
+    usage_estimated: bool = False  # stream stopped before the provider reported final usage
+    attempt_started: float = field(default=0.0, repr=False)
+
+    @property
+    def cost_usd(self) -> Optional[float]:
+        prices = MODEL_PRICES.get(self.model)
+        if prices is None:
+            return None
+        input_price, output_price, read_price, write_price = prices
+        cost = (self.input_tokens * input_price + self.output_tokens * output_price +
+                self.cache_read_input_tokens * read_price + self.cache_creation_input_tokens * write_price) / 1e6
+        return cost * BATCH_DISCOUNT if self.mode == "batch" else cost
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        record.pop("attempt_started")
+        record["cost_usd"] = self.cost_usd
+        return record
+
+
+# ---------------------------
+# Hooks used by LLMClient
+# ---------------------------
+def start_call(provider: str, model: str, mode: str) -> CallRecord:
+    knowledge_full, knowledge_sent = _knowledge.get() or (0, 0)
+    return CallRecord(provider=provider, model=model, mode=mode, job_id=_job_id.get(), stage=_stage.get(),
+                      knowledge_tokens_full=knowledge_full, knowledge_tokens_sent=knowledge_sent)
+
+
+@contextmanager
+def track_call(provider: str, model: str, mode: str):
+    """Make a CallRecord current for the block and store it when the block ends"""
+    record = start_call(provider, model, mode)
+    token = _current_call.set(record)
+    started = time.monotonic()
+    try:
+        yield record
+    finally:
+        record.latency_seconds = time.monotonic() - started
+        _current_call.reset(token)
+        get_telemetry().record(record)
+
+
+def current_call() -> Optional[CallRecord]:
+    return _current_call.get()
+
+
+def mark_attempt(retry: int):
+    """A provider request is about to be sent (retry is 0 for the first one)"""
+    record = _current_call.get()
+    if record is not None:
+        record.response_cached = False
+        record.retries = max(record.retries, retry)
+        record.attempt_started = time.monotonic()
+        record.ttft_seconds = None
+
+
+def mark_first_token():
+    record = _current_call.get()
+    if record is not None and record.ttft_seconds is None:
+        record.ttft_seconds = time.monotonic() - record.attempt_started
+
+
+def mark_usage_estimated():
+    record = _current_call.get()
+    if record is not None:
+        record.usage_estimated = True
+
+
+def add_usage(input_tokens: int, output_tokens: int, cache_read: int, cache_write: int,
+              record: Optional[CallRecord] = None):
+    """Add token counts to record (default: the current call)"""
+    record = record or _current_call.get()
+    if record is not None:
+        record.input_tokens += input_tokens
+        record.output_tokens += output_tokens
+        record.cache_read_input_tokens += cache_read
+        record.cache_creation_input_tokens += cache_write
+
+
+# ---------------------------
+# Aggregation
+# ---------------------------
+class Telemetry:
+    """
+    In-memory store of the most recent call records with per-job rollups,
+    plus named per-job counters for the non-LLM stages (render cache hits, ...)
+    """
+
+    def __init__(self, max_records: int = LLM_TELEMETRY_MAX_RECORDS):
+        self._records = deque(maxlen=max_records)
+        self._counters: Dict[Optional[str], Counter] = {}
+        self._lock = threading.Lock()
+
+    def record(self, record: CallRecord):
+        with self._lock:
+            self._records.append(record)
+
+    def count(self, name: str, n: int = 1):
+        """Add n to a counter of the current job (see llm_context)"""
+        with self._lock:
+            self._counters.setdefault(_job_id.get(), Counter())[name] += n
+
+    def counters(self, job_id: Optional[str] = None) -> Dict[str, int]:
+        """Counters of one job, or summed over every job when job_id is None"""
+        with self._lock:
+            if job_id is not None:
+                return dict(self._counters.get(job_id, {}))
+            total = Counter()
+            for counts in self._counters.values():
+                total.update(counts)
+            return dict(total)
+
+    def records(self, job_id: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            selected = [r for r in self._records if job_id is None or r.job_id == job_id]
+        return [r.to_dict() for r in selected]
+
+    def summary(self, job_id: Optional[str] = None) -> dict:
+        """Totals overall and per stage for one job (or everything when job_id is None)"""
+        with self._lock:
+            selected = [r for r in self._records if job_id is None or r.job_id == job_id]
+
+        def rollup(records: List[CallRecord]) -> dict:
+            ttfts = [r.ttft_seconds for r in records if r.ttft_seconds is not None]
+            costs = [r.cost_usd for r in records if r.cost_usd is not None]
+            return {
+                "calls": len(records),
+                "failed_calls": sum(1 for r in records if not r.success),
+                "response_cache_hits": sum(1 for r in records if r.response_cached),
+                "retries": sum(r.retries for r in records),
+                "usage_estimated_calls": sum(1 for r in records if r.usage_estimated),
+                "input_tokens": sum(r.input_tokens for r in records),
+                "output_tokens": sum(r.output_tokens for r in records),
+                "cache_read_input_tokens": sum(r.cache_read_input_tokens for r in records),
+                "cache_creation_input_tokens": sum(r.cache_creation_input_tokens for r in records),
+                "knowledge_tokens_saved": sum(r.knowledge_tokens_full - r.knowledge_tokens_sent for r in records),
+                "latency_seconds": round(sum(r.latency_seconds for r in records), 3),
+                "mean_ttft_seconds": round(sum(ttfts) / len(ttfts), 3) if ttfts else None,
+                "cost_usd": round(sum(costs), 4),
+            }
+
+        stages: Dict[str, List[CallRecord]] = {}
+        for r in selected:
+            stages.setdefault(r.stage or "other", []).append(r)
+
+        summary = rollup(selected)
+        summary["stages"] = {stage: rollup(records) for stage, records in stages.items()}
+        summary["counters"] = self.counters(job_id)
+        return summary
+
+    def export_jsonl(self, path: Path, job_id: Optional[str] = None):
+        """Write records as JSON lines for offline benchmarking"""
+        with open(path, "w") as f:
+            for record in self.records(job_id):
+                f.write(json.dumps(record) + "\n")
+
+    def clear(self, job_id: Optional[str] = None):
+        with self._lock:
+            if job_id is None:
+                self._records.clear()
+                self._counters.clear()
+            else:
+                self._counters.pop(job_id, None)
+                kept = [r for r in self._records if r.job_id != job_id]
+                self._records.clear()
+                self._records.extend(kept)
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """Process-wide telemetry store shared by every LLMClient"""
+    return _telemetry
@@ -1,15 +1,13 @@
+import os
+from functools import lru_cache
 from pathlib import Path
 
-# Fix: Since paths.py is in src/config/, we need to go up 3 levels to reach project root
+# Since paths.py is in src/config/, we need to go up 3 levels to reach project root
 # src/config/paths.py -> src/config/ -> src/ -> project_root/
+# Importing this module only computes paths: nothing is printed, validated or
+# created until validate_data_files() / ensure_output_dirs() are called.
 BASE_DIR = Path(__file__).parent.parent.parent
 
-# Debug output to verify the path
-print(f"🔍 BASE_DIR set to: {BASE_DIR}")
-print(f"🔍 BASE_DIR absolute path: {BASE_DIR.absolute()}")
-print(f"🔍 Data directory path: {BASE_DIR / 'data'}")
-print(f"✅ Data directory exists: {(BASE_DIR / 'data').exists()}")
-
 DATA_DIR = BASE_DIR / "data"
 CONFIG_DIR = BASE_DIR / "src" / "config"  # Updated to reflect actual structure
 OUTPUT_DIR = BASE_DIR / "output"
@@ -19,48 +17,57 @@ VIDEO_OUTPUT_DIR = OUTPUT_DIR / "videos"
 CODE_OUTPUT_DIR = OUTPUT_DIR / "code"
 AUDIO_OUTPUT_DIR = OUTPUT_DIR / "audio"
 
-# Create output directories if they don't exist
-VIDEO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-CODE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-AUDIO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+# Persistent caches (created on first use by the cache that owns them)
+CACHE_DIR = OUTPUT_DIR / "cache"
+LLM_CACHE_DIR = CACHE_DIR / "llm"
+SCRIPT_CACHE_DIR = CACHE_DIR / "scripts"
+SPEECH_RATE_PATH = CACHE_DIR / "speech_rate.jsonl"
+ASSET_CACHE_DIR = CACHE_DIR / "assets"  # compiled Tex/Text SVGs shared by all renders
+TEX_FORMAT_DIR = CACHE_DIR / "tex_formats"  # precompiled LaTeX preambles, one per template
+SCENE_CODE_CACHE_DIR = CACHE_DIR / "scene_code"  # code known to render, per scene description
+RENDER_CACHE_DIR = CACHE_DIR / "renders"  # final scene videos keyed by code/quality/manim version
+
+# Recorded LLM/TTS exchanges for offline replay
+CASSETTE_DIR = Path(os.getenv("CASSETTE_DIR", OUTPUT_DIR / "cassettes"))
 
 # Data files - these should now point to the correct data directory
+PROMPTS_DIR = DATA_DIR / "prompts"
 MANIM_KNOWLEDGE_PATH = DATA_DIR / "manim_knowledge.txt"
-MANIM_PROMPT_PATH = DATA_DIR / "prompts" / "manim_code_prompt.txt"  # Updated path
+MATH_TEX_KNOWLEDGE_PATH = DATA_DIR / "math_tex_knowledge.txt"
+MANIM_PROMPT_PATH = PROMPTS_DIR / "manim_code_prompt.txt"
 SCENE_EXAMPLES_PATH = DATA_DIR / "scene_examples.yaml"
-SCRIPT_GEN_PROMPT_PATH = DATA_DIR / "prompts" / "script_gen_prompt.txt"  # Updated path
-
-# Validate that the data directory exists (READ-ONLY - should already exist)
-if not DATA_DIR.exists():
-    raise FileNotFoundError(f"❌ Data directory not found at: {DATA_DIR}. Please ensure the data directory exists with required files.")
+SCRIPT_GEN_PROMPT_PATH = PROMPTS_DIR / "script_gen_prompt.txt"
 
-print(f"✅ Data directory found at: {DATA_DIR}")
-
-# Validate that all required data files exist (READ-ONLY)
-required_files = {
+REQUIRED_DATA_FILES = {
     "Manim Knowledge": MANIM_KNOWLEDGE_PATH,
+    "MathTex Knowledge": MATH_TEX_KNOWLEDGE_PATH,
     "Manim Prompt": MANIM_PROMPT_PATH,
     "Scene Examples": SCENE_EXAMPLES_PATH,
     "Script Generation Prompt": SCRIPT_GEN_PROMPT_PATH
 }
 
-missing_files = []
-for name, path in required_files.items():
-    if not path.exists():
-        missing_files.append(f"  ❌ {name}: {path}")
-        print(f"❌ Missing required file: {path}")
-    else:
-        print(f"✅ Found {name}: {path}")
 
-if missing_files:
-    error_msg = f"❌ Missing required data files:\n" + "\n".join(missing_files)
-    error_msg += f"\n\nPlease ensure all required files exist in the data directory: {DATA_DIR}"
-    raise FileNotFoundError(error_msg)
+@lru_cache(maxsize=None)
+def validate_data_files():
+    """
+    Check once per process that the read-only data directory and every
+    required data file exist, raising FileNotFoundError otherwise.
+    """
+    if not DATA_DIR.exists():
+        raise FileNotFoundError(f"❌ Data directory not found at: {DATA_DIR}. Please ensure the data directory exists with required files.")
+
+    missing_files = [
+        f"  ❌ {name}: {path}" for name, path in REQUIRED_DATA_FILES.items() if not path.exists()
+    ]
+    if missing_files:
+        error_msg = f"❌ Missing required data files:\n" + "\n".join(missing_files)
+        error_msg += f"\n\nPlease ensure all required files exist in the data directory: {DATA_DIR}"
+        raise FileNotFoundError(error_msg)
+
 
-# Final validation summary
-print(f"\n📋 Path Configuration Summary:")
-print(f"   BASE_DIR: {BASE_DIR}")
-print(f"   DATA_DIR: {DATA_DIR} (READ-ONLY)")
-print(f"   OUTPUT_DIR: {OUTPUT_DIR} (WRITE)")
-print(f"✅ All required data files found and validated!")
-print(f"📁 Output directories created successfully!")
\ No newline at end of file
+@lru_cache(maxsize=None)
+def ensure_output_dirs():
+    """Create the output directories (once per process)"""
+    VIDEO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    CODE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    AUDIO_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
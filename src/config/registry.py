@@ -0,0 +1,70 @@
+import shutil
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from config.paths import validate_data_files
+
+if TYPE_CHECKING:
+    from config.llm import LLMClient
+
+# ---------------------------
+# Lazy, process-wide shared resources
+# ---------------------------
+# Modules ask for what they need when they first need it instead of building
+# it at import time, so importing the API server or spawning a worker does no
+# client setup, file reads or PATH lookups. Everything is memoized per process.
+
+_clients: Dict[Tuple[str, float, int], "LLMClient"] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm(model: str = "claude-sonnet-4-20250514", temperature: float = 0.3,
+            max_tokens: int = 8000) -> "LLMClient":
+    """Shared LLMClient for these settings, created (and the SDKs imported) on first use"""
+    key = (model, temperature, max_tokens)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            from config.llm import LLMClient
+            client = LLMClient(model=model, temperature=temperature, max_tokens=max_tokens)
+            _clients[key] = client
+        return client
+
+
+@lru_cache(maxsize=None)
+def read_text(path: Path) -> str:
+    """Contents of a data file (knowledge base, prompt template), read once"""
+    validate_data_files()
+    return Path(path).read_text(encoding="utf-8")
+
+
+@lru_cache(maxsize=None)
+def load_yaml(path: Path):
+    """Parsed YAML data file, loaded once. Treat the result as read-only."""
+    import yaml
+    return yaml.safe_load(read_text(path))
+
+
+@lru_cache(maxsize=None)
+def find_tool(name: str) -> Optional[str]:
+    """Path of an executable on PATH (None if missing), looked up once"""
+    return shutil.which(name)
+
+
+def require_tool(name: str) -> str:
+    """Like find_tool, but raises if the executable is missing"""
+    path = find_tool(name)
+    if path is None:
+        raise FileNotFoundError(f"{name} not found in PATH. Please install it or add it to your PATH.")
+    return path
+
+
+def reset():
+    """Forget every memoized resource (after changing env vars or data files)"""
+    with _clients_lock:
+        _clients.clear()
+    read_text.cache_clear()
+    load_yaml.cache_clear()
+    find_tool.cache_clear()
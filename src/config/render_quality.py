@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+from config.settings import RENDER_PREVIEW_QUALITY, RENDER_FINAL_QUALITY
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    """One Manim output quality: resolution, frame rate and how to request it"""
+    name: str
+    cli_flag: str  # manim CLI quality flag
+    pixel_width: int
+    pixel_height: int
+    frame_rate: int
+
+    @property
+    def folder(self) -> str:
+        """Manim's per-quality output folder name, e.g. 1080p60"""
+        return f"{self.pixel_height}p{self.frame_rate}"
+
+    @property
+    def manim_config(self) -> Dict[str, int]:
+        """Config overrides that select this quality for an in-process render"""
+        return {"pixel_width": self.pixel_width, "pixel_height": self.pixel_height, "frame_rate": self.frame_rate}
+
+
+QUALITY_TIERS = {
+    "preview": QualityTier("preview", "-ql", 854, 480, 15),
+    "draft": QualityTier("draft", "-qm", 1280, 720, 30),
+    "final": QualityTier("final", "-qh", 1920, 1080, 60),
+    "production": QualityTier("production", "-qp", 2560, 1440, 60),
+}
+
+
+def get_tier(name: str) -> QualityTier:
+    try:
+        return QUALITY_TIERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown render quality {name!r}, expected one of {sorted(QUALITY_TIERS)}")
+
+
+PREVIEW_TIER = get_tier(RENDER_PREVIEW_QUALITY)
+FINAL_TIER = get_tier(RENDER_FINAL_QUALITY)
+
+
+def scene_video_path(video_dir: Path, scene_file_stem: str, tier: QualityTier = FINAL_TIER) -> Path:
+    """Where Manim writes the video for scene_file_stem.py rendered from video_dir at tier"""
+    return video_dir / "media" / "videos" / scene_file_stem / tier.folder / f"{scene_file_stem}.mp4"
@@ -1,10 +1,136 @@
 # src/config/settings.py
+import os
 
 WORDS_PER_MINUTE = 100
 
+# Speech rate calibration: once a voice has this many measured TTS chunks,
+# script sizing and wait timing use its fitted rate instead of the defaults
+SPEECH_RATE_MIN_SAMPLES = int(os.getenv("SPEECH_RATE_MIN_SAMPLES", "3"))
+
 SOPHISTICATION_DESCRIPTIONS = {
     1: "beginner-friendly, using simple language and basic concepts",
     2: "intermediate level, assuming basic knowledge of the subject",
     3: "advanced level, using sophisticated concepts and terminology appropriate for advanced students"
 }
-""
\ No newline at end of file
+
+# LLM response cache (opt-in, persisted under output/cache/llm)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Async LLM connection pool, one per provider per event loop
+LLM_ASYNC_MAX_CONNECTIONS = int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", "64"))
+LLM_ASYNC_MAX_KEEPALIVE = int(os.getenv("LLM_ASYNC_MAX_KEEPALIVE", "32"))
+
+# Stream codegen replies and stop reading at the closing code fence
+LLM_STREAM_CODEGEN = os.getenv("LLM_STREAM_CODEGEN", "1") == "1"
+
+# Stream the script reply and hand each concept to codegen/TTS as soon as it
+# closes. Streamed scripts are parsed from markers, so this only applies with
+# LLM_STRUCTURED_SCRIPT=0: the two are mutually exclusive and structured wins
+LLM_STREAM_SCRIPT = os.getenv("LLM_STREAM_SCRIPT", "1") == "1"
+
+# Ask for scripts as schema-checked JSON (tool call / json_schema) and only
+# fall back to parsing [NEW CONCEPT]/[NEW STEP] markers when that fails
+LLM_STRUCTURED_SCRIPT = os.getenv("LLM_STRUCTURED_SCRIPT", "1") == "1"
+
+# Reuse stored scripts for the same topic at the same duration and level,
+# ignoring filler and plurals ("what is a derivative" ~ "explain derivatives").
+# Near matches also accept the same content words in another order, or (with
+# SCRIPT_CACHE_MIN_JACCARD below 1) content word sets that overlap at least
+# that much. 1.0 keeps exact sets: one word can be all that separates two topics
+# ("sine derivative" vs "cosine derivative")
+SCRIPT_CACHE_ENABLED = os.getenv("SCRIPT_CACHE_ENABLED", "1") == "1"
+SCRIPT_CACHE_NEAR_MATCH = os.getenv("SCRIPT_CACHE_NEAR_MATCH", "1") == "1"
+SCRIPT_CACHE_MIN_JACCARD = float(os.getenv("SCRIPT_CACHE_MIN_JACCARD", "1.0"))
+SCRIPT_CACHE_MAX_ENTRIES = int(os.getenv("SCRIPT_CACHE_MAX_ENTRIES", "5000"))
+
+# Process-wide LLM admission control, per provider/model (see config/llm_governor.py).
+# Token estimates exclude cached_system blocks, which are served from the prompt cache.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "50"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "400000"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+
+# LLM retries (jittered exponential backoff) and optional hedged requests
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1.0"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30.0"))
+LLM_HEDGE_REQUESTS = os.getenv("LLM_HEDGE_REQUESTS", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Offline codegen through the provider message-batch APIs (cheaper, higher latency)
+LLM_BATCH_CODEGEN = os.getenv("LLM_BATCH_CODEGEN", "0") == "1"
+LLM_BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "30"))
+
+# Model cascade for fix_manim_code: a cheap model takes the first attempt(s) at
+# simple errors, the main codegen model handles the rest and anything it failed
+LLM_FIX_CASCADE = os.getenv("LLM_FIX_CASCADE", "1") == "1"
+LLM_FIX_CHEAP_MODEL = os.getenv("LLM_FIX_CHEAP_MODEL", "claude-3-5-haiku-20241022")
+LLM_FIX_CHEAP_ATTEMPTS = int(os.getenv("LLM_FIX_CHEAP_ATTEMPTS", "1"))
+
+# Send only the BM25-selected knowledge sections relevant to each scene/error
+# instead of the whole Manim + MathTex guide. Opt-in until its render success
+# rate is shown to match the full-context baseline: each scene's outcome is
+# counted per knowledge mode (scenes_<succeeded|failed>_knowledge_<full|retrieval>)
+LLM_KNOWLEDGE_RETRIEVAL = os.getenv("LLM_KNOWLEDGE_RETRIEVAL", "0") == "1"
+LLM_KNOWLEDGE_TOP_K = int(os.getenv("LLM_KNOWLEDGE_TOP_K", "8"))
+LLM_KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("LLM_KNOWLEDGE_TOKEN_BUDGET", "3000"))
+
+# Record/replay of LLM and TTS calls: "off", "record" or "replay". Replays
+# sleep for the recorded latency times CASSETTE_LATENCY_SCALE (0 = instant)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "0"))
+
+# Per-call LLM telemetry kept in memory (oldest records are dropped first)
+LLM_TELEMETRY_MAX_RECORDS = int(os.getenv("LLM_TELEMETRY_MAX_RECORDS", "20000"))
+
+# Long-lived Manim render workers (manim imported once per worker) instead of
+# one `manim` CLI process per render; workers are replaced after
+# RENDER_WORKER_MAX_JOBS renders and restarted after a crash or timeout
+RENDER_POOL_ENABLED = os.getenv("RENDER_POOL_ENABLED", "1") == "1"
+RENDER_POOL_SIZE = int(os.getenv("RENDER_POOL_SIZE", "2"))
+RENDER_WORKER_MAX_JOBS = int(os.getenv("RENDER_WORKER_MAX_JOBS", "25"))
+RENDER_WORKER_STARTUP_TIMEOUT = float(os.getenv("RENDER_WORKER_STARTUP_TIMEOUT", "120"))
+
+# Shared cache of compiled Tex/Text SVGs used by the render workers across
+# scenes and jobs (least recently used assets are evicted above the cap)
+ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE_ENABLED", "1") == "1"
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Before a scene renders, compile its literal MathTex/Tex strings into the Tex
+# cache in parallel across the render workers (LaTeX errors go to the fix loop)
+RENDER_TEX_PREWARM = os.getenv("RENDER_TEX_PREWARM", "1") == "1"
+
+# Compile Tex in the render workers against a precompiled LaTeX format (the
+# template preamble dumped once with `latex -ini`) instead of re-reading the
+# preamble for every formula; any failure falls back to manim's own compile
+RENDER_TEX_FORMAT = os.getenv("RENDER_TEX_FORMAT", "1") == "1"
+
+# Reuse code that rendered before for the same scene description, prompt
+# files and model, skipping codegen and the fix loop (editing the prompt or
+# knowledge files invalidates every entry)
+SCENE_CODE_CACHE_ENABLED = os.getenv("SCENE_CODE_CACHE_ENABLED", "1") == "1"
+SCENE_CODE_CACHE_MAX_ENTRIES = int(os.getenv("SCENE_CODE_CACHE_MAX_ENTRIES", "20000"))
+
+# Reuse the final video of identical scene code (same class, quality tier,
+# manim version and Tex template) instead of rendering it again
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "1") == "1"
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+
+# Render quality tiers (see config/render_quality.py): fixed code from the fix
+# loop (or any code when the dry run is off) is validated at
+# RENDER_PREVIEW_QUALITY and only code that renders cleanly is rendered again
+# at RENDER_FINAL_QUALITY (RENDER_PREVIEW_FIRST=0 skips previews)
+RENDER_PREVIEW_QUALITY = os.getenv("RENDER_PREVIEW_QUALITY", "preview")
+RENDER_FINAL_QUALITY = os.getenv("RENDER_FINAL_QUALITY", "final")
+RENDER_PREVIEW_FIRST = os.getenv("RENDER_PREVIEW_FIRST", "1") == "1"
+
+# Static pre-flight check (syntax, unknown Manim names, known-bad patterns) on
+# generated code; failures go straight back to the fix loop without a render
+RENDER_PREFLIGHT = os.getenv("RENDER_PREFLIGHT", "1") == "1"
+
+# Dry run (construct() with animations skipped, no frames written) before any
+# real render; its scene duration is compared with the narration timing and
+# mismatches beyond RENDER_DURATION_TOLERANCE (a fraction) are reported
+RENDER_DRY_RUN_FIRST = os.getenv("RENDER_DRY_RUN_FIRST", "1") == "1"
+RENDER_DURATION_TOLERANCE = float(os.getenv("RENDER_DURATION_TOLERANCE", "0.25"))
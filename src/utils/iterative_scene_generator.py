@@ -6,22 +6,23 @@ from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
-from backend.generate_script import Script, generate_script
+from backend.generate_script import generate_script
 from config.paths import (
-    MANIM_KNOWLEDGE_PATH, MANIM_PROMPT_PATH, VIDEO_OUTPUT_DIR, CODE_OUTPUT_DIR,
-    DATA_PATH, PROMPTS_PATH
+    MANIM_KNOWLEDGE_PATH, MATH_TEX_KNOWLEDGE_PATH, MANIM_PROMPT_PATH, VIDEO_OUTPUT_DIR, CODE_OUTPUT_DIR,
+    DATA_DIR, PROMPTS_DIR
 )
-from config.llm import LLMClient
+from config.registry import get_llm, read_text
+from config.render_quality import PREVIEW_TIER
+from config.settings import LLM_BATCH_CODEGEN
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the LLM client with higher token limit for analysis
-llm = LLMClient(model="claude-sonnet-4-20250514", temperature=0.3, max_tokens=16000)
+def improver_llm():
+    """LLM client with higher token limit for analysis, created on first use"""
+    return get_llm(model="claude-sonnet-4-20250514", temperature=0.3, max_tokens=16000)
 
-# Load Manim knowledge and initial prompt template
-manim_knowledge = MANIM_KNOWLEDGE_PATH.read_text(encoding="utf-8")
-math_tex_knowledge = (DATA_PATH / "math_tex_knowledge.txt").read_text(encoding="utf-8")
+ANALYSIS_SYSTEM_PROMPT = "You are a Manim expert providing concise error fixes."
 
 # 25 Different Mathematical Topics
 MATH_TOPICS = [
@@ -64,7 +65,7 @@ class PromptImprover:
     def save_prompt_version(self, version_number, reason=""):
         """Save the current prompt with a version number"""
         filename = f"manim_prompt_v{version_number}.txt"
-        prompt_dir = DATA_PATH / "prompt_versions"
+        prompt_dir = DATA_DIR / "prompt_versions"
         prompt_dir.mkdir(exist_ok=True)
         
         prompt_file = prompt_dir / filename
@@ -79,7 +80,17 @@ class PromptImprover:
 
     def analyze_error(self, error_message, failed_code, original_prompt, scene_description):
         """Send error details to LLM for analysis and prompt improvement"""
-        analysis_prompt = f"""
+        print("\n🔍 Analyzing error for targeted fix...")
+        response = improver_llm().chat(
+            ANALYSIS_SYSTEM_PROMPT,
+            self.analysis_prompt(error_message, failed_code, scene_description)
+        )
+        
+        return response
+
+    def analysis_prompt(self, error_message, failed_code, scene_description):
+        """User prompt asking for a short prompt addition that prevents this error"""
+        return f"""
 You are a Manim expert. A Manim scene failed to render. Analyze the error and suggest a SHORT, SPECIFIC addition to fix this type of error.
 
 **SCENE DESCRIPTION:**
@@ -106,14 +117,6 @@ Examples of good additions:
 - "Use Text() instead of MathTex() for simple labels to avoid LaTeX errors"
 """
 
-        print("\n🔍 Analyzing error for targeted fix...")
-        response = llm.chat(
-            "You are a Manim expert providing concise error fixes.",
-            analysis_prompt
-        )
-        
-        return response
-
     def extract_addition(self, llm_response):
         """Extract the small addition from LLM response"""
         print("🔍 Extracting addition from LLM response...")
@@ -160,25 +163,32 @@ Examples of good additions:
             print("❌ Failed to extract valid addition")
             return False
 
-    def generate_manim_code(self, scene_description: str) -> str:
-        """Generate Manim code using current prompt"""
+    def code_prompts(self, scene_description: str):
+        """System and user prompt asking for code with the current prompt"""
         prompt = f"Scene description:\n{scene_description}"
-        
-        print("\n--- Using Current Prompt ---")
-        print(f"Prompt length: {len(self.current_prompt.split())} words")
-        
         system_prompt = f"""
 This is the full breakdown on how to use manim:
-{manim_knowledge}
+{read_text(MANIM_KNOWLEDGE_PATH)}
 
 This is the full breakdown on how to use math_tex:
-{math_tex_knowledge}
+{read_text(MATH_TEX_KNOWLEDGE_PATH)}
 
 This is the task we would like you to accomplish with the given information:
 {self.current_prompt}
 """
-        raw_output = llm.chat(system_prompt, prompt)
+        return system_prompt, prompt
 
+    def generate_manim_code(self, scene_description: str) -> str:
+        """Generate Manim code using current prompt"""
+        print("\n--- Using Current Prompt ---")
+        print(f"Prompt length: {len(self.current_prompt.split())} words")
+        
+        system_prompt, prompt = self.code_prompts(scene_description)
+        raw_output = improver_llm().chat(system_prompt, prompt)
+        return self.extract_code(raw_output, system_prompt, prompt)
+
+    def extract_code(self, raw_output: str, system_prompt: str, prompt: str) -> str:
+        """Pull the code out of a reply, asking again with a higher limit if it looks truncated"""
         print("\n--- Raw LLM Output ---")
         print(raw_output[:500] + "..." if len(raw_output) > 500 else raw_output)
         print("--- End Raw Output ---")
@@ -190,7 +200,7 @@ This is the task we would like you to accomplish with the given information:
         if code and (code.endswith('...') or len(raw_output) > 15000):
             print("⚠️ Code appears truncated, trying with higher max_tokens...")
             # Retry with higher limit
-            raw_output = llm.chat(system_prompt, prompt, max_tokens=20000)
+            raw_output = improver_llm().chat(system_prompt, prompt, max_tokens=20000)
             match = re.search(r"'''(.*?)'''", raw_output, flags=re.DOTALL)
             code = match.group(1).strip() if match else ""
 
@@ -201,11 +211,11 @@ This is the task we would like you to accomplish with the given information:
         return code
 
     def render_code_with_error_capture(self, py_file: Path, scene_name: str, output_dir: Path):
-        """Render Manim code and capture detailed error information"""
+        """Render Manim code and capture detailed error information (preview quality: only errors matter here)"""
         print(f"🎬 Rendering {scene_name} from {py_file.name}...")
         try:
             result = subprocess.run(
-                ["manim", str(py_file), scene_name, "-o", f"{py_file.stem}.mp4"],
+                ["manim", PREVIEW_TIER.cli_flag, str(py_file), scene_name, "-o", f"{py_file.stem}.mp4"],
                 cwd=output_dir,
                 capture_output=True,
                 text=True,
@@ -235,6 +245,101 @@ This is the task we would like you to accomplish with the given information:
         print(f"📊 Current Success Rate: {self.successful_renders}/{self.successful_renders + self.failed_renders}")
         print(f"{'='*60}")
 
+        scene_description = self.start_topic(topic)
+        if scene_description is None:
+            return False
+
+        # Attempt to render until success or max attempts
+        for attempt in range(1, self.max_iterations + 1):
+            print(f"\n--- 🔄 Attempt {attempt}/{self.max_iterations} for {topic} ---")
+            self.topic_results[topic]["attempts"] = attempt
+            
+            # Generate code
+            code = self.generate_manim_code(scene_description)
+            
+            if not code.strip():
+                print("⚠️ Empty code generated, trying again...")
+                continue
+
+            error_context = self.try_code(topic, attempt, code, scene_description)
+            if error_context is None:
+                return True
+
+            llm_analysis = self.analyze_error(
+                error_context["error_message"],
+                code,
+                self.current_prompt,
+                scene_description
+            )
+            self.apply_analysis(llm_analysis, error_context)
+            
+            # Small delay to avoid overwhelming the API
+            time.sleep(2)
+
+        print(f"❌ {topic} FAILED after {self.max_iterations} attempts")
+        self.topic_results[topic]["final_attempt"] = self.max_iterations
+        return False
+
+    def process_topics_in_rounds(self, topics):
+        """
+        Batched alternative to calling process_topic_until_success per topic,
+        for offline runs. Each round drafts code for every unfinished topic in
+        one message batch against the current prompt, renders the drafts, then
+        sends the error analyses of that round's failures as a second batch.
+        Batches are billed at a discount but come back slowly, and additions
+        only take effect from the next round. Returns the number of topics
+        that succeeded.
+        """
+        scenes = {}
+        for topic in topics:
+            scene_description = self.start_topic(topic)
+            if scene_description is not None:
+                scenes[topic] = scene_description
+
+        for attempt in range(1, self.max_iterations + 1):
+            pending = [topic for topic in scenes if not self.topic_results[topic]["success"]]
+            if not pending:
+                break
+            print(f"\n--- 📦 Round {attempt}/{self.max_iterations}: {len(pending)} topics ---")
+
+            batch = improver_llm().batch()
+            drafts = {}
+            for topic in pending:
+                self.topic_results[topic]["attempts"] = attempt
+                system_prompt, prompt = self.code_prompts(scenes[topic])
+                drafts[topic] = (batch.add(system_prompt, prompt), system_prompt, prompt)
+            batch.run()
+
+            failures = []
+            for topic, (future, system_prompt, prompt) in drafts.items():
+                code = self.extract_code(future.result(), system_prompt, prompt)
+                if not code.strip():
+                    print(f"⚠️ Empty code generated for {topic}, trying again next round...")
+                    continue
+                error_context = self.try_code(topic, attempt, code, scenes[topic])
+                if error_context is not None:
+                    failures.append(error_context)
+
+            if failures:
+                batch = improver_llm().batch()
+                analyses = [
+                    batch.add(ANALYSIS_SYSTEM_PROMPT, self.analysis_prompt(
+                        error_context["error_message"], error_context["failed_code"], error_context["scene_description"]
+                    ))
+                    for error_context in failures
+                ]
+                batch.run()
+                for future, error_context in zip(analyses, failures):
+                    self.apply_analysis(future.result(), error_context)
+
+        for topic in scenes:
+            if not self.topic_results[topic]["success"]:
+                print(f"❌ {topic} FAILED after {self.max_iterations} rounds")
+                self.topic_results[topic]["final_attempt"] = self.max_iterations
+        return sum(1 for topic in scenes if self.topic_results[topic]["success"])
+
+    def start_topic(self, topic: str):
+        """Set up output folders and tracking for topic and return its scene description (None on failure)"""
         topic_slug = safe_slugify(topic)
         topic_code_dir = CODE_OUTPUT_DIR / topic_slug
         topic_video_dir = VIDEO_OUTPUT_DIR / topic_slug
@@ -259,89 +364,66 @@ This is the task we would like you to accomplish with the given information:
             # Use the first concept's scene description for simplicity
             if not script.concepts:
                 print(f"❌ No concepts generated for {topic}")
-                return False
+                return None
                 
-            scene_description = script.concepts[0].scene_description
+            return script.concepts[0].scene_description
             
         except Exception as e:
             print(f"❌ Failed to generate script for {topic}: {e}")
-            return False
+            return None
 
-        # Attempt to render until success or max attempts
-        for attempt in range(1, self.max_iterations + 1):
-            print(f"\n--- 🔄 Attempt {attempt}/{self.max_iterations} for {topic} ---")
-            self.topic_results[topic]["attempts"] = attempt
-            
-            # Generate code
-            code = self.generate_manim_code(scene_description)
-            
-            if not code.strip():
-                print("⚠️ Empty code generated, trying again...")
-                continue
-
-            # Save and test code
-            filename = f"{topic_slug}_attempt_{attempt}"
-            py_file = self.save_code(code, filename, topic_code_dir)
-            scene_class = self.extract_scene_class(code)
-            
-            # Attempt render
-            render_result = self.render_code_with_error_capture(py_file, scene_class, topic_video_dir)
+    def try_code(self, topic: str, attempt: int, code: str, scene_description: str):
+        """Save and render one attempt; returns None on success, otherwise the error context"""
+        topic_slug = safe_slugify(topic)
+        filename = f"{topic_slug}_attempt_{attempt}"
+        py_file = self.save_code(code, filename, CODE_OUTPUT_DIR / topic_slug)
+        scene_class = self.extract_scene_class(code)
+        
+        # Attempt render
+        render_result = self.render_code_with_error_capture(py_file, scene_class, VIDEO_OUTPUT_DIR / topic_slug)
+        
+        if render_result["success"]:
+            print(f"🎉 SUCCESS! {topic} completed after {attempt} attempts!")
+            self.topic_results[topic]["success"] = True
+            self.topic_results[topic]["final_attempt"] = attempt
             
-            if render_result["success"]:
-                print(f"🎉 SUCCESS! {topic} completed after {attempt} attempts!")
-                self.topic_results[topic]["success"] = True
-                self.topic_results[topic]["final_attempt"] = attempt
-                
-                # Save successful prompt version
-                if len(self.improvement_log) > 0:
-                    self.save_prompt_version(
-                        len(self.improvement_log) + 1, 
-                        f"Success on {topic} after {attempt} attempts"
-                    )
-                
-                return True
-            else:
-                # Track error
-                error_summary = render_result["stderr"][:100] + "..." if len(render_result["stderr"]) > 100 else render_result["stderr"]
-                self.topic_results[topic]["errors_encountered"].append({
-                    "attempt": attempt,
-                    "error": error_summary
-                })
-                
-                print(f"❌ Attempt {attempt} failed for {topic}")
-                
-                # Analyze error and improve prompt
-                error_context = {
-                    "topic": topic,
-                    "attempt": attempt,
-                    "scene_description": scene_description,
-                    "failed_code": code,
-                    "error_message": render_result["stderr"]
-                }
-                
-                llm_analysis = self.analyze_error(
-                    render_result["stderr"],
-                    code,
-                    self.current_prompt,
-                    scene_description
+            # Save successful prompt version
+            if len(self.improvement_log) > 0:
+                self.save_prompt_version(
+                    len(self.improvement_log) + 1, 
+                    f"Success on {topic} after {attempt} attempts"
                 )
-                
-                if self.update_prompt(llm_analysis, error_context):
-                    # Save improved prompt version
-                    self.save_prompt_version(
-                        len(self.improvement_log),
-                        f"Fixed error in {topic}, attempt {attempt}"
-                    )
-                    print(f"🔄 Prompt improved, retrying...")
-                else:
-                    print(f"⚠️ Could not improve prompt, continuing...")
-                
-                # Small delay to avoid overwhelming the API
-                time.sleep(2)
+            
+            return None
+
+        # Track error
+        error_summary = render_result["stderr"][:100] + "..." if len(render_result["stderr"]) > 100 else render_result["stderr"]
+        self.topic_results[topic]["errors_encountered"].append({
+            "attempt": attempt,
+            "error": error_summary
+        })
+        
+        print(f"❌ Attempt {attempt} failed for {topic}")
+        
+        return {
+            "topic": topic,
+            "attempt": attempt,
+            "scene_description": scene_description,
+            "failed_code": code,
+            "error_message": render_result["stderr"]
+        }
 
-        print(f"❌ {topic} FAILED after {self.max_iterations} attempts")
-        self.topic_results[topic]["final_attempt"] = self.max_iterations
-        return False
+    def apply_analysis(self, llm_analysis, error_context):
+        """Improve the prompt from an error analysis and save the new version"""
+        if self.update_prompt(llm_analysis, error_context):
+            # Save improved prompt version
+            self.save_prompt_version(
+                len(self.improvement_log),
+                f"Fixed error in {error_context['topic']}, attempt {error_context['attempt']}"
+            )
+            print(f"🔄 Prompt improved, retrying...")
+        else:
+            print(f"⚠️ Could not improve prompt, continuing...")
 
     def save_code(self, code: str, filename: str, output_dir: Path):
         """Save code to file"""
@@ -389,7 +471,7 @@ This is the task we would like you to accomplish with the given information:
             }
         }
         
-        report_file = DATA_PATH / "improvement_reports" / f"25_topics_report.json"
+        report_file = DATA_DIR / "improvement_reports" / f"25_topics_report.json"
         report_file.parent.mkdir(exist_ok=True)
         
         with report_file.open("w", encoding="utf-8") as f:
@@ -476,24 +558,29 @@ def main():
     successful_count = 0
     start_time = datetime.now()
     
-    # Process each topic
-    for i, topic in enumerate(MATH_TOPICS, 1):
-        topic_start = datetime.now()
-        
-        if improver.process_topic_until_success(topic, i):
-            successful_count += 1
-        
-        topic_elapsed = datetime.now() - topic_start
-        total_elapsed = datetime.now() - start_time
-        
-        print(f"\n⏱️  Topic {i} completed in {topic_elapsed.total_seconds():.1f}s")
-        print(f"📊 Running tally: {successful_count}/{i} topics successful")
-        print(f"⏱️  Total elapsed: {total_elapsed.total_seconds()/60:.1f} minutes")
-        
-        # Save intermediate progress every 5 topics
-        if i % 5 == 0:
-            print(f"\n💾 Saving intermediate progress at topic {i}...")
-            improver.save_comprehensive_report()
+    if LLM_BATCH_CODEGEN:
+        # Offline run: every round's drafts and analyses go out as message batches
+        print("📦 LLM_BATCH_CODEGEN=1: processing all topics in batched rounds")
+        successful_count = improver.process_topics_in_rounds(MATH_TOPICS)
+    else:
+        # Process each topic
+        for i, topic in enumerate(MATH_TOPICS, 1):
+            topic_start = datetime.now()
+            
+            if improver.process_topic_until_success(topic, i):
+                successful_count += 1
+            
+            topic_elapsed = datetime.now() - topic_start
+            total_elapsed = datetime.now() - start_time
+            
+            print(f"\n⏱️  Topic {i} completed in {topic_elapsed.total_seconds():.1f}s")
+            print(f"📊 Running tally: {successful_count}/{i} topics successful")
+            print(f"⏱️  Total elapsed: {total_elapsed.total_seconds()/60:.1f} minutes")
+            
+            # Save intermediate progress every 5 topics
+            if i % 5 == 0:
+                print(f"\n💾 Saving intermediate progress at topic {i}...")
+                improver.save_comprehensive_report()
 
     # Save final results
     total_elapsed = datetime.now() - start_time
@@ -506,7 +593,7 @@ def main():
     report_file = improver.save_comprehensive_report()
     
     # Save the final improved prompt as the new default
-    final_prompt_file = PROMPTS_PATH / "manim_prompt_25topics_improved.txt"
+    final_prompt_file = PROMPTS_DIR / "manim_prompt_25topics_improved.txt"
     with final_prompt_file.open("w", encoding="utf-8") as f:
         f.write(f"# Improved prompt after processing 25 math topics\n")
         f.write(f"# Success rate: {successful_count}/{len(MATH_TOPICS)} ({successful_count/len(MATH_TOPICS):.1%})\n")
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from backend import asset_cache
+from backend.asset_cache import MIN_EVICT_AGE, TEX_DIR, TEXT_DIR, AssetCache
+
+
+def add_asset(cache_dir, subdir, stem, age, suffixes=(".svg",), size=100):
+    """Write stem's files into the cache, last used age seconds ago"""
+    directory = cache_dir / subdir
+    directory.mkdir(parents=True, exist_ok=True)
+    mtime = time.time() - age
+    for suffix in suffixes:
+        path = directory / f"{stem}{suffix}"
+        path.write_bytes(b"x" * size)
+        os.utime(path, (mtime, mtime))
+
+
+def remaining(cache_dir):
+    return sorted(p.name for subdir in (TEX_DIR, TEXT_DIR) if (cache_dir / subdir).exists()
+                  for p in (cache_dir / subdir).iterdir())
+
+
+def test_eviction_drops_least_recently_used_groups_first(tmp_path):
+    old = MIN_EVICT_AGE + 3600
+    # A formula's .tex/.dvi/.svg are one group; the group's newest file sets its age
+    add_asset(tmp_path, TEX_DIR, "oldest", old + 300, suffixes=(".tex", ".dvi", ".svg"))
+    add_asset(tmp_path, TEXT_DIR, "older", old + 200)
+    add_asset(tmp_path, TEX_DIR, "newer", old + 100, suffixes=(".tex", ".svg"))
+    cache = AssetCache(tmp_path, max_bytes=250)
+
+    freed = cache.evict()
+
+    assert remaining(tmp_path) == ["newer.svg", "newer.tex"]
+    assert freed == 400
+    stats = cache.stats()
+    assert (stats["evicted_files"], stats["evicted_bytes"], stats["size_bytes"]) == (4, 400, 200)
+
+
+def test_recently_used_assets_are_never_evicted(tmp_path):
+    add_asset(tmp_path, TEX_DIR, "stale", MIN_EVICT_AGE + 60)
+    add_asset(tmp_path, TEX_DIR, "fresh", MIN_EVICT_AGE - 60)
+    add_asset(tmp_path, TEXT_DIR, "in_use", 0)
+    cache = AssetCache(tmp_path, max_bytes=0)
+
+    assert cache.evict() == 100
+    assert remaining(tmp_path) == ["fresh.svg", "in_use.svg"]
+
+
+def test_maybe_evict_scans_at_most_once_per_interval(tmp_path):
+    cache = AssetCache(tmp_path, max_bytes=0)
+    add_asset(tmp_path, TEX_DIR, "first", MIN_EVICT_AGE + 60)
+    cache.maybe_evict()
+    add_asset(tmp_path, TEX_DIR, "second", MIN_EVICT_AGE + 60)
+    cache.maybe_evict()
+    assert remaining(tmp_path) == ["second.svg"]
+
+
+def test_take_counts_resets_between_jobs(monkeypatch, tmp_path):
+    monkeypatch.setattr(asset_cache, "_counts", Counter())
+    svg = tmp_path / "cached.svg"
+    svg.write_bytes(b"svg")
+    os.utime(svg, (1, 1))
+
+    asset_cache._count("tex", svg, hit=True)
+    asset_cache._count("tex", tmp_path / "new.svg", hit=False)
+    asset_cache._count("text", svg, hit=True)
+    asset_cache._counts["tex_compiles"] += 1
+
+    assert asset_cache.take_counts() == {"tex_hits": 1, "tex_misses": 1, "text_hits": 1}
+    assert asset_cache.take_counts() == {}
+    # Hits are touched so eviction sees them as recently used
+    assert svg.stat().st_mtime > time.time() - 60
+
+    cache = AssetCache(tmp_path)
+    cache.record({"tex_hits": 3, "tex_misses": 1})
+    assert cache.stats()["tex"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+@pytest.mark.skipif(asset_cache.fcntl is None, reason="compile locks need fcntl")
+def test_compiles_of_the_same_file_are_serialized(tmp_path):
+    held = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def first():
+        with asset_cache._locked(tmp_path, "tex\0align*\0\0x^2"):
+            held.set()
+            release.wait(5)
+            order.append("first")
+
+    def second():
+        with asset_cache._locked(tmp_path, "tex\0align*\0\0x^2"):
+            order.append("second")
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    threads[0].start()
+    assert held.wait(5)
+    threads[1].start()
+    time.sleep(0.1)
+    assert order == []  # still waiting for the first compile
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["first", "second"]
@@ -0,0 +1,197 @@
+import functools
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+
+import config.cassette as cassette_module
+from config import registry
+from config.cassette import Cassette, CassetteMiss, use_cassette
+from config.llm import LLMClient
+
+MODEL = "claude-sonnet-4-20250514"
+
+
+@pytest.fixture
+def cassette_dir(tmp_path):
+    """Point the process-wide cassette at a temporary recording; restore it afterwards"""
+    previous = cassette_module._cassette
+    registry.reset()
+    yield tmp_path / "cassette"
+    use_cassette(previous)
+    registry.reset()
+
+
+def use(cassette_dir, mode, latency_scale=0.0) -> Cassette:
+    cassette = Cassette(cassette_dir, mode=mode, latency_scale=latency_scale)
+    use_cassette(cassette)
+    return cassette
+
+
+class FakeAnthropic:
+    """Answers messages.create like the Anthropic SDK, counting the requests that reach it"""
+
+    def __init__(self, reply=lambda request: "reply to " + request["messages"][-1]["content"]):
+        self.reply = reply
+        self.requests = []
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **request):
+        self.requests.append(request)
+        usage = SimpleNamespace(input_tokens=120, output_tokens=30)
+        reply = self.reply(request)
+        if isinstance(reply, dict):
+            return SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=reply)], usage=usage)
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=reply)], usage=usage)
+
+
+class OfflineAnthropic:
+    """Stands in for the SDK during replays: any request is a test failure"""
+
+    def __init__(self):
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **request):
+        raise AssertionError("replay reached the provider")
+
+
+def recording_client(monkeypatch, sdk, **settings) -> LLMClient:
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    client = LLMClient(model=MODEL, **settings)
+    client.client = sdk
+    return client
+
+
+def replaying_client(monkeypatch, **settings) -> LLMClient:
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    client = LLMClient(model=MODEL, **settings)
+    client.client = OfflineAnthropic()
+    return client
+
+
+def test_chat_round_trip(cassette_dir, monkeypatch):
+    recording = use(cassette_dir, "record")
+    sdk = FakeAnthropic()
+    recorded = recording_client(monkeypatch, sdk).chat("system", "what is a derivative?")
+    assert recorded == "reply to what is a derivative?"
+    assert recording.stats()["recorded"] == 1
+
+    replaying = use(cassette_dir, "replay")
+    client = replaying_client(monkeypatch)
+    assert client.api_key == "cassette-replay"
+    # Replays are deterministic: the same answer every time, with the recorded usage
+    assert [client.chat("system", "what is a derivative?") for _ in range(2)] == [recorded, recorded]
+    assert client.usage_stats()["input_tokens"] == 240
+    assert replaying.stats()["replayed"] == 2
+    assert len(sdk.requests) == 1
+
+
+def test_replay_fails_for_a_request_that_was_not_recorded(cassette_dir, monkeypatch):
+    use(cassette_dir, "record")
+    recording_client(monkeypatch, FakeAnthropic()).chat("system", "recorded prompt")
+
+    use(cassette_dir, "replay")
+    client = replaying_client(monkeypatch)
+    with pytest.raises(CassetteMiss):
+        client.chat("system", "a prompt nobody recorded")
+    # Other sampling settings are different requests too
+    with pytest.raises(CassetteMiss):
+        replaying_client(monkeypatch, temperature=0.9).chat("system", "recorded prompt")
+
+
+def test_tts_round_trip(cassette_dir, monkeypatch):
+    import backend.generate_audio as generate_audio
+
+    audio = b"ID3\x00fake mp3 bytes"
+    calls = []
+    monkeypatch.setattr(generate_audio, "synthesize_chunk", lambda text, index: calls.append(text) or audio)
+    use(cassette_dir, "record")
+    assert generate_audio.generate_audio_chunk("Hello there.", 0, 1) == audio
+    assert list((cassette_dir / "tts").glob("*.bin"))
+
+    def offline(text, index):
+        raise AssertionError("replay reached ElevenLabs")
+
+    monkeypatch.setattr(generate_audio, "synthesize_chunk", offline)
+    use(cassette_dir, "replay")
+    assert generate_audio.generate_audio_chunk("Hello there.", 0, 1) == audio
+    assert calls == ["Hello there."]
+    with pytest.raises(CassetteMiss):
+        generate_audio.generate_audio_chunk("Something else.", 0, 1)
+
+
+def test_keys_ignore_dict_order():
+    assert Cassette.make_key({"a": 1, "b": [1, 2]}) == Cassette.make_key({"b": [1, 2], "a": 1})
+    assert Cassette.make_key({"a": 1}) != Cassette.make_key({"a": 2})
+
+
+def test_replays_simulate_the_recorded_latency(cassette_dir):
+    recording = use(cassette_dir, "record")
+    recording.save("tts", {"text": "slow"}, b"audio", latency_seconds=0.1)
+
+    instant = use(cassette_dir, "replay")
+    started = time.monotonic()
+    assert instant.call("tts", {"text": "slow"}, lambda: b"unused") == b"audio"
+    assert time.monotonic() - started < 0.1
+
+    scaled = use(cassette_dir, "replay", latency_scale=2.0)
+    started = time.monotonic()
+    assert scaled.call("tts", {"text": "slow"}, lambda: b"unused") == b"audio"
+    assert time.monotonic() - started >= 0.2
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Cassette(tmp_path, mode="playback")
+
+
+def test_prompt_improver_replays_offline(cassette_dir, monkeypatch, tmp_path):
+    import utils.iterative_scene_generator as improver_module
+    from backend.generate_script import generate_script
+
+    # Keep the run's files out of the repo's output and data folders
+    monkeypatch.setattr(improver_module, "CODE_OUTPUT_DIR", tmp_path / "code")
+    monkeypatch.setattr(improver_module, "VIDEO_OUTPUT_DIR", tmp_path / "videos")
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(improver_module, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(improver_module, "generate_script", functools.partial(generate_script, use_cache=False))
+
+    def reply(request):
+        prompt = request["messages"][-1]["content"]
+        if request.get("tools"):
+            return {"concepts": [{"narration": "The triangle has two equal sides.",
+                                  "scene_description": "Draw an isosceles triangle", "target_seconds": 4}]}
+        if "failed to render" in prompt:
+            return "ANALYSIS: missing import\n\nADDITION: Always start with from manim import *"
+        return "'''from manim import *\nclass Triangle(Scene):\n    def construct(self): pass'''"
+
+    def run():
+        renders = iter([{"success": False, "stderr": "NameError: Polygon"}, {"success": True, "stdout": ""}])
+        improver = improver_module.PromptImprover(max_iterations=3)
+        improver.render_code_with_error_capture = lambda *args: next(renders)
+        monkeypatch.setattr(improver_module.time, "sleep", lambda seconds: None)
+        assert improver.process_topic_until_success("Isosceles Triangle", 1)
+        return improver
+
+    use(cassette_dir, "record")
+    sdk = FakeAnthropic(reply)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    for client in (improver_module.improver_llm(), registry.get_llm(MODEL, 0.7, 8000)):
+        client.client = sdk
+    recorded = run()
+    assert len(sdk.requests) == 4  # script, first draft, analysis, second draft
+
+    registry.reset()
+    monkeypatch.delenv("ANTHROPIC_API_KEY")
+    replaying = use(cassette_dir, "replay")
+    for client in (improver_module.improver_llm(), registry.get_llm(MODEL, 0.7, 8000)):
+        client.client = OfflineAnthropic()
+    replayed = run()
+
+    assert replaying.stats()["replayed"] == 4
+    assert replayed.current_prompt == recorded.current_prompt
+    assert json.dumps(replayed.topic_results) == json.dumps(recorded.topic_results)
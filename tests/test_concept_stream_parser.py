@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+
+from backend.generate_script import ConceptStreamParser, ConceptSegment, continuation_prompt
+
+SCRIPT = (
+    "Here is the script.\n"
+    "[NEW CONCEPT]\nFirst narration.\n[END CONCEPT|| Scene description:\n"
+    "Static state 1: A circle [duration: 5s], centered]\n\n"
+    "[NEW CONCEPT]\nSecond narration.\n[END CONCEPT|| Scene description:\n"
+    "Animation 1: The circle grows [duration: 8s]]\n"
+)
+
+
+def feed(parser, text, step):
+    """Feed text in growing prefixes of step characters, as a stream would"""
+    segments = []
+    for end in range(step, len(text) + step, step):
+        segments += parser.update(text[:end])
+    return segments
+
+
+@pytest.mark.parametrize("step", [1, 7, len(SCRIPT)])
+def test_concepts_are_emitted_once_as_they_close(step):
+    parser = ConceptStreamParser()
+    segments = feed(parser, SCRIPT, step) + parser.close()
+    assert [s.narration for s in segments] == ["First narration.", "Second narration."]
+    assert segments[0].scene_description == "Static state 1: A circle [duration: 5s], centered"
+
+
+def test_a_concept_is_not_emitted_before_its_description_closes():
+    parser = ConceptStreamParser()
+    cut = SCRIPT.index("A circle")
+    assert parser.update(SCRIPT[:cut]) == []
+    assert len(parser.update(SCRIPT[:cut + 40])) == 1
+
+
+def test_unclosed_concepts_come_out_on_close():
+    parser = ConceptStreamParser()
+    text = "[NEW CONCEPT]\nNarration without a description"
+    assert parser.update(text) == []
+    [segment] = parser.close()
+    assert segment.scene_description.startswith("Show visual representation of:")
+
+
+def test_a_restarted_reply_does_not_repeat_concepts():
+    parser = ConceptStreamParser()
+    first = SCRIPT[:SCRIPT.index("[NEW CONCEPT]", 30)]
+    assert len(parser.update(first)) == 1
+    # A retried request streams the same reply again from the start
+    assert [s.narration for s in feed(parser, SCRIPT, 11)] == ["Second narration."]
+    assert parser.close() == []
+    assert parser.emitted == 2
+
+
+def test_continuation_prompt_repeats_the_written_concepts():
+    prompt = continuation_prompt("Write a script.", [ConceptSegment("First narration.", "A circle")])
+    assert prompt.startswith("Write a script.")
+    assert "[NEW CONCEPT]\nFirst narration." in prompt
+    assert "starting with scene 2" in prompt
@@ -0,0 +1,67 @@
+from backend.knowledge_index import BM25Index, Section, split_markdown, split_plain, tokenize
+
+
+def section(title, text):
+    return Section("manim", title, text, 0)
+
+
+def test_tokenize_splits_identifiers_and_drops_stopwords():
+    terms = tokenize("Use get_corner on the MathTex object")
+    assert {"get_corner", "get", "corner", "mathtex", "math", "tex", "object"} <= set(terms)
+    assert "the" not in terms and "use" not in terms
+
+
+def test_split_markdown_titles_sections_with_their_parents():
+    sections = split_markdown("# Shapes\nintro\n## Circle\ncircle text\n## Square\nsquare text\n", "manim")
+    assert [s.title for s in sections] == ["Shapes", "Shapes > Circle", "Shapes > Square"]
+
+
+def test_split_plain_cuts_long_text_at_paragraph_breaks():
+    paragraph = "word " * 100
+    sections = split_plain("\n\n".join([paragraph] * 6), "math_tex", max_chars=1000)
+    assert len(sections) > 1
+    assert all(len(s.text) < 1600 for s in sections)
+
+
+def test_search_ranks_matching_sections_first():
+    index = BM25Index([
+        section("Circles", "Circle(radius=1) draws a circle"),
+        section("Matrices", "Matrix([[1, 2], [3, 4]]) shows a matrix"),
+        section("Text", "Text('hello') writes text"),
+    ])
+    results = index.search("draw a matrix", top_k=3)
+    assert [s.title for _, s in results] == ["Matrices"]
+    assert index.search("nothing relevant here", top_k=3) == []
+
+
+def test_select_respects_the_token_budget_and_keeps_corpus_order():
+    index = BM25Index([
+        section("Axes", "axes plot graph " * 5),
+        section("Graph", "graph " * 400),
+        section("Plot", "plot graph"),
+    ])
+    chosen = index.select("plot graph", top_k=3, token_budget=50)
+    assert [s.title for s in chosen] == ["Axes", "Plot"]
+    assert sum(s.tokens for s in chosen) <= 50
+    assert index.total_tokens > 50
+
+
+def test_scene_outcomes_are_counted_per_knowledge_mode(monkeypatch):
+    import backend.generate_scenes as generate_scenes
+    from config.llm_telemetry import Telemetry, llm_context
+
+    telemetry = Telemetry()
+    monkeypatch.setattr(generate_scenes, "get_telemetry", lambda: telemetry)
+
+    with llm_context(job_id="baseline"):
+        monkeypatch.setattr(generate_scenes, "LLM_KNOWLEDGE_RETRIEVAL", False)
+        generate_scenes.count_scene_outcome(0, True)
+        generate_scenes.count_scene_outcome(1, False)
+    with llm_context(job_id="retrieval"):
+        monkeypatch.setattr(generate_scenes, "LLM_KNOWLEDGE_RETRIEVAL", True)
+        generate_scenes.count_scene_outcome(0, True)
+
+    assert telemetry.counters("baseline") == {
+        "scenes_succeeded_knowledge_full": 1, "scenes_failed_knowledge_full": 1,
+    }
+    assert telemetry.counters("retrieval") == {"scenes_succeeded_knowledge_retrieval": 1}
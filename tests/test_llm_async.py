@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+
+import config.llm as llm_module
+from config.llm import LLMClient, _get_async_client, aclose_async_clients
+from config.llm_cache import ResponseCache
+from config.llm_governor import RateGovernor
+from config.llm_retry import LatencyTracker
+import config.llm_telemetry as telemetry_module
+from config.llm_telemetry import llm_context
+from config.settings import LLM_ASYNC_MAX_CONNECTIONS
+
+
+def async_client(provider="anthropic", max_in_flight=16, cache=None):
+    """An LLMClient with its own governor, without API keys"""
+    client = LLMClient.__new__(LLMClient)
+    client.model = "test-model"
+    client.temperature = 0.0
+    client.max_tokens = 100
+    client.provider = provider
+    client.api_key = "test-key"
+    client.cache = cache
+    client.governor = RateGovernor("test", requests_per_minute=10_000, tokens_per_minute=10 ** 8,
+                                   max_in_flight=max_in_flight)
+    client.latency = LatencyTracker()
+    client._usage_lock = threading.Lock()
+    client._usage = {k: 0 for k in (
+        "calls", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"
+    )}
+    return client
+
+
+class FakeAsyncAnthropic:
+    """Answers messages.create after a short await, tracking how many requests overlap"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.messages = SimpleNamespace(create=self.create)
+
+    async def create(self, **request):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        prompt = request["messages"][0]["content"]
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=f"reply to {prompt}")],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=5),
+        )
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    fake = FakeAsyncAnthropic()
+    monkeypatch.setattr(llm_module, "_get_async_client", lambda provider, api_key: fake)
+    return fake
+
+
+def test_concurrent_achat_calls_overlap_on_one_loop(fake_pool):
+    client = async_client()
+
+    async def run():
+        return await asyncio.gather(*(client.achat("system", f"prompt {i}") for i in range(8)))
+
+    replies = asyncio.run(run())
+
+    assert replies == [f"reply to prompt {i}" for i in range(8)]
+    assert fake_pool.calls == 8
+    assert fake_pool.max_running == 8
+    assert client.usage_stats()["input_tokens"] == 80
+
+
+def test_achat_respects_the_governor_in_flight_limit(fake_pool):
+    client = async_client(max_in_flight=2)
+
+    async def run():
+        return await asyncio.gather(*(client.achat("system", f"prompt {i}") for i in range(6)))
+
+    assert len(asyncio.run(run())) == 6
+    assert fake_pool.max_running == 2
+    assert client.governor.stats()["in_flight"] == 0
+
+
+def test_concurrent_identical_achat_calls_share_one_request(fake_pool, tmp_path):
+    client = async_client(cache=ResponseCache(cache_dir=tmp_path))
+
+    async def run():
+        return await asyncio.gather(*(client.achat("system", "same prompt") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["reply to same prompt"] * 5
+    assert fake_pool.calls == 1
+    assert client.cache_stats()["coalesced"] == 4
+
+
+def test_achat_calls_keep_their_own_job_context(fake_pool, monkeypatch):
+    client = async_client()
+    records = []
+    monkeypatch.setattr(telemetry_module, "get_telemetry", lambda: SimpleNamespace(record=records.append))
+
+    async def call(job_id):
+        with llm_context(job_id=job_id):
+            return await client.achat("system", job_id)
+
+    async def run():
+        return await asyncio.gather(*(call(f"job-{i}") for i in range(4)))
+
+    asyncio.run(run())
+
+    assert sorted(r.job_id for r in records) == [f"job-{i}" for i in range(4)]
+    assert all(r.mode == "chat" and r.success and r.input_tokens == 10 for r in records)
+
+
+def test_one_pool_per_provider_per_loop():
+    async def run():
+        first = _get_async_client("anthropic", "key")
+        again = _get_async_client("anthropic", "key")
+        other = _get_async_client("openai", "key")
+        pool = first._client._transport._pool
+        await aclose_async_clients()
+        return first, again, other, pool
+
+    first, again, other, pool = asyncio.run(run())
+    assert first is again
+    assert other is not first
+    assert pool._max_connections == LLM_ASYNC_MAX_CONNECTIONS
+
+
+def test_scene_drafts_are_requested_concurrently(fake_pool, monkeypatch):
+    import backend.generate_scenes as generate_scenes
+    from backend.generate_script import ConceptSegment, Script
+
+    client = async_client()
+    stored = {"scene 2": "class Stored(Scene): pass"}
+    handed_over = {}
+
+    def generate_all(script, max_workers, batch_codegen, initial_codes):
+        handed_over.update(initial_codes)
+        return "final.mp4"
+
+    monkeypatch.setattr(generate_scenes, "codegen_llm", lambda: client)
+    monkeypatch.setattr(generate_scenes, "codegen_prompts", lambda prompt: ("system", [], None))
+    monkeypatch.setattr(generate_scenes, "extract_manim_code", lambda raw: raw)
+    monkeypatch.setattr(generate_scenes, "stored_scene_code", lambda concept: stored.get(concept.scene_description))
+    monkeypatch.setattr(generate_scenes, "generate_all_scenes_from_script", generate_all)
+
+    script = Script("topic", 1, 1, [ConceptSegment("narration", f"scene {i}") for i in range(4)])
+    assert asyncio.run(generate_scenes.agenerate_all_scenes_from_script(script)) == "final.mp4"
+
+    # Stored code is reused, the other three drafts go out together
+    assert fake_pool.calls == 3
+    assert fake_pool.max_running == 3
+    assert handed_over[2] == "class Stored(Scene): pass"
+    assert handed_over[0] == "reply to " + generate_scenes.scene_prompt(0, script.concepts[0])
@@ -0,0 +1,222 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+
+import config.llm_batch as llm_batch
+from config.cassette import Cassette
+from config.llm import LLMClient
+from config.llm_batch import LLMBatch, LocalBatchServer
+from config.llm_cache import ResponseCache
+from config.llm_telemetry import get_telemetry, llm_context
+
+MODEL = "claude-sonnet-4-20250514"
+
+
+def batch_client(cache=None):
+    """An Anthropic LLMClient without API keys; batch requests never reach an SDK client"""
+    client = LLMClient.__new__(LLMClient)
+    client.model = MODEL
+    client.temperature = 0.0
+    client.max_tokens = 100
+    client.provider = "anthropic"
+    client.client = None
+    client.cache = cache
+    client._usage_lock = threading.Lock()
+    client._usage = {k: 0 for k in (
+        "calls", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"
+    )}
+    return client
+
+
+class CountingServer(LocalBatchServer):
+    """LocalBatchServer that remembers what was submitted and reports token usage"""
+
+    def __init__(self, responder=None, usage=None):
+        super().__init__(responder)
+        self.submitted = []
+        self.usage = usage
+
+    def submit(self, requests):
+        self.submitted.append([r["params"]["messages"][-1]["content"] for r in requests])
+        return super().submit(requests)
+
+    def results(self, batch_id):
+        return {custom_id: (text, self.usage if text else None)
+                for custom_id, (text, _) in super().results(batch_id).items()}
+
+
+@pytest.fixture
+def job():
+    job_id = "batch-test-job"
+    yield job_id
+    get_telemetry().clear(job_id)
+
+
+@pytest.fixture
+def cassette(monkeypatch):
+    """Cassette used by LLMBatch (off unless a test changes its mode)"""
+    def use(cassette):
+        monkeypatch.setattr(llm_batch, "get_cassette", lambda: cassette)
+        return cassette
+    return use
+
+
+def test_each_future_gets_its_own_reply(cassette, tmp_path):
+    cassette(Cassette(tmp_path, mode="off"))
+    server = CountingServer(lambda params: params["messages"][-1]["content"].upper())
+    batch = LLMBatch(batch_client(), server)
+
+    futures = {prompt: batch.add("system", prompt) for prompt in ("alpha", "beta", "gamma")}
+    assert len(batch) == 3 and not any(f.done() for f in futures.values())
+    batch.run(poll_interval=0)
+
+    assert {prompt: f.result() for prompt, f in futures.items()} == {
+        "alpha": "ALPHA", "beta": "BETA", "gamma": "GAMMA",
+    }
+    assert server.submitted == [["alpha", "beta", "gamma"]]
+
+
+def test_cached_requests_are_not_submitted_and_results_are_cached(cassette, tmp_path):
+    cassette(Cassette(tmp_path / "cassette", mode="off"))
+    cache = ResponseCache(cache_dir=tmp_path / "cache")
+    client = batch_client(cache)
+    cache.put(ResponseCache.make_key("anthropic", MODEL, 0.0, 100, "system", "cached"), "from cache")
+    server = CountingServer()
+
+    batch = LLMBatch(client, server)
+    cached = batch.add("system", "cached")
+    fresh = batch.add("system", "fresh")
+    assert cached.result() == "from cache"
+    batch.run(poll_interval=0)
+
+    assert fresh.result() == "fresh"
+    assert server.submitted == [["fresh"]]
+    # The batch result now answers the equivalent live call
+    assert cache.get(ResponseCache.make_key("anthropic", MODEL, 0.0, 100, "system", "fresh")) == "fresh"
+
+
+def test_replayed_requests_are_not_submitted(cassette, tmp_path):
+    recordings = cassette(Cassette(tmp_path, mode="replay"))
+    client = batch_client()
+    request = client._cassette_request("chat", "system", "recorded", 100, ())
+    recordings.save("llm", request, "recorded reply", 1.0, {"usage": {
+        "input_tokens": 7, "output_tokens": 3, "cache_read": 0, "cache_write": 0,
+    }})
+    server = CountingServer()
+
+    batch = LLMBatch(client, server)
+    future = batch.add("system", "recorded")
+
+    assert future.result() == "recorded reply"
+    assert len(batch) == 0
+    batch.run(poll_interval=0)
+    assert server.submitted == []
+    assert client.usage_stats()["input_tokens"] == 7
+
+
+def test_recorded_batch_results_replay_as_chat_calls(cassette, tmp_path):
+    recordings = cassette(Cassette(tmp_path, mode="record"))
+    client = batch_client()
+    batch = LLMBatch(client, CountingServer())
+    batch.add("system", "prompt")
+    batch.run(poll_interval=0)
+
+    assert recordings.recorded == 1
+    assert recordings.load("llm", client._cassette_request("chat", "system", "prompt", 100, ()))["response"] == "prompt"
+
+
+def test_a_failed_entry_only_fails_its_own_future(cassette, tmp_path, job):
+    cassette(Cassette(tmp_path, mode="off"))
+
+    def responder(params):
+        prompt = params["messages"][-1]["content"]
+        if prompt == "bad":
+            raise RuntimeError("model refused")
+        return prompt
+
+    batch = LLMBatch(batch_client(), CountingServer(responder))
+    with llm_context(job_id=job):
+        futures = [batch.add("system", prompt) for prompt in ("good", "bad", "also good")]
+    batch.run(poll_interval=0)
+
+    assert [f.result() for f in futures] == ["good", "", "also good"]
+    assert [r["success"] for r in get_telemetry().records(job)] == [True, False, True]
+
+
+def test_a_failed_batch_fails_every_future(cassette, tmp_path):
+    cassette(Cassette(tmp_path, mode="off"))
+
+    class BrokenServer(LocalBatchServer):
+        def results(self, batch_id):
+            raise ConnectionError("batch lost")
+
+    batch = LLMBatch(batch_client(), BrokenServer())
+    futures = [batch.add("system", prompt) for prompt in ("a", "b")]
+    with pytest.raises(ConnectionError):
+        batch.run(poll_interval=0)
+    assert all(isinstance(f.exception(), ConnectionError) for f in futures)
+
+
+def test_telemetry_records_batch_calls_at_the_discount(cassette, tmp_path, job):
+    cassette(Cassette(tmp_path, mode="off"))
+    usage = SimpleNamespace(input_tokens=1_000_000, output_tokens=1_000_000)
+    batch = LLMBatch(batch_client(), CountingServer(usage=usage))
+
+    # Calls are attributed to the job that queued them, not the one running the batch
+    with llm_context(job_id=job, stage="codegen"):
+        batch.add("system", "prompt")
+    batch.run(poll_interval=0)
+
+    [record] = get_telemetry().records(job)
+    assert record["mode"] == "batch"
+    assert record["stage"] == "codegen"
+    assert not record["response_cached"]
+    assert record["input_tokens"] == 1_000_000 and record["output_tokens"] == 1_000_000
+    # Half of the live price of 1M input ($3) plus 1M output ($15) tokens
+    assert record["cost_usd"] == pytest.approx(9.0)
+
+
+def test_prompt_improver_batches_each_round(cassette, tmp_path, monkeypatch):
+    import utils.iterative_scene_generator as improver_module
+
+    cassette(Cassette(tmp_path, mode="off"))
+    server = CountingServer(lambda params: "ADDITION: use raw strings"
+                            if "failed to render" in params["messages"][-1]["content"]
+                            else "'''class Ok(Scene): pass'''")
+    client = batch_client()
+    client.batch = lambda backend=None: LLMBatch(client, server)
+    monkeypatch.setattr(improver_module, "improver_llm", lambda: client)
+
+    improver = improver_module.PromptImprover.__new__(improver_module.PromptImprover)
+    improver.max_iterations = 3
+    improver.current_prompt = "prompt"
+    improver.improvement_log = []
+    improver.topic_results = {}
+    improver.save_prompt_version = lambda *args: None
+    improver.code_prompts = lambda scene: ("system", f"code for {scene}")
+
+    def start_topic(topic):
+        improver.topic_results[topic] = {"attempts": 0, "success": False, "final_attempt": None,
+                                         "errors_encountered": []}
+        return topic
+
+    rounds_to_pass = {"a": 1, "b": 2}
+
+    def try_code(topic, attempt, code, scene):
+        if attempt >= rounds_to_pass[topic]:
+            improver.topic_results[topic]["success"] = True
+            return None
+        return {"topic": topic, "attempt": attempt, "scene_description": scene,
+                "failed_code": code, "error_message": "boom"}
+
+    improver.start_topic = start_topic
+    improver.try_code = try_code
+
+    assert improver.process_topics_in_rounds(["a", "b"]) == 2
+    # Round 1: both drafts, then one analysis; round 2: only the unfinished topic
+    assert [len(submitted) for submitted in server.submitted] == [2, 1, 1]
+    assert improver.current_prompt.endswith("use raw strings")
@@ -0,0 +1,175 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config.llm_cache import ResponseCache
+
+KEY_FIELDS = dict(provider="anthropic", model="claude-sonnet-4-20250514", temperature=0.3, max_tokens=8000,
+                  system_prompt="system", user_prompt="user")
+
+
+def make_cache(tmp_path, max_bytes=10 ** 9):
+    return ResponseCache(cache_dir=tmp_path / "llm", max_bytes=max_bytes)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_key_covers_every_field_that_changes_the_completion():
+    base = ResponseCache.make_key(**KEY_FIELDS)
+    assert ResponseCache.make_key(**KEY_FIELDS) == base
+    for field, value in [("provider", "openai"), ("model", "claude-3-5-haiku-20241022"), ("temperature", 0.7),
+                         ("max_tokens", 4000), ("system_prompt", "other system"), ("user_prompt", "other user")]:
+        assert ResponseCache.make_key(**{**KEY_FIELDS, field: value}) != base, field
+    assert ResponseCache.make_key(**KEY_FIELDS, variant="stream") != base
+
+
+def test_key_does_not_run_fields_together():
+    joined = ResponseCache.make_key(**{**KEY_FIELDS, "system_prompt": "ab", "user_prompt": "c"})
+    assert ResponseCache.make_key(**{**KEY_FIELDS, "system_prompt": "a", "user_prompt": "bc"}) != joined
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+    compute = lambda: calls.append(1) or "reply"
+
+    assert cache.get_or_compute("key", compute) == "reply"
+    assert cache.get_or_compute("key", compute) == "reply"
+    assert cache.get_or_compute("other", compute) == "reply"
+
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["coalesced"]) == (1, 2, 0)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert stats["entries"] == 2
+
+
+def test_empty_replies_are_not_stored(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get_or_compute("key", lambda: "") == ""
+    assert cache.get("key") is None
+    assert cache.get_or_compute("key", lambda: "second try") == "second try"
+
+
+def test_concurrent_identical_requests_compute_once(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "reply"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_compute, "key", compute) for _ in range(8)]
+        # Let every thread reach the cache before the leader's request returns
+        wait_for(lambda: cache.stats()["coalesced"] == 7)
+        release.set()
+        replies = [f.result() for f in futures]
+
+    assert replies == ["reply"] * 8
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"]) == (1, 7)
+
+
+def test_a_failed_compute_reaches_every_waiter_and_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise RuntimeError("provider down")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(cache.get_or_compute, "key", compute) for _ in range(3)]
+        wait_for(lambda: cache.stats()["coalesced"] == 2)
+        release.set()
+        assert all(isinstance(f.exception(), RuntimeError) for f in futures)
+
+    assert cache.get_or_compute("key", lambda: "recovered") == "recovered"
+
+
+def test_eviction_keeps_the_newest_entries_under_max_bytes(tmp_path):
+    probe = make_cache(tmp_path / "probe")
+    probe.put("k0", "x" * 100)
+    entry_bytes = probe.stats()["bytes"]
+
+    cache = make_cache(tmp_path, max_bytes=entry_bytes * 3)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 100)
+
+    assert [cache.get(f"k{i}") is not None for i in range(5)] == [False, False, True, True, True]
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert len(list((tmp_path / "llm").glob("*.json"))) == 3
+
+
+def test_reads_refresh_recency(tmp_path):
+    probe = make_cache(tmp_path / "probe")
+    probe.put("k0", "x" * 100)
+    cache = make_cache(tmp_path, max_bytes=probe.stats()["bytes"] * 2)
+
+    cache.put("old", "x" * 100)
+    cache.put("new", "x" * 100)
+    cache.get("old")
+    cache.put("newest", "x" * 100)
+
+    assert cache.get("old") is not None
+    assert cache.get("new") is None
+    assert cache.get("newest") is not None
+
+
+def test_entries_survive_a_new_cache_instance(tmp_path):
+    make_cache(tmp_path).put("key", "persisted reply")
+    reopened = make_cache(tmp_path)
+    assert reopened.get("key") == "persisted reply"
+    assert reopened.stats()["entries"] == 1
+
+
+def test_client_calls_with_other_sampling_settings_miss(tmp_path):
+    pytest.importorskip("anthropic")
+    pytest.importorskip("openai")
+    from types import SimpleNamespace
+    from config.llm import LLMClient
+    from config.llm_governor import RateGovernor
+    from config.llm_retry import LatencyTracker
+
+    sent = []
+
+    def create(**request):
+        sent.append((request["temperature"], request["max_tokens"]))
+        return SimpleNamespace(content=[SimpleNamespace(text="reply")], usage=None)
+
+    cache = make_cache(tmp_path)
+
+    def client(temperature):
+        c = LLMClient.__new__(LLMClient)
+        c.model, c.temperature, c.max_tokens, c.provider = "test-model", temperature, 100, "anthropic"
+        c.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        c.cache = cache
+        c.governor = RateGovernor("test")
+        c.latency = LatencyTracker()
+        c._usage_lock = threading.Lock()
+        c._usage = {k: 0 for k in (
+            "calls", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"
+        )}
+        return c
+
+    cold, warm = client(0.0), client(0.7)
+    cold.chat("system", "user")
+    cold.chat("system", "user")
+    warm.chat("system", "user")
+    cold.chat("system", "user", max_tokens=50)
+
+    assert sent == [(0.0, 100), (0.7, 100), (0.0, 50)]
+    assert cache.stats()["hits"] == 1
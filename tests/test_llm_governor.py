@@ -0,0 +1,92 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from config.llm_governor import (
+    MIN_BACKOFF_SECONDS, MIN_RATE_SCALE, RATE_RECOVERY_STEP,
+    RateGovernor, TokenBucket, estimate_tokens, is_rate_limit_error, retry_after_seconds,
+)
+
+
+def test_bucket_refills_at_its_rate():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    bucket.refill(bucket.updated_at + 30)
+    assert bucket.tokens == pytest.approx(30)
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_bucket_never_overfills_and_admits_oversized_requests():
+    bucket = TokenBucket(60)
+    bucket.refill(bucket.updated_at + 3600)
+    assert bucket.tokens == 60
+    # More than the whole bucket is admitted once it is full
+    assert bucket.wait_time(1000) == 0.0
+    bucket.take(1000)
+    assert bucket.tokens == 0
+
+
+def test_reduced_rate_scale_slows_refills():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1, scale=0.5) == pytest.approx(2.0)
+
+
+def test_rate_limits_halve_the_rate_and_successes_recover_it():
+    governor = RateGovernor("test", max_in_flight=1)
+    before = time.monotonic()
+    governor.report_rate_limited()
+    assert governor.rate_scale == 0.5
+    assert governor.paused_until >= before + MIN_BACKOFF_SECONDS
+    governor.report_rate_limited(retry_after=30)
+    assert governor.rate_scale == 0.25
+    assert governor.paused_until >= before + 30
+
+    for _ in range(20):
+        governor.report_rate_limited()
+    assert governor.rate_scale == MIN_RATE_SCALE
+
+    governor.report_success()
+    assert governor.consecutive_limits == 0
+    assert governor.rate_scale == pytest.approx(MIN_RATE_SCALE + RATE_RECOVERY_STEP)
+
+
+def test_in_flight_calls_are_capped():
+    governor = RateGovernor("test", requests_per_minute=1000, tokens_per_minute=10 ** 6, max_in_flight=1)
+    governor.acquire(10)
+    admitted = threading.Event()
+
+    def second_call():
+        with governor.slot(10):
+            admitted.set()
+
+    thread = threading.Thread(target=second_call)
+    thread.start()
+    assert not admitted.wait(0.2)
+    assert governor.stats()["queued"] == 1
+    governor.release()
+    assert admitted.wait(2)
+    thread.join()
+    assert governor.stats()["admitted"] == 2
+    assert governor.stats()["in_flight"] == 0
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 40, "b" * 40) == 20
+
+
+def test_rate_limit_errors_are_recognized():
+    assert is_rate_limit_error(SimpleNamespace(status_code=429))
+    assert is_rate_limit_error(Exception("Overloaded, try again"))
+    assert not is_rate_limit_error(ValueError("bad request"))
+
+
+def test_retry_after_header():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "7"}))
+    assert retry_after_seconds(error) == 7.0
+    assert retry_after_seconds(SimpleNamespace(response=SimpleNamespace(headers={}))) is None
+    assert retry_after_seconds(ValueError()) is None
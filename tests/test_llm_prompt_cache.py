@@ -0,0 +1,87 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+
+from config.llm import LLMClient
+from config.llm_governor import RateGovernor
+from config.llm_retry import LatencyTracker
+
+KNOWLEDGE = "How to use manim: ..."
+TASK = "Write one Scene subclass."
+
+
+class FakeSDK:
+    """Answers Anthropic and OpenAI create calls, keeping each request's kwargs"""
+
+    def __init__(self):
+        self.requests = []
+        self.messages = SimpleNamespace(create=self.create_message)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_completion))
+
+    def create_message(self, **request):
+        self.requests.append(request)
+        usage = SimpleNamespace(input_tokens=10, output_tokens=5, cache_read_input_tokens=8,
+                                cache_creation_input_tokens=0)
+        return SimpleNamespace(content=[SimpleNamespace(text="reply")], usage=usage)
+
+    def create_completion(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="reply"))], usage=None)
+
+
+def client_with(provider, sdk):
+    client = LLMClient.__new__(LLMClient)
+    client.model = "test-model"
+    client.temperature = 0.0
+    client.max_tokens = 100
+    client.provider = provider
+    client.client = sdk
+    client.cache = None
+    client.governor = RateGovernor("test")
+    client.latency = LatencyTracker()
+    client._usage_lock = threading.Lock()
+    client._usage = {k: 0 for k in (
+        "calls", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"
+    )}
+    return client
+
+
+def test_cached_blocks_get_breakpoints_ahead_of_the_uncached_prompt():
+    sdk = FakeSDK()
+    client = client_with("anthropic", sdk)
+    assert client.chat("Selected knowledge for this scene", "Draw a circle", cached_system=[KNOWLEDGE, TASK]) == "reply"
+
+    [request] = sdk.requests
+    assert request["system"] == [
+        {"type": "text", "text": KNOWLEDGE, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": TASK, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "Selected knowledge for this scene"},
+    ]
+    assert request["messages"] == [{"role": "user", "content": "Draw a circle"}]
+    assert client.usage_stats()["cache_read_input_tokens"] == 8
+
+
+def test_without_cached_blocks_the_system_prompt_is_a_plain_string():
+    sdk = FakeSDK()
+    client_with("anthropic", sdk).chat("You write Manim code.", "Draw a circle")
+    assert sdk.requests[0]["system"] == "You write Manim code."
+
+
+def test_only_the_last_four_blocks_get_breakpoints():
+    sdk = FakeSDK()
+    blocks = [f"block {i}" for i in range(6)]
+    client_with("anthropic", sdk).chat("", "Draw a circle", cached_system=blocks)
+
+    system = sdk.requests[0]["system"]
+    assert [block["text"] for block in system] == blocks
+    assert ["cache_control" in block for block in system] == [False, False, True, True, True, True]
+
+
+def test_openai_gets_the_blocks_as_one_system_message():
+    sdk = FakeSDK()
+    client_with("openai", sdk).chat("Selected knowledge", "Draw a circle", cached_system=[KNOWLEDGE, TASK])
+    assert sdk.requests[0]["messages"][0] == {"role": "system", "content": KNOWLEDGE + TASK + "Selected knowledge"}
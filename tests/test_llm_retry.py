@@ -0,0 +1,71 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from config.llm_retry import LatencyTracker, backoff_delay, is_retryable_error, run_hedged
+from config.settings import LLM_HEDGE_MIN_SAMPLES
+
+
+def test_transient_errors_are_retried():
+    assert is_retryable_error(TimeoutError())
+    assert is_retryable_error(httpx.ConnectError("refused"))
+    for status in (429, 500, 503, 529):
+        assert is_retryable_error(SimpleNamespace(status_code=status))
+    assert is_retryable_error(Exception("Overloaded"))
+
+
+def test_client_errors_are_fatal():
+    for status in (400, 401, 403, 404):
+        assert not is_retryable_error(SimpleNamespace(status_code=status))
+    assert not is_retryable_error(ValueError("bad prompt"))
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    for attempt in range(10):
+        delays = [backoff_delay(attempt, base=1.0, cap=8.0) for _ in range(50)]
+        assert all(0 <= d <= min(8.0, 2 ** attempt) for d in delays)
+    assert max(backoff_delay(5, base=1.0, cap=8.0) for _ in range(200)) > 4.0
+
+
+def test_latency_percentile_needs_enough_samples():
+    tracker = LatencyTracker()
+    for i in range(LLM_HEDGE_MIN_SAMPLES - 1):
+        tracker.record(float(i))
+    assert tracker.percentile(0.5) is None
+    tracker.record(float(LLM_HEDGE_MIN_SAMPLES - 1))
+    assert tracker.percentile(0.5) == float(LLM_HEDGE_MIN_SAMPLES // 2)
+
+
+def test_fast_calls_are_not_hedged():
+    calls = []
+    assert run_hedged(lambda: calls.append(1) or "done", delay=5) == "done"
+    assert calls == [1]
+
+
+def test_slow_calls_are_hedged_and_the_first_answer_wins():
+    first_call_released = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            first_call_released.wait(5)
+            return "slow"
+        return "fast"
+
+    try:
+        assert run_hedged(call, delay=0.05) == "fast"
+        assert len(calls) == 2
+    finally:
+        first_call_released.set()
+
+
+def test_hedged_errors_are_raised_when_every_request_fails():
+    def call():
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        run_hedged(call, delay=0.01)
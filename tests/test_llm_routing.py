@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from config.llm_routing import ModelCascade, ModelTier, classify_error
+
+NAME_ERROR = "Traceback (most recent call last):\nNameError: name 'Circel' is not defined"
+LATEX_ERROR = "ValueError: latex error converting to dvi. See log output above or the log file: x.log"
+
+
+def cascade(names=("cheap", "strong"), cheap_attempts=2) -> ModelCascade:
+    tiers = [ModelTier(name, SimpleNamespace(model=f"{name}-model")) for name in names]
+    return ModelCascade(tiers, cheap_attempts=cheap_attempts)
+
+
+def test_errors_are_classified():
+    assert classify_error(NAME_ERROR) == "name"
+    assert classify_error(LATEX_ERROR) == "latex"
+    assert classify_error("line 7: [polygon-get-corner] Triangle has no get_corner") == "attribute"
+    assert classify_error("Render process timed out after 5 minutes") == "timeout"
+    assert classify_error("") == "other"
+
+
+def test_simple_errors_start_on_the_cheapest_tier():
+    routing = cascade()
+    cheap, strong = routing.tiers
+    assert routing.choose(0, NAME_ERROR) is cheap
+    assert routing.choose(1, NAME_ERROR) is cheap
+    # Once the cheap attempts are used up, or for harder errors, the strongest tier answers
+    assert routing.choose(2, NAME_ERROR) is strong
+    assert routing.choose(0, LATEX_ERROR) is strong
+    assert routing.choose(0, "something unrecognised") is strong
+
+
+def test_escalation_climbs_one_tier_at_a_time_and_stops_at_the_top():
+    routing = cascade(("small", "medium", "large"))
+    small, medium, large = routing.tiers
+    assert routing.escalate(small) is medium
+    assert routing.escalate(medium) is large
+    assert routing.escalate(large) is None
+
+    single = cascade(("only",))
+    assert single.escalate(single.tiers[0]) is None
+
+
+def test_a_cascade_needs_a_tier():
+    with pytest.raises(ValueError):
+        ModelCascade([])
+
+
+def test_report_records_success_latency_and_error_class():
+    routing = cascade()
+    cheap, strong = routing.tiers
+    routing.report(cheap, True, 1.0, NAME_ERROR)
+    routing.report(cheap, False, 3.0, NAME_ERROR)
+    routing.report(cheap, True, 2.0, "line 3: [syntax] invalid syntax")
+
+    stats = routing.stats()
+    assert stats["cheap"] == {
+        "model": "cheap-model",
+        "calls": 3,
+        "successes": 2,
+        "success_rate": pytest.approx(2 / 3),
+        "mean_latency_seconds": 2.0,
+        "by_error_class": {"name": {"calls": 2, "successes": 1}, "syntax": {"calls": 1, "successes": 1}},
+    }
+    assert stats["strong"]["calls"] == 0
+    assert stats["strong"]["mean_latency_seconds"] is None
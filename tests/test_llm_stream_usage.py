@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+
+from config.llm import LLMClient
+from config.llm_governor import estimate_tokens
+from config.llm_telemetry import track_call
+
+
+def client_with(provider, sdk_client):
+    """An LLMClient around a fake SDK client, without API keys or caches"""
+    import threading
+    client = LLMClient.__new__(LLMClient)
+    client.model = "test-model"
+    client.temperature = 0.0
+    client.max_tokens = 100
+    client.provider = provider
+    client.client = sdk_client
+    client.cache = None
+    client._usage_lock = threading.Lock()
+    client._usage = {k: 0 for k in (
+        "calls", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"
+    )}
+    return client
+
+
+class FakeAnthropicStream:
+    def __init__(self, events):
+        self.events = events
+
+    def __enter__(self):
+        return iter(self.events)
+
+    def __exit__(self, *exc):
+        return False
+
+
+def anthropic_events(chunks):
+    usage = SimpleNamespace(input_tokens=50, output_tokens=1)
+    events = [SimpleNamespace(type="message_start", message=SimpleNamespace(usage=usage))]
+    events += [SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=c)) for c in chunks]
+    events.append(SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=999)))
+    return events
+
+
+def test_anthropic_stream_stopped_early_estimates_output_tokens():
+    chunks = ["```python\n", "x = 1\n" * 40, "```", "explanation " * 100]
+    sdk = SimpleNamespace(messages=SimpleNamespace(stream=lambda **kw: FakeAnthropicStream(anthropic_events(chunks))))
+    client = client_with("anthropic", sdk)
+
+    with track_call("anthropic", "test-model", "stream") as record:
+        text = client._stream_anthropic("system", "user", lambda received: received.endswith("```"), 100, ())
+
+    assert text.endswith("```")
+    assert record.usage_estimated
+    assert record.input_tokens == 50
+    assert record.output_tokens == estimate_tokens("".join(chunks[:3]))
+
+
+def test_anthropic_stream_read_to_the_end_uses_reported_usage():
+    chunks = ["hello ", "world"]
+    sdk = SimpleNamespace(messages=SimpleNamespace(stream=lambda **kw: FakeAnthropicStream(anthropic_events(chunks))))
+    client = client_with("anthropic", sdk)
+
+    with track_call("anthropic", "test-model", "stream") as record:
+        client._stream_anthropic("system", "user", None, 100, ())
+
+    assert not record.usage_estimated
+    assert record.output_tokens == 999
+
+
+def test_openai_stream_stopped_early_estimates_usage():
+    def chunk(text):
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    class FakeStream:
+        def __iter__(self):
+            yield from [chunk("```python\nx = 1\n"), chunk("```"), chunk("more text")]
+            yield SimpleNamespace(usage=SimpleNamespace(prompt_tokens=50, completion_tokens=999), choices=[])
+
+        def close(self):
+            pass
+
+    sdk = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: FakeStream())))
+    client = client_with("openai", sdk)
+
+    with track_call("openai", "test-model", "stream") as record:
+        client._stream_openai("system prompt", "user prompt", lambda received: received.endswith("```"), 100, ())
+
+    assert record.usage_estimated
+    assert record.input_tokens == estimate_tokens("", "system prompt", "user prompt")
+    assert record.output_tokens == estimate_tokens("```python\nx = 1\n```")
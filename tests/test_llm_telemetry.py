@@ -0,0 +1,66 @@
+import pytest
+
+from config.llm_telemetry import (
+    CallRecord, Telemetry, add_usage, current_call, get_telemetry, llm_context, mark_attempt, track_call,
+)
+
+
+@pytest.fixture
+def job():
+    job_id = "telemetry-test-job"
+    yield job_id
+    get_telemetry().clear(job_id)
+
+
+def test_cost_uses_model_prices_and_the_batch_discount():
+    record = CallRecord("anthropic", "claude-sonnet-4-20250514", "chat",
+                        input_tokens=1_000_000, output_tokens=1_000_000)
+    assert record.cost_usd == pytest.approx(18.0)
+    record.mode = "batch"
+    assert record.cost_usd == pytest.approx(9.0)
+    assert CallRecord("openai", "unknown-model", "chat").cost_usd is None
+
+
+def test_context_attributes_calls_to_job_and_stage(job):
+    with llm_context(job_id=job, stage="script"):
+        with track_call("anthropic", "claude-sonnet-4-20250514", "chat") as record:
+            assert current_call() is record
+            mark_attempt(0)
+            add_usage(100, 20, 0, 0)
+            record.success = True
+        with llm_context(stage="codegen"), track_call("openai", "gpt-4o", "stream"):
+            mark_attempt(0)
+            mark_attempt(1)
+    assert current_call() is None
+
+    summary = get_telemetry().summary(job)
+    assert summary["calls"] == 2
+    assert summary["failed_calls"] == 1
+    assert summary["retries"] == 1
+    assert summary["response_cache_hits"] == 0
+    assert summary["input_tokens"] == 100
+    assert set(summary["stages"]) == {"script", "codegen"}
+    assert summary["stages"]["script"]["output_tokens"] == 20
+
+
+def test_calls_without_a_request_count_as_cache_hits(job):
+    with llm_context(job_id=job), track_call("openai", "gpt-4o", "chat") as record:
+        record.success = True
+    assert get_telemetry().summary(job)["response_cache_hits"] == 1
+
+
+def test_counters_are_kept_per_job(job):
+    telemetry = get_telemetry()
+    with llm_context(job_id=job):
+        telemetry.count("render_cache_hits")
+        telemetry.count("render_cache_hits", 2)
+    assert telemetry.counters(job) == {"render_cache_hits": 3}
+    telemetry.clear(job)
+    assert telemetry.counters(job) == {}
+
+
+def test_only_the_most_recent_records_are_kept():
+    telemetry = Telemetry(max_records=2)
+    for model in ("a", "b", "c"):
+        telemetry.record(CallRecord("openai", model, "chat"))
+    assert [r["model"] for r in telemetry.records()] == ["b", "c"]
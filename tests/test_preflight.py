@@ -0,0 +1,83 @@
+import pytest
+
+from backend import preflight
+from backend.preflight import check_manim_code, format_diagnostics
+
+MANIM_NAMES = frozenset({"Scene", "Circle", "Square", "Triangle", "Polygon", "Create", "MathTex", "UP", "UL"})
+
+
+@pytest.fixture(autouse=True)
+def manim_exports(monkeypatch):
+    """Pretend manim exports MANIM_NAMES, so no worker or subprocess imports it"""
+    monkeypatch.setitem(preflight._exports, "manim", MANIM_NAMES)
+
+
+def scene(body):
+    lines = "\n".join("        " + line for line in body.splitlines())
+    return f"from manim import *\n\nclass Demo(Scene):\n    def construct(self):\n{lines}\n"
+
+
+def rules(code):
+    return [d.rule for d in check_manim_code(code)]
+
+
+def test_valid_scene_passes():
+    assert check_manim_code(scene("circle = Circle()\nself.play(Create(circle))")) == []
+
+
+def test_syntax_error():
+    diagnostics = check_manim_code(scene("self.play(Create(Circle())"))
+    assert [d.rule for d in diagnostics] == ["syntax"]
+
+
+def test_missing_scene_and_construct():
+    assert rules("from manim import *\nx = Circle()\n") == ["no-scene"]
+    assert rules("from manim import *\n\nclass Demo(Scene):\n    pass\n") == ["no-construct"]
+
+
+def test_unknown_name_suggests_a_close_match():
+    diagnostics = check_manim_code(scene("self.play(Create(Circel()))"))
+    assert [d.rule for d in diagnostics] == ["unknown-name"]
+    assert "did you mean 'Circle'" in diagnostics[0].message
+    assert diagnostics[0].line == 5
+
+
+def test_locally_bound_names_are_known():
+    code = scene("for i in range(3):\n    sq = Square()\nlabel = MathTex('x')\nlabel.next_to(sq, UP)")
+    assert check_manim_code(code) == []
+
+
+def test_module_dunders_are_known():
+    code = scene("path = __file__\nlabel = MathTex(__name__)")
+    assert check_manim_code(code) == []
+
+
+def test_match_captures_are_known():
+    code = scene(
+        "match {'shape': [1, 2, 3], 'color': 'red'}:\n"
+        "    case {'shape': [first, *others], **style}:\n"
+        "        MathTex(first, others, style)\n"
+        "    case [Circle() as ring]:\n"
+        "        self.play(Create(ring))\n"
+        "    case picked:\n"
+        "        self.play(Create(picked))"
+    )
+    assert check_manim_code(code) == []
+
+
+def test_unknown_star_import_disables_name_checks(monkeypatch):
+    monkeypatch.setattr(preflight, "_resolve_exports", lambda module_name: None)
+    code = "from mystery import *\n" + scene("self.play(Wiggle(Thing()))")
+    assert check_manim_code(code) == []
+
+
+def test_get_corner_on_polygons():
+    code = scene("tri = Triangle()\ntri.get_corner(UL)\nsq = Square()\nsq.get_corner(UL)\nPolygon().get_corner(UL)")
+    diagnostics = check_manim_code(code)
+    assert [(d.rule, d.line) for d in diagnostics] == [("polygon-get-corner", 6), ("polygon-get-corner", 9)]
+
+
+def test_format_diagnostics_lists_every_problem():
+    message = format_diagnostics(check_manim_code(scene("self.play(Create(Circel()))")))
+    assert message.startswith("Static pre-flight check failed")
+    assert "line 5: [unknown-name]" in message
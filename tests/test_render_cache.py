@@ -0,0 +1,88 @@
+import os
+
+from backend.render_cache import RenderCache, job_render_cache_stats, tex_template_id
+from config.llm_telemetry import llm_context
+from config.render_quality import FINAL_TIER, get_tier
+
+
+def make_cache(tmp_path, max_bytes=10 ** 9):
+    return RenderCache(cache_dir=tmp_path / "cache", max_bytes=max_bytes)
+
+
+def test_rendering_over_a_fetched_video_leaves_the_cache_entry_intact(tmp_path):
+    cache = make_cache(tmp_path)
+    rendered = tmp_path / "render.mp4"
+    rendered.write_bytes(b"first video")
+    cache.store("key", rendered)
+
+    dest = tmp_path / "media" / "videos" / "scene_1" / "1080p60" / "scene_1.mp4"
+    assert cache.fetch("key", dest)
+    assert dest.read_bytes() == b"first video"
+
+    # A later render of different code writes to the same path in place
+    with open(dest, "r+b") as f:
+        f.truncate(0)
+        f.write(b"second video")
+
+    assert (tmp_path / "cache" / "key.mp4").read_bytes() == b"first video"
+
+
+def test_key_covers_everything_that_changes_the_video():
+    key = RenderCache.make_key("code", "Demo", FINAL_TIER)
+    assert key == RenderCache.make_key("code", "Demo", FINAL_TIER, "default")
+    assert key != RenderCache.make_key("code ", "Demo", FINAL_TIER)
+    assert key != RenderCache.make_key("code", "Other", FINAL_TIER)
+    assert key != RenderCache.make_key("code", "Demo", get_tier("preview"))
+    assert key != RenderCache.make_key("code", "Demo", FINAL_TIER, "custom-template")
+
+
+def test_tex_template_id_follows_manim_cfg(tmp_path):
+    assert tex_template_id(tmp_path) == "default"
+    (tmp_path / "manim.cfg").write_text("[CLI]\ntex_template_file = custom.tex\n")
+    assert tex_template_id(tmp_path) != "default"
+
+
+def test_fetch_miss_and_hit_are_counted(tmp_path):
+    cache = make_cache(tmp_path)
+    dest = tmp_path / "out.mp4"
+    assert not cache.fetch("key", dest)
+    assert not dest.exists()
+
+    rendered = tmp_path / "render.mp4"
+    rendered.write_bytes(b"video")
+    cache.store("key", rendered)
+    assert cache.fetch("key", dest)
+    assert dest.read_bytes() == b"video"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stored"]) == (1, 1, 1)
+    assert stats["size_bytes"] == len(b"video")
+
+
+def test_store_ignores_missing_videos(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store("key", tmp_path / "missing.mp4")
+    assert cache.stats()["stored"] == 0
+
+
+def test_least_recently_used_videos_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=20)
+    rendered = tmp_path / "render.mp4"
+    for i, key in enumerate(["a", "b"]):
+        rendered.write_bytes(b"x" * 10)
+        cache.store(key, rendered)
+        os.utime(tmp_path / "cache" / f"{key}.mp4", (1000 + i, 1000 + i))
+
+    # A hit makes "a" the most recently used, so storing "c" evicts "b"
+    assert cache.fetch("a", tmp_path / "out.mp4")
+    cache.store("c", rendered)
+
+    assert sorted(p.stem for p in (tmp_path / "cache").glob("*.mp4")) == ["a", "c"]
+    assert cache.stats()["evicted"] == 1
+
+
+def test_lookups_are_counted_per_job(tmp_path):
+    cache = make_cache(tmp_path)
+    with llm_context(job_id="render-cache-test-job"):
+        cache.fetch("key", tmp_path / "out.mp4")
+    assert job_render_cache_stats("render-cache-test-job") == {"hits": 0, "misses": 1, "hit_rate": 0.0}
@@ -0,0 +1,151 @@
+import contextlib
+import sys
+import types
+
+import pytest
+
+from backend import render_pool
+from backend.render_pool import RenderPool
+
+SCENE_FILE = """\
+from types import SimpleNamespace
+from manim import constructed
+
+
+class Demo:
+    def __init__(self, skip_animations=False):
+        constructed.append(skip_animations)
+        self.renderer = SimpleNamespace(time=0.0)
+
+    def render(self):
+        # Two 1.5s animations; the renderer clock advances whether or not they are drawn
+        self.renderer.time += 3.0
+"""
+
+
+@pytest.fixture
+def fake_manim(monkeypatch):
+    """A manim module with just what a worker's scene job touches"""
+    manim = types.ModuleType("manim")
+    manim.constructed = []
+    manim.configs = []
+
+    @contextlib.contextmanager
+    def tempconfig(overrides):
+        manim.configs.append(overrides)
+        yield
+
+    manim.tempconfig = tempconfig
+    monkeypatch.setitem(sys.modules, "manim", manim)
+    return manim
+
+
+def scene_job(pool_method, tmp_path, *args):
+    """The job a RenderPool method would send to a worker"""
+    (tmp_path / "scene_1.py").write_text(SCENE_FILE)
+    pool = RenderPool.__new__(RenderPool)
+    sent = []
+    pool._run = lambda job, timeout, counter, activity: sent.append(job) or (True, "", None)
+    getattr(pool, pool_method)(tmp_path / "scene_1.py", "Demo", tmp_path, *args)
+    return sent[0]
+
+
+def test_validate_jobs_skip_animations_and_report_the_duration(fake_manim, tmp_path):
+    job = scene_job("validate", tmp_path)
+    assert job["skip_animations"]
+    assert job["config"]["dry_run"]
+
+    status, error, duration, _ = render_pool._render_job(job, 1)
+
+    assert (status, error) == ("ok", "")
+    assert duration == 3.0
+    assert fake_manim.constructed == [True]
+    assert fake_manim.configs[0]["dry_run"]
+
+
+def test_render_jobs_draw_every_frame(fake_manim, tmp_path):
+    job = scene_job("render", tmp_path, "scene_1.mp4")
+    assert "dry_run" not in job["config"]
+
+    status, _, _, _ = render_pool._render_job(job, 1)
+
+    assert status == "ok"
+    assert fake_manim.constructed == [False]
+
+
+class StubWorker:
+    """RenderWorker without a process: reports ready (or not) and answers jobs with `reply`"""
+
+    ready = True
+    reply = ("ok", "", None, {})
+    started = []
+    stopped = []
+
+    def __init__(self, context):
+        self.alive = False
+        self.jobs = 0
+
+    def start(self):
+        self.alive = True
+        StubWorker.started.append(self)
+
+    def wait_ready(self, timeout):
+        if not self.ready:
+            raise render_pool.RenderPoolUnavailable("Render worker cannot import manim (ModuleNotFoundError)")
+
+    def run(self, job, timeout):
+        self.jobs += 1
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+    def stop(self, kill=False):
+        self.alive = False
+        StubWorker.stopped.append(kill)
+
+
+@pytest.fixture
+def stub_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(render_pool, "RenderWorker", StubWorker)
+    monkeypatch.setattr(render_pool, "ASSET_CACHE_ENABLED", False)
+    monkeypatch.setattr(StubWorker, "started", [])
+    monkeypatch.setattr(StubWorker, "stopped", [])
+    return RenderPool(size=1)
+
+
+def test_an_unavailable_pool_fails_fast_and_renders_fall_back_to_the_cli(stub_pool, monkeypatch, tmp_path):
+    import backend.generate_scenes as generate_scenes
+
+    monkeypatch.setattr(StubWorker, "ready", False)
+    with pytest.raises(render_pool.RenderPoolUnavailable):
+        stub_pool.render(tmp_path / "scene_1.py", "Demo", tmp_path, "scene_1.mp4")
+    assert "cannot import manim" in stub_pool.stats()["unavailable"]
+    assert StubWorker.stopped == [True]
+
+    # Later jobs are refused without waiting on a worker again
+    monkeypatch.setattr(StubWorker, "ready", True)
+    with pytest.raises(render_pool.RenderPoolUnavailable):
+        stub_pool.render(tmp_path / "scene_1.py", "Demo", tmp_path, "scene_1.mp4")
+
+    cli_renders = []
+    monkeypatch.setattr(generate_scenes, "get_render_pool", lambda: stub_pool)
+    monkeypatch.setattr(generate_scenes, "render_code_cli",
+                        lambda *args: cli_renders.append(args[1]) or (True, ""))
+    assert generate_scenes.render_code(tmp_path / "scene_1.py", "Demo", tmp_path, use_pool=True) == (True, "")
+    assert cli_renders == ["Demo"]
+
+
+def test_a_timed_out_job_fails_and_its_worker_is_replaced(stub_pool, monkeypatch, tmp_path):
+    monkeypatch.setattr(StubWorker, "reply", TimeoutError())
+    success, message = stub_pool.render(tmp_path / "scene_1.py", "Demo", tmp_path, "scene_1.mp4", timeout=2)
+
+    assert not success
+    assert message == "Render process timed out after 2 seconds"
+    assert StubWorker.stopped == [True]
+    [worker] = stub_pool._workers
+    assert StubWorker.started == [worker, worker]  # killed and started again
+
+    monkeypatch.setattr(StubWorker, "reply", ("ok", "", None, {}))
+    assert stub_pool.render(tmp_path / "scene_1.py", "Demo", tmp_path, "scene_1.mp4") == (True, "")
+    stats = stub_pool.stats()
+    assert (stats["timeouts"], stats["renders"], stats["failures"]) == (1, 1, 0)
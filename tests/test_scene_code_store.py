@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from backend.scene_code_store import SceneCodeStore
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path):
+    store = SceneCodeStore(tmp_path, max_entries=2)
+    store.put("first scene", "v1", "model", "code 1")
+    store.put("second scene", "v1", "model", "code 2")
+    os.utime(tmp_path / f"{store.make_key('first scene', 'v1', 'model')}.json", (1, 1))
+    os.utime(tmp_path / f"{store.make_key('second scene', 'v1', 'model')}.json", (2, 2))
+    store.put("third scene", "v1", "model", "code 3")
+
+    assert store.get("first scene", "v1", "model") is None
+    assert store.get("second scene", "v1", "model") == "code 2"
+    assert store.get("third scene", "v1", "model") == "code 3"
+
+
+def test_the_directory_is_only_scanned_over_the_limit(tmp_path):
+    SceneCodeStore(tmp_path).put("stored earlier", "v1", "model", "old code")
+    store = SceneCodeStore(tmp_path, max_entries=3)
+    scans = []
+    evict = store._evict
+    store._evict = lambda: scans.append(1) or evict()
+
+    store.put("a", "v1", "model", "code a")
+    store.put("a", "v1", "model", "code a, fixed")  # replaces its entry
+    store.put("b", "v1", "model", "code b")
+    store.discard("b", "v1", "model")
+    store.put("c", "v1", "model", "code c")
+    assert scans == []
+
+    store.put("d", "v1", "model", "code d")
+    assert scans == [1]
+    assert len(list(tmp_path.glob("*.json"))) == 3
+
+
+@pytest.fixture
+def prompt_files(tmp_path, monkeypatch):
+    """Codegen prompt and knowledge files in tmp_path, with every memoized prompt reset around the test"""
+    import backend.generate_scenes as generate_scenes
+    import backend.knowledge_index as knowledge_module
+    from config.registry import read_text
+
+    paths = {name: tmp_path / f"{name}.txt" for name in ("task", "manim", "math_tex")}
+    paths["task"].write_text("Write a Manim scene.")
+    paths["manim"].write_text("# Circles\nUse Circle().\n")
+    paths["math_tex"].write_text("Use raw strings for MathTex.\n")
+    for module in (generate_scenes, knowledge_module):
+        monkeypatch.setattr(module, "MANIM_KNOWLEDGE_PATH", paths["manim"])
+        monkeypatch.setattr(module, "MATH_TEX_KNOWLEDGE_PATH", paths["math_tex"])
+    monkeypatch.setattr(generate_scenes, "MANIM_PROMPT_PATH", paths["task"])
+    monkeypatch.setattr(generate_scenes, "CODEGEN_PROMPT_FILES", (paths["task"], paths["manim"], paths["math_tex"]))
+    monkeypatch.setattr(generate_scenes, "_prompt_version", None)
+    monkeypatch.setattr(generate_scenes, "SCENE_CODE_CACHE_ENABLED", True)
+    store = SceneCodeStore(tmp_path / "store")
+    monkeypatch.setattr(generate_scenes, "get_scene_code_store", lambda: store)
+
+    memoized = (read_text, generate_scenes.knowledge_prompt, generate_scenes.codegen_task_prompt,
+                knowledge_module.knowledge_index)
+    for cached in memoized:
+        cached.cache_clear()
+    yield paths
+    for cached in memoized:
+        cached.cache_clear()
+
+
+def test_editing_a_prompt_file_invalidates_stored_code(prompt_files):
+    import backend.generate_scenes as generate_scenes
+    from backend.generate_script import ConceptSegment
+
+    concept = ConceptSegment("A circle appears.", "Draw a circle")
+    version = generate_scenes.codegen_prompt_version()
+    generate_scenes.remember_scene_code(concept, "class Demo(Scene): pass")
+    assert generate_scenes.stored_scene_code(concept) == "class Demo(Scene): pass"
+    assert "Write a Manim scene." in generate_scenes.codegen_task_prompt()
+    generate_scenes.knowledge_prompt()
+    generate_scenes.knowledge_index()
+
+    prompt_files["task"].write_text("Write a Manim scene with labelled axes.")
+
+    assert generate_scenes.codegen_prompt_version() != version
+    assert generate_scenes.knowledge_prompt.cache_info().currsize == 0
+    assert generate_scenes.codegen_task_prompt.cache_info().currsize == 0
+    assert generate_scenes.knowledge_index.cache_info().currsize == 0
+    assert "labelled axes" in generate_scenes.codegen_task_prompt()
+    assert generate_scenes.stored_scene_code(concept) is None
+
+
+def test_editing_a_knowledge_file_invalidates_stored_code(prompt_files):
+    import backend.generate_scenes as generate_scenes
+    from backend.generate_script import ConceptSegment
+
+    concept = ConceptSegment("A circle appears.", "Draw a circle")
+    generate_scenes.remember_scene_code(concept, "class Demo(Scene): pass")
+    version = generate_scenes.codegen_prompt_version()
+
+    prompt_files["math_tex"].write_text("Use raw strings for MathTex, and double braces in f-strings.\n")
+
+    assert generate_scenes.codegen_prompt_version() != version
+    assert generate_scenes.stored_scene_code(concept) is None
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("anthropic")
+pytest.importorskip("openai")
+
+from backend.generate_script import script_prompts, structured_prompts
+from backend.solver_script_gen import PROBLEM_SOLVING_PROMPT_TEMPLATE
+
+
+def assert_no_markers(prompt, marker):
+    assert f"[NEW {marker}]" not in prompt
+    assert f"[END {marker}||" not in prompt
+
+
+def test_structured_concept_prompts_drop_the_markers():
+    system_prompt, user_prompt = script_prompts("derivatives", 5, 1, structured=True)
+    assert_no_markers(system_prompt, "CONCEPT")
+    assert "one entry of concepts" in system_prompt
+    assert "one entry of concepts" in user_prompt
+
+
+def test_marker_concept_prompts_keep_the_markers():
+    system_prompt, user_prompt = script_prompts("derivatives", 5, 1)
+    assert "[NEW CONCEPT]" in system_prompt
+    assert "[NEW CONCEPT]" in user_prompt
+
+
+def test_structured_solver_prompts_drop_the_markers():
+    system_prompt = PROBLEM_SOLVING_PROMPT_TEMPLATE.format(
+        problem="2x + 5 = 13", detail_level_desc="Standard level", duration_minutes=3,
+        expected_words=450, step_count=4, words_per_step=110
+    )
+    user_prompt = "Use [NEW STEP] and [END STEP|| Scene description: ...] markers for each solution step."
+    system_prompt, user_prompt = structured_prompts(system_prompt, user_prompt, "STEP", "steps")
+    assert_no_markers(system_prompt, "STEP")
+    assert "Return each step as one entry of steps" in system_prompt
+    assert "Scene description:" in system_prompt  # the example keeps its scene description
+    assert user_prompt.startswith("Instead of [NEW STEP]/[END STEP] markers, return each solution step")
+
+
+@pytest.mark.parametrize("stream, structured, expect_stream", [
+    (True, True, False),
+    (True, False, True),
+    (False, True, False),
+])
+def test_structured_scripts_take_precedence_over_streaming(monkeypatch, stream, structured, expect_stream):
+    import backend.video_generator as video_generator
+    from backend.generate_script import ConceptSegment, Script
+
+    calls = []
+    concept = ConceptSegment("narration", "scene")
+    monkeypatch.setattr(video_generator, "LLM_STREAM_SCRIPT", stream)
+    monkeypatch.setattr(video_generator, "LLM_STRUCTURED_SCRIPT", structured)
+    monkeypatch.setattr(video_generator, "stream_script", lambda **kw: calls.append("stream") or iter([concept]))
+    monkeypatch.setattr(video_generator, "generate_script",
+                        lambda **kw: calls.append("generate") or Script(kw["topic"], 1, 1, [concept]))
+    monkeypatch.setattr(video_generator, "create_perfectly_synced_video", lambda script, dry_run, stream: "video.mp4")
+
+    assert video_generator.make_perfectly_synchronized_video("topic", 1, 1) == "video.mp4"
+    assert calls == ["stream" if expect_stream else "generate"]
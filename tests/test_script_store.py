@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.script_store import ScriptStore, normalize_topic, jaccard
+
+
+def make_script(topic, duration=5, level=2):
+    """Stands in for backend.generate_script.Script (put only needs these)"""
+    data = {
+        "topic": topic, "duration_minutes": duration, "sophistication_level": level,
+        "concepts": [{"narration": "n", "scene_description": "d", "target_seconds": None}],
+    }
+    return SimpleNamespace(topic=topic, duration_minutes=duration, sophistication_level=level,
+                           concepts=data["concepts"], to_dict=lambda: data)
+
+
+def test_normalize_topic_drops_filler_and_plurals():
+    assert normalize_topic("What is a derivative?") == normalize_topic("explain derivatives")
+
+
+def test_normalize_topic_keeps_math_whole():
+    assert normalize_topic("x ^ 2") == normalize_topic("x^2")
+    assert normalize_topic("x^2") != normalize_topic("x^3")
+
+
+def test_jaccard():
+    assert jaccard(frozenset("ab"), frozenset("ab")) == 1.0
+    assert jaccard(frozenset("ab"), frozenset("bc")) == pytest.approx(1 / 3)
+
+
+def test_exact_and_reordered_matches(tmp_path):
+    store = ScriptStore(tmp_path)
+    store.put(make_script("derivative of sine"))
+    assert store.find("Derivatives of sine", 5, 2)[1] is True
+    assert store.find("sine derivative", 5, 2)[1] is False
+    assert store.find("cosine derivative", 5, 2) is None
+    assert store.find("sine derivative", 10, 2) is None
+
+
+def test_near_match_disabled(tmp_path):
+    store = ScriptStore(tmp_path, near_match=False)
+    store.put(make_script("derivative of sine"))
+    assert store.find("sine derivative", 5, 2) is None
+
+
+def test_jaccard_threshold_accepts_overlapping_topics(tmp_path):
+    store = ScriptStore(tmp_path, min_jaccard=0.6)
+    store.put(make_script("chain rule"))
+    store.put(make_script("chain rule for derivatives"))
+    key, exact = store.find("chain rule derivatives calculus", 5, 2)
+    assert not exact
+    assert key == ScriptStore.make_key(normalize_topic("chain rule for derivatives"), 5, 2)
+    assert store.find("product rule", 5, 2) is None
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    ScriptStore(tmp_path).put(make_script("fourier series"))
+    assert ScriptStore(tmp_path).find("fourier series", 5, 2)[1] is True
+
+
+def test_oldest_entries_are_evicted(tmp_path):
+    store = ScriptStore(tmp_path, max_entries=2)
+    for topic in ("limits", "integrals", "vectors"):
+        store.put(make_script(topic))
+    assert store.find("limits", 5, 2) is None
+    assert store.find("vectors", 5, 2) is not None
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_get_returns_the_stored_script(tmp_path):
+    pytest.importorskip("dotenv")
+    pytest.importorskip("anthropic")
+    pytest.importorskip("openai")
+    store = ScriptStore(tmp_path)
+    store.put(make_script("derivative of sine"))
+    script = store.get("sine derivative", 5, 2)
+    assert script.topic == "derivative of sine"
+    assert store.get("matrices", 5, 2) is None
+    assert store.stats()["near_hits"] == 1 and store.stats()["misses"] == 1
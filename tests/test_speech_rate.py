@@ -0,0 +1,49 @@
+import json
+
+from backend.speech_rate import SpeechRates
+
+
+def test_rates_fall_back_to_the_default_until_calibrated(tmp_path):
+    rates = SpeechRates(tmp_path / "rates.jsonl", min_samples=2)
+    assert rates.words_per_minute("alloy", "tts-1", 150.0) == 150.0
+    assert rates.record("alloy", "tts-1", "one two three four five six", 2.0)
+    assert rates.words_per_minute("alloy", "tts-1", 150.0) == 150.0
+    assert rates.record("alloy", "tts-1", "one two three four five six", 2.0)
+    assert rates.words_per_minute("alloy", "tts-1", 150.0) == 180.0
+
+
+def test_implausible_chunks_are_rejected(tmp_path):
+    rates = SpeechRates(tmp_path / "rates.jsonl", min_samples=1)
+    assert not rates.record("alloy", "tts-1", "word", 30.0)
+    assert not rates.record("alloy", "tts-1", "", 1.0)
+    assert rates.words_per_minute("alloy", "tts-1", 150.0) == 150.0
+
+
+def test_malformed_lines_are_skipped(tmp_path):
+    path = tmp_path / "rates.jsonl"
+    good = {"voice": "alloy", "model": "tts-1", "words": 6, "characters": 30, "seconds": 2.0}
+    lines = [
+        "not json",
+        json.dumps(["a", "list"]),
+        json.dumps({"voice": "alloy", "model": "tts-1"}),
+        json.dumps({**good, "words": "six"}),
+        json.dumps({**good, "seconds": None}),
+        json.dumps({**good, "seconds": 0}),
+        json.dumps(good),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+    rates = SpeechRates(path, min_samples=1)
+    assert rates.words_per_minute("alloy", "tts-1", 150.0) == 180.0
+
+
+def test_chunk_timing_and_script_sizing_share_a_fallback_rate(tmp_path, monkeypatch):
+    import backend.generate_audio as generate_audio
+    from backend.video_generator import estimate_speaking_duration
+    from config.settings import WORDS_PER_MINUTE
+
+    uncalibrated = SpeechRates(tmp_path / "rates.jsonl")
+    monkeypatch.setattr(generate_audio, "get_speech_rates", lambda: uncalibrated)
+
+    # A minute of script at the sizing rate is timed as a minute of speech
+    words = round(generate_audio.speaking_rate(WORDS_PER_MINUTE))
+    assert estimate_speaking_duration(" ".join(["word"] * words)) == 60.0
@@ -0,0 +1,126 @@
+import subprocess
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+from backend import tex_format
+
+PREAMBLE = "\\documentclass{standalone}\n\\usepackage{amsmath}\n"
+SOURCE = PREAMBLE + "\\begin{document}\n$x^2$\n\\end{document}\n"
+
+
+class FakeLatex:
+    """subprocess.run stand-in that writes the files latex would (or fails like it)"""
+
+    def __init__(self, build_format=True, compile_code=0):
+        self.build_format = build_format
+        self.compile_code = compile_code
+        self.commands = []
+
+    def __call__(self, command, cwd, **kwargs):
+        self.commands.append(command)
+        options = dict(arg.lstrip("-").split("=", 1) for arg in command if arg.startswith("-") and "=" in arg)
+        output_dir = Path(options.get("output-directory", cwd))
+        if "-ini" in command:
+            if self.build_format:
+                (output_dir / f"{options['jobname']}.fmt").write_bytes(b"format")
+            return subprocess.CompletedProcess(command, 0 if self.build_format else 1)
+        if self.compile_code == 0:
+            (output_dir / f"{options['jobname']}.dvi").write_bytes(b"dvi")
+        return subprocess.CompletedProcess(command, self.compile_code)
+
+
+@pytest.fixture
+def latex(monkeypatch):
+    def use(**behaviour):
+        fake = FakeLatex(**behaviour)
+        monkeypatch.setattr(tex_format.subprocess, "run", fake)
+        return fake
+    monkeypatch.setattr(tex_format, "_formats", {})
+    return use
+
+
+def write_tex(tmp_path, source=SOURCE):
+    tex_file = tmp_path / "work" / "abc123.tex"
+    tex_file.parent.mkdir(exist_ok=True)
+    tex_file.write_text(source)
+    return tex_file
+
+
+def test_split_preamble_cuts_at_begin_document():
+    assert tex_format.split_preamble(SOURCE) == (PREAMBLE, SOURCE[len(PREAMBLE):])
+    assert tex_format.split_preamble("$x^2$") is None
+
+
+def test_format_key_depends_on_preamble_and_compiler():
+    key = tex_format.format_key(PREAMBLE, "latex")
+    assert key == tex_format.format_key(PREAMBLE, "latex")
+    assert key != tex_format.format_key(PREAMBLE + "\\usepackage{amssymb}\n", "latex")
+    assert key != tex_format.format_key(PREAMBLE, "xelatex")
+
+
+def test_compile_with_format_builds_the_format_once(latex, tmp_path):
+    fake = latex()
+    tex_file = write_tex(tmp_path)
+
+    assert tex_format.compile_with_format(tex_file, format_dir=tmp_path / "formats") == tex_file.with_suffix(".dvi")
+    assert tex_format.compile_with_format(tex_file, format_dir=tmp_path / "formats") == tex_file.with_suffix(".dvi")
+
+    assert sum("-ini" in command for command in fake.commands) == 1
+    key = tex_format.format_key(PREAMBLE, "latex")
+    assert (tmp_path / "formats" / f"{key}.fmt").exists()
+    assert f"-fmt={key}" in fake.commands[-1]
+    assert not tex_file.with_name("abc123.body.tex").exists()
+
+
+@pytest.mark.parametrize("source, behaviour", [
+    ("$x^2$", {}),  # no \begin{document}
+    (SOURCE, {"build_format": False}),
+    (SOURCE, {"compile_code": 1}),
+])
+def test_compile_with_format_returns_none_when_it_cannot_compile(latex, tmp_path, source, behaviour):
+    latex(**behaviour)
+    assert tex_format.compile_with_format(write_tex(tmp_path, source), format_dir=tmp_path / "formats") is None
+
+
+@pytest.mark.parametrize("behaviour, uses_format", [
+    ({}, True),
+    ({"build_format": False}, False),
+    ({"compile_code": 1}, False),
+])
+def test_manim_hook_falls_back_to_the_original_compile(latex, monkeypatch, tmp_path, behaviour, uses_format):
+    latex(**behaviour)
+    original_calls = []
+
+    def original_compile(tex_file, tex_compiler, output_format):
+        original_calls.append((tex_compiler, output_format))
+        return "original"
+
+    tex_file_writing = types.SimpleNamespace(compile_tex=original_compile)
+    monkeypatch.setitem(sys.modules, "manim", types.ModuleType("manim"))
+    monkeypatch.setitem(sys.modules, "manim.utils", types.SimpleNamespace(tex_file_writing=tex_file_writing))
+    tex_format.install_manim_hook(tmp_path / "formats")
+    tex_file = write_tex(tmp_path)
+
+    result = tex_file_writing.compile_tex(str(tex_file), "latex", ".dvi")
+    assert (result == tex_file.with_suffix(".dvi")) is uses_format
+    assert original_calls == ([] if uses_format else [("latex", ".dvi")])
+
+    # Other compilers and outputs always go to manim's own compile
+    assert tex_file_writing.compile_tex(str(tex_file), "xelatex", ".xdv") == "original"
+
+
+def test_a_latex_run_that_times_out_counts_as_failed(monkeypatch, tmp_path):
+    def run(command, **kwargs):
+        raise subprocess.TimeoutExpired(command, kwargs["timeout"])
+
+    monkeypatch.setattr(tex_format.subprocess, "run", run)
+    assert tex_format._time_latex(["latex", "f0.tex"], tmp_path) is None
+
+
+def test_a_latex_run_that_errors_counts_as_failed(monkeypatch, tmp_path):
+    monkeypatch.setattr(tex_format.subprocess, "run",
+                        lambda command, **kwargs: subprocess.CompletedProcess(command, 1))
+    assert tex_format._time_latex(["latex", "f0.tex"], tmp_path) is None
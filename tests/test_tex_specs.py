@@ -0,0 +1,51 @@
+from backend.preflight import extract_tex_specs
+
+
+def specs(body):
+    return extract_tex_specs(f"from manim import *\n\nclass Demo(Scene):\n    def construct(self):\n        {body}\n")
+
+
+def test_literal_calls_become_specs():
+    [spec] = specs('eq = MathTex(r"x^2", "+", r"y^2", tex_environment="align*")')
+    assert spec["cls"] == "MathTex"
+    assert spec["args"] == ["x^2", "+", "y^2"]
+    assert spec["kwargs"] == {"tex_environment": "align*"}
+    assert spec["template"] is None
+    assert spec["line"] == 5
+
+
+def test_styling_kwargs_do_not_change_the_spec():
+    [spec] = specs('MathTex("a", color=RED, font_size=48)')
+    assert spec["kwargs"] == {}
+
+
+def test_duplicates_are_dropped():
+    assert len(specs('MathTex("a"); MathTex("a", color=BLUE); Tex("a")')) == 2
+
+
+def test_substrings_and_color_map_keys_are_merged():
+    [spec] = specs('MathTex("a+b=c", substrings_to_isolate=["a"], tex_to_color_map={"b": RED, "c": BLUE})')
+    assert spec["kwargs"] == {"substrings_to_isolate": ["a", "b", "c"]}
+
+
+def test_substring_tuples_are_accepted():
+    [spec] = specs('MathTex("a+b", substrings_to_isolate=("a", "b"))')
+    assert spec["kwargs"] == {"substrings_to_isolate": ["a", "b"]}
+
+
+def test_library_templates_are_kept_by_name():
+    [spec] = specs('Tex("hello", tex_template=TexTemplateLibrary.ctex)')
+    assert spec["template"] == "ctex"
+
+
+def test_non_literal_calls_are_skipped():
+    assert specs('MathTex(label)') == []
+    assert specs('MathTex(f"x_{i}")') == []
+    assert specs('MathTex("a+b", substrings_to_isolate=parts)') == []
+    assert specs('MathTex("a+b", tex_to_color_map={key: RED})') == []
+    assert specs('MathTex("a+b", tex_to_color_map={**colors})') == []
+    assert specs('Tex("a", tex_template=my_template)') == []
+
+
+def test_unparseable_code_has_no_specs():
+    assert extract_tex_specs("MathTex('a'") == []